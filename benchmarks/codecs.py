@@ -0,0 +1,94 @@
+"""
+Session encoding cost: encode/decode time and stored bytes per session for
+each storage codec (JSON, MessagePack, with and without zlib/zstd).
+
+Builds synthetic session states the way `RedisStorage` stores them (summary
+and watermark payload plus one encoded value per fact) with summaries of a
+few sizes, then times `Codec.encode` and `Codec.decode` over every state.
+The "stdlib json" row is the encoding used before codecs existed. Codecs
+whose optional package is missing are skipped.
+
+    python benchmarks/codecs.py --sessions 2000 --summary-words 200 2000 8000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist.storage.codec import Codec
+from workload import SyntheticConversation
+
+CODECS = [
+    ("json", None),
+    ("json", "zlib"),
+    ("json", "zstd"),
+    ("msgpack", None),
+    ("msgpack", "zlib"),
+    ("msgpack", "zstd"),
+]
+
+
+class StdlibJson:
+    def encode(self, obj):
+        return json.dumps(obj).encode("utf-8")
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+def make_states(sessions: int, summary_words: int, facts: int):
+    conversation = SyntheticConversation(seed=1, message_words=summary_words)
+    states = []
+    for i in range(sessions):
+        summary = conversation.user_message(i)["content"]
+        ledger = {f"fact_{k}": f"value {i} {k} " + conversation.assistant_message(k)["content"] for k in range(facts)}
+        watermark = {"count": 40 + i % 100, "hash": f"{i:016x}", "tokens": 5000}
+        states.append(({"summary": summary, "updated_at": time.time(), "watermark": watermark}, ledger))
+    return states
+
+
+def measure(codec, states):
+    start = time.perf_counter()
+    encoded = [(codec.encode(payload), [codec.encode(v) for v in ledger.values()]) for payload, ledger in states]
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for payload, values in encoded:
+        codec.decode(payload)
+        for value in values:
+            codec.decode(value)
+    decode_s = time.perf_counter() - start
+    size = sum(len(payload) + sum(len(v) for v in values) for payload, values in encoded)
+    n = len(states)
+    return encode_s / n * 1e6, decode_s / n * 1e6, size / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--summary-words", type=int, nargs="+", default=[200, 2000, 8000])
+    parser.add_argument("--facts", type=int, default=30)
+    parser.add_argument("--threshold", type=int, default=1024)
+    args = parser.parse_args()
+
+    codecs = [("stdlib json", StdlibJson())]
+    for format, compression in CODECS:
+        name = format + (f"+{compression}" if compression else "")
+        try:
+            codecs.append((name, Codec(format, compression, threshold=args.threshold)))
+        except ImportError as e:
+            print(f"skipping {name}: {e}")
+
+    for words in args.summary_words:
+        states = make_states(args.sessions, words, args.facts)
+        print(f"\nsummary ~{words} words, {args.facts} facts, {args.sessions} sessions")
+        print(f"{'codec':<16}{'encode us':>12}{'decode us':>12}{'bytes/session':>16}")
+        for name, codec in codecs:
+            encode_us, decode_us, size = measure(codec, states)
+            print(f"{name:<16}{encode_us:>12.1f}{decode_us:>12.1f}{size:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Worker calls per 100 turns under different compression policies.
+
+Replays long-running sessions in the style of examples/e2e/long_conversation.py
+(a chatty shopper whose client re-sends the full raw history every turn)
+against a mock worker model, and reports how often each policy calls it.
+
+    python benchmarks/compression_policy.py --turns 300
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.llm.base import LLMProvider
+from chronicle_gist.policy import HysteresisPolicy, ThresholdPolicy
+
+USER_TURNS = [
+    "Hi there! I've recently decided to get back into shape after a long hiatus. "
+    "I used to run 5ks back in college but stopped for a few years. "
+    "Now I want to train for a half-marathon next summer, so I need a really reliable pair of running shoes "
+    "that can handle long distances on pavement.",
+    "As for my budget, things are a bit tight right now with the renovations. "
+    "I really cannot go over $150. Even $160 would be pushing it too much, "
+    "so please keep it strictly under $150 including tax if possible.",
+    "I've always had good luck with Nike in the past. "
+    "My last pair was a Pegasus and they lasted forever. "
+    "So I'd prefer to stick with Nike if they have something in my price range.",
+    "Oh, and I have wide feet, so I need a size 10.5 Wide if possible. "
+    "Also, I hate boring colors. I really want something bright, maybe Red or Neon Green.",
+    "That sounds perfect. How much is shipping to Springfield, IL? "
+    "I need them by next week for a training group starting up.",
+]
+
+
+class MockWorker(LLMProvider):
+    """One token per word; returns a short fixed-size summary."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def count_tokens(self, messages, model):
+        if isinstance(messages, str):
+            return len(messages.split())
+        return 3 + sum(3 + len(str(m.get("content", "")).split()) for m in messages)
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return json.dumps({
+            "summary": "Shopper training for a half-marathon wants wide Nike running shoes under $150.",
+            "fact_ledger": {"budget": 150, "brand": "Nike", "shoe_size": "10.5 Wide", "city": "Springfield, IL"},
+        })
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+async def replay(policy, turns: int):
+    worker = MockWorker()
+    chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=worker, compression_policy=policy)
+    history = []
+    prompt_tokens = 0
+    for turn in range(turns):
+        new_msg = {"role": "user", "content": USER_TURNS[turn % len(USER_TURNS)]}
+        result = await chronicle.process_async("shopper", new_msg, history)
+        prompt_tokens += result["meta"]["final_tokens"]
+        history.append(new_msg)
+        history.append({"role": "assistant", "content": f"Noted (turn {turn}). I will keep that in mind for your order."})
+    return worker.calls, prompt_tokens / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--high", type=int, default=1000)
+    parser.add_argument("--low", type=int, default=400)
+    args = parser.parse_args()
+
+    policies = [
+        (f"threshold({args.high})", ThresholdPolicy(args.high)),
+        (f"hysteresis({args.high}/{args.low})", HysteresisPolicy(args.high, args.low)),
+    ]
+    print(f"{'policy':>24} | {'worker calls':>12} | {'calls/100 turns':>15} | {'avg prompt tokens':>17}")
+    for name, policy in policies:
+        calls, avg_tokens = asyncio.run(replay(policy, args.turns))
+        print(f"{name:>24} | {calls:>12} | {calls * 100 / args.turns:>15.1f} | {avg_tokens:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
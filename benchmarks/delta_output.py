@@ -0,0 +1,151 @@
+"""
+Worker output tokens and wall-clock: full-rewrite vs delta worker output.
+
+Runs compression rounds on a session with a synthetic 200-fact ledger. Each
+round changes a handful of facts. The mock worker writes what a compliant
+model would write in each mode (the whole updated state, or only the
+operations), and waits `--ms-per-output-token` per output token to stand in
+for decoding time, which dominates worker latency. Output tokens are counted
+with litellm's tokenizer for `--model`.
+
+With `--live`, the same prompts go to the real worker model instead (needs
+an API key) and real output tokens and latency are reported.
+
+    python benchmarks/delta_output.py --facts 200 --rounds 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.llm.base import LLMProvider
+
+
+def synthetic_ledger(n: int):
+    return {
+        f"fact_{i:03d}": f"user detail number {i}: prefers option {i % 7} for category {i % 13}"
+        for i in range(n)
+    }
+
+
+def round_changes(round_no: int, n: int):
+    """A few facts change each round: 3 updates, 1 new list item, 1 deletion."""
+    updated = {f"fact_{(round_no * 11 + k) % n:03d}": f"updated in round {round_no}, variant {k}" for k in range(3)}
+    deleted = f"fact_{(round_no * 17 + 5) % n:03d}"
+    return updated, f"order #{round_no}", deleted
+
+
+class SimulatedWorker(LLMProvider):
+    """Writes the ideal response for the requested mode and 'decodes' it at a fixed speed."""
+
+    def __init__(self, model: str, n_facts: int, ms_per_output_token: float):
+        import litellm
+        self._litellm = litellm
+        self.model = model
+        self.n_facts = n_facts
+        self.ms_per_output_token = ms_per_output_token
+        self.ledger = {}
+        self.round = 0
+        self.delta = False
+        self.output_tokens = 0
+
+    def count_tokens(self, messages, model):
+        if isinstance(messages, str):
+            return len(messages.split())
+        return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+    def completion(self, messages, model, response_format=None):
+        updated, item, deleted = round_changes(self.round, self.n_facts)
+        summary = f"Round {self.round}: user revised preferences and placed another order."
+        if self.delta:
+            content = json.dumps({
+                "summary": {"op": "append", "text": summary},
+                "ledger_ops": [{"op": "set", "key": k, "value": v} for k, v in updated.items()]
+                + [{"op": "append", "key": "orders", "value": item}, {"op": "delete", "key": deleted}],
+            })
+        else:
+            ledger = dict(self.ledger, **updated)
+            ledger["orders"] = list(ledger.get("orders", [])) + [item]
+            ledger.pop(deleted, None)
+            content = json.dumps({"summary": summary, "fact_ledger": ledger})
+        tokens = self._litellm.token_counter(model=self.model, text=content)
+        self.output_tokens += tokens
+        time.sleep(tokens * self.ms_per_output_token / 1000.0)
+        return content
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+class LiveWorker(LLMProvider):
+    """Real worker model; records output tokens from the provider's usage report."""
+
+    def __init__(self):
+        import litellm
+        self._litellm = litellm
+        self.output_tokens = 0
+
+    def count_tokens(self, messages, model):
+        if isinstance(messages, str):
+            return len(messages.split())
+        return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+    def completion(self, messages, model, response_format=None):
+        response = self._litellm.completion(model=model, messages=messages, response_format={"type": "json_object"})
+        self.output_tokens += response.usage.completion_tokens
+        return response.choices[0].message.content
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+def run(delta: bool, args):
+    if args.live:
+        worker = LiveWorker()
+    else:
+        worker = SimulatedWorker(args.model, args.facts, args.ms_per_output_token)
+        worker.delta = delta
+    storage = InMemoryStorage()
+    chronicle = Chronicle(storage=storage, llm_provider=worker, model_name=args.model, token_threshold=5, delta_output=delta)
+
+    storage.save_session("bench", "User is furnishing a new apartment.", synthetic_ledger(args.facts))
+    elapsed = 0.0
+    failed = 0
+    for round_no in range(args.rounds):
+        if not args.live:
+            worker.ledger = storage.get_session("bench")["fact_ledger"]
+            worker.round = round_no
+        updated, item, deleted = round_changes(round_no, args.facts)
+        message = {"role": "user", "content": f"Please update {', '.join(updated)}: {'; '.join(updated.values())}. "
+                                              f"Add {item} to my orders and forget {deleted}."}
+        start = time.perf_counter()
+        # Fresh raw history every round, so each round compresses exactly one message
+        result = chronicle.process("bench", {"role": "user", "content": "Thanks"}, [message])
+        elapsed += time.perf_counter() - start
+        failed += result["meta"]["compression"] != "applied"
+
+    facts = len(storage.get_session("bench")["fact_ledger"])
+    return worker.output_tokens / args.rounds, elapsed * 1000 / args.rounds, failed, facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--facts", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--ms-per-output-token", type=float, default=15.0)
+    parser.add_argument("--live", action="store_true", help="Call the real worker model instead of the simulation")
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} | {'output tokens/round':>19} | {'ms/round':>9} | {'failed':>6} | {'facts after':>11}")
+    for name, delta in (("full", False), ("delta", True)):
+        tokens, ms, failed, facts = run(delta, args)
+        print(f"{name:>6} | {tokens:>19.0f} | {ms:>9.1f} | {failed:>6} | {facts:>11}")
+
+
+if __name__ == "__main__":
+    main()
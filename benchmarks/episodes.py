@@ -0,0 +1,65 @@
+"""
+Episodic recall latency: top-K search over one session's archived episodes.
+
+Archives synthetic episodes (a few chat turns each, see workload.py) into
+InMemoryStorage, builds the per-session index once, then times `recall` for
+random queries. Reports index build time and search p50/p95/p99 (the vector
+search alone, as recorded in the recall metrics) and full recall time.
+
+    python benchmarks/episodes.py --episodes 10000 --dim 1024 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist import EpisodicMemory, InMemoryStorage
+from workload import SyntheticConversation
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--turns-per-episode", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    conversation = SyntheticConversation(seed=1, message_words=40)
+    storage = InMemoryStorage()
+    episodes = []
+    for e in range(args.episodes):
+        messages = [conversation.user_message(e * args.turns_per_episode + t) for t in range(args.turns_per_episode)]
+        episodes.append({"summary": "", "messages": messages, "archived_at": 0.0})
+    storage.append_episodes("bench", episodes)
+
+    memory = EpisodicMemory(storage=storage, top_k=args.top_k, token_budget=10 ** 9, dim=args.dim)
+    count_tokens = lambda text: len(text) // 4
+
+    start = time.perf_counter()
+    memory.recall("bench", "warm up", count_tokens)
+    build_s = time.perf_counter() - start
+
+    search_ms, recall_ms = [], []
+    for q in range(args.queries):
+        query = conversation.user_message(q)["content"]
+        start = time.perf_counter()
+        _, metrics = memory.recall("bench", query, count_tokens)
+        recall_ms.append((time.perf_counter() - start) * 1000)
+        search_ms.append(metrics["search_ms"])
+
+    print(f"episodes: {args.episodes}  dim: {args.dim}  index build: {build_s:.2f}s")
+    for name, values in (("search", search_ms), ("recall", recall_ms)):
+        print(f"{name:>7} ms  p50 {percentile(values, 0.5):.3f}  p95 {percentile(values, 0.95):.3f}  p99 {percentile(values, 0.99):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+PostgresStorage against a local server: read/save throughput with and
+without prepared statements, bulk import (COPY) vs. batched and per-row
+saves, and TTL purge speed.
+
+Sessions are named `bench-*` and deleted before and after the run, so it can
+point at a database that holds other data.
+
+    python benchmarks/postgres.py --url postgresql://localhost/chronicle --sessions 20000 --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist.storage.postgres import PostgresStorage
+
+LEDGER = {f"fact_{i}": f"value {i}" for i in range(20)}
+SUMMARY = "User is comparing laptops and trail shoes. " * 20
+
+
+def states(n: int, updated_at=None):
+    return {f"bench-{i}": {"summary": SUMMARY, "fact_ledger": LEDGER, "updated_at": updated_at} for i in range(n)}
+
+
+async def cleanup(storage: PostgresStorage):
+    async with storage.pool.acquire() as conn:
+        await conn.execute("DELETE FROM chronicle_sessions WHERE id LIKE 'bench-%'")
+
+
+async def read_save(url: str, args, prepare: bool) -> float:
+    storage = PostgresStorage(url, min_size=args.pool_size, max_size=args.pool_size, prepare=prepare)
+    await storage.connect()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with semaphore:
+            sid = f"bench-{i % args.sessions}"
+            await storage.aget_session(sid)
+            await storage.asave_session(sid, SUMMARY, LEDGER)
+
+    await one(0)
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - start
+    await storage.disconnect()
+    return args.requests / elapsed
+
+
+async def writes(url: str, args):
+    storage = PostgresStorage(url, min_size=args.pool_size, max_size=args.pool_size, ttl=3600, purge_batch=args.purge_batch)
+    await storage.connect()
+    rows = {}
+
+    await cleanup(storage)
+    start = time.perf_counter()
+    await storage.aimport_sessions(states(args.sessions))
+    rows["import (COPY)"] = args.sessions / (time.perf_counter() - start)
+
+    await cleanup(storage)
+    start = time.perf_counter()
+    batch = states(args.sessions)
+    ids = list(batch)
+    for i in range(0, len(ids), 1000):
+        await storage.asave_sessions({sid: batch[sid] for sid in ids[i:i + 1000]})
+    rows["asave_sessions x1000"] = args.sessions / (time.perf_counter() - start)
+
+    await cleanup(storage)
+    per_row = min(args.sessions, 2000)
+    start = time.perf_counter()
+    for sid in ids[:per_row]:
+        await storage.asave_session(sid, SUMMARY, LEDGER)
+    rows["asave_session"] = per_row / (time.perf_counter() - start)
+
+    await cleanup(storage)
+    await storage.aimport_sessions(states(args.sessions, updated_at=time.time() - 7200))
+    start = time.perf_counter()
+    deleted = await storage.apurge_expired()
+    rows[f"purge ({deleted} rows)"] = deleted / (time.perf_counter() - start)
+
+    await cleanup(storage)
+    await storage.disconnect()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="postgresql://localhost/chronicle")
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--purge-batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"read+save, {args.requests} requests, concurrency {args.concurrency}, pool {args.pool_size}")
+    for prepare in (False, True):
+        rate = asyncio.run(read_save(args.url, args, prepare))
+        print(f"  prepare={prepare!s:<6} {rate:>10.0f} req/s")
+
+    print(f"\nwrites, {args.sessions} sessions")
+    for name, rate in asyncio.run(writes(args.url, args)).items():
+        print(f"  {name:<24} {rate:>10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Chronicle overhead benchmark: `process` and `process_async` on every storage adapter.
+
+Replays deterministic synthetic conversations (see workload.py) against a mock
+worker model with configurable latency and failures, so the numbers measure
+Chronicle itself rather than a provider. Backends:
+- memory, cached: InMemoryStorage, and CachedStorage over it,
+- redis: fakeredis unless --redis-url points at a server,
+- postgres, mongo: only with --postgres-dsn / --mongo-url (e.g. a local container).
+
+Per scenario it reports throughput, p50/p95/p99 turn latency, tokenizer time,
+worker calls and bytes moved (worker prompt + response, storage payloads) per
+turn. --json writes the results for diffing between releases; --compare prints
+the change against such a file.
+
+    python benchmarks/suite.py --sessions 8 --turns 100 --json results.json
+    python benchmarks/suite.py --latency-ms 300 --latency-sigma 0.5 --failure-rate 0.05 --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist import ApproximateTokenCounter, CachedStorage, Chronicle, ExactTokenCounter, InMemoryStorage
+from workload import MockWorker, SyntheticConversation
+
+BACKENDS = ("memory", "cached", "redis", "postgres", "mongo")
+METRICS = (
+    "turns_per_s", "p50_ms", "p95_ms", "p99_ms", "tokenizer_ms_per_turn",
+    "worker_calls_per_turn", "worker_bytes_per_turn", "storage_bytes_per_turn",
+)
+
+READS = ("get_session", "aget_session", "aget_sessions")
+WRITES = ("save_session", "asave_session", "save_session_patch", "asave_session_patch", "asave_sessions")
+
+
+def payload_size(value: Any) -> int:
+    return len(json.dumps(value, default=str).encode("utf-8")) if value else 0
+
+
+def meter_storage(storage, counters: Dict[str, int]):
+    """Wrap the instance's read/write methods to add their JSON payload size to `counters["bytes"]`."""
+    def wrap(name: str, read: bool):
+        method = getattr(storage, name)
+        is_async = asyncio.iscoroutinefunction(method)
+
+        def size(args, kwargs, result):
+            return payload_size(result) if read else payload_size([a for a in args[1:] if a is not None] + list(kwargs.values()))
+
+        if is_async:
+            async def metered(*args, **kwargs):
+                result = await method(*args, **kwargs)
+                counters["bytes"] += size(args, kwargs, result)
+                return result
+        else:
+            def metered(*args, **kwargs):
+                result = method(*args, **kwargs)
+                counters["bytes"] += size(args, kwargs, result)
+                return result
+        setattr(storage, name, metered)
+
+    for name in READS + WRITES:
+        if hasattr(storage, name):
+            wrap(name, name in READS)
+    return storage
+
+
+def time_tokenizer(chronicle: Chronicle, counters: Dict[str, float]) -> None:
+    """Accumulate time spent in Chronicle's token accounting (cache lookups included)."""
+    for name in ("count", "count_message"):
+        method = getattr(chronicle.token_counter, name)
+
+        def timed(*args, _method=method, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                counters["seconds"] += time.perf_counter() - start
+        setattr(chronicle.token_counter, name, timed)
+
+
+def make_storage(backend: str, args) -> Optional[Any]:
+    """Storage for one scenario, or None when the backend has no stand-in here."""
+    if backend == "memory":
+        return InMemoryStorage()
+    if backend == "cached":
+        return CachedStorage(InMemoryStorage())
+    if backend == "redis":
+        from chronicle_gist.storage import redis_adapter
+
+        storage = redis_adapter.RedisStorage(args.redis_url or "redis://localhost:6379/0")
+        if args.redis_url:
+            return storage
+        try:
+            import fakeredis
+        except ImportError:
+            return None
+        server = fakeredis.FakeServer()
+        storage.sync_client = fakeredis.FakeRedis(server=server)
+        storage.client = fakeredis.FakeAsyncRedis(server=server)
+        storage._sync_save_script = storage.sync_client.register_script(redis_adapter._SAVE_SESSION_SCRIPT)
+        storage._sync_patch_script = storage.sync_client.register_script(redis_adapter._PATCH_SESSION_SCRIPT)
+        storage._save_script = storage.client.register_script(redis_adapter._SAVE_SESSION_SCRIPT)
+        storage._patch_script = storage.client.register_script(redis_adapter._PATCH_SESSION_SCRIPT)
+        return storage
+    if backend == "postgres" and args.postgres_dsn:
+        from chronicle_gist.storage.postgres import PostgresStorage
+        return PostgresStorage(args.postgres_dsn)
+    if backend == "mongo" and args.mongo_url:
+        from chronicle_gist.storage.mongo import MongoStorage
+        return MongoStorage(args.mongo_url, db_name="chronicle_bench")
+    return None
+
+
+async def close_storage(storage) -> None:
+    for name in ("disconnect", "disconnect_sync"):
+        close = getattr(storage, name, None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+            return
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered) + 0.5)) - 1))]
+
+
+class Scenario:
+    def __init__(self, mode: str, backend: str, args):
+        self.name = f"{mode}/{backend}"
+        self.mode = mode
+        self.args = args
+        self.storage = make_storage(backend, args)
+        self.storage_counters = {"bytes": 0}
+        self.tokenizer_counters = {"seconds": 0.0}
+        tokenizer = ExactTokenCounter() if args.tokenizer == "exact" else ApproximateTokenCounter()
+        self.worker = MockWorker(
+            latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+            failure_rate=args.failure_rate, failure_mode=args.failure_mode,
+            tokenizer=tokenizer, seed=args.seed,
+        )
+        self.latencies: List[float] = []
+        self.outcomes: Dict[str, int] = {}
+
+    def chronicle(self) -> Chronicle:
+        chronicle = Chronicle(
+            storage=meter_storage(self.storage, self.storage_counters), llm_provider=self.worker,
+            token_threshold=self.args.threshold, bloat_token_counter=self.worker.tokenizer,
+        )
+        time_tokenizer(chronicle, self.tokenizer_counters)
+        return chronicle
+
+    def record(self, seconds: float, result: Dict[str, Any]) -> None:
+        self.latencies.append(seconds * 1000)
+        outcome = result["meta"].get("compression", "none")
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def run_sync(self) -> float:
+        chronicle = self.chronicle()
+        run_id = uuid.uuid4().hex[:8]
+        start = time.perf_counter()
+        for s in range(self.args.sessions):
+            conversation = SyntheticConversation(seed=self.args.seed + s, message_words=self.args.message_words, fact_density=self.args.fact_density)
+            history: List[Dict[str, str]] = []
+            for turn in range(self.args.turns):
+                message = conversation.user_message(turn)
+                t0 = time.perf_counter()
+                result = chronicle.process(f"bench-{run_id}-{s}", message, history)
+                self.record(time.perf_counter() - t0, result)
+                history += [message, conversation.assistant_message(turn)]
+        return time.perf_counter() - start
+
+    async def run_async(self) -> float:
+        chronicle = self.chronicle()
+        run_id = uuid.uuid4().hex[:8]
+
+        async def session(s: int):
+            conversation = SyntheticConversation(seed=self.args.seed + s, message_words=self.args.message_words, fact_density=self.args.fact_density)
+            history: List[Dict[str, str]] = []
+            for turn in range(self.args.turns):
+                message = conversation.user_message(turn)
+                t0 = time.perf_counter()
+                result = await chronicle.process_async(f"bench-{run_id}-{s}", message, history, timeout=self.args.timeout_ms)
+                self.record(time.perf_counter() - t0, result)
+                history += [message, conversation.assistant_message(turn)]
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(s) for s in range(self.args.sessions)))
+        elapsed = time.perf_counter() - start
+        # Compressions that outlived their timeout still count towards worker calls and bytes
+        await chronicle.drain()
+        return elapsed
+
+    def run(self) -> Dict[str, Any]:
+        async def run_async_and_close():
+            try:
+                return await self.run_async()
+            finally:
+                await close_storage(self.storage)
+
+        if self.mode == "process":
+            elapsed = self.run_sync()
+            asyncio.run(close_storage(self.storage))
+        else:
+            elapsed = asyncio.run(run_async_and_close())
+
+        turns = len(self.latencies)
+        return {
+            "scenario": self.name,
+            "turns": turns,
+            "turns_per_s": round(turns / elapsed, 1),
+            "p50_ms": round(percentile(self.latencies, 50), 3),
+            "p95_ms": round(percentile(self.latencies, 95), 3),
+            "p99_ms": round(percentile(self.latencies, 99), 3),
+            "tokenizer_ms_per_turn": round(self.tokenizer_counters["seconds"] * 1000 / turns, 3),
+            "worker_calls_per_turn": round(self.worker.calls / turns, 4),
+            "worker_failures": self.worker.failures,
+            "worker_bytes_per_turn": round((self.worker.bytes_in + self.worker.bytes_out) / turns, 1),
+            "storage_bytes_per_turn": round(self.storage_counters["bytes"] / turns, 1),
+            "compression": self.outcomes,
+        }
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':>24} | {'turns/s':>9} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'tok ms/turn':>11} | "
+          f"{'calls/turn':>10} | {'worker B/turn':>13} | {'storage B/turn':>14}")
+    for r in results:
+        print(f"{r['scenario']:>24} | {r['turns_per_s']:>9.1f} | {r['p50_ms']:>8.3f} | {r['p95_ms']:>8.3f} | {r['p99_ms']:>8.3f} | "
+              f"{r['tokenizer_ms_per_turn']:>11.3f} | {r['worker_calls_per_turn']:>10.3f} | {r['worker_bytes_per_turn']:>13.0f} | "
+              f"{r['storage_bytes_per_turn']:>14.0f}")
+
+
+def print_comparison(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = {r["scenario"]: r for r in json.load(f)["results"]}
+    print(f"\nchange vs {baseline_path}:")
+    print(f"{'scenario':>24} | " + " | ".join(f"{m:>22}" for m in METRICS))
+    for r in results:
+        old = baseline.get(r["scenario"])
+        if old is None:
+            continue
+        cells = []
+        for m in METRICS:
+            cells.append(f"{(r[m] - old[m]) / old[m]:>+22.1%}" if old.get(m) else f"{'n/a':>22}")
+        print(f"{r['scenario']:>24} | " + " | ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", default="process,process_async")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--message-words", type=int, default=60)
+    parser.add_argument("--fact-density", type=float, default=0.3)
+    parser.add_argument("--threshold", type=int, default=1000, help="Chronicle token_threshold")
+    parser.add_argument("--tokenizer", choices=["approximate", "exact"], default="approximate")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Median worker latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="Lognormal spread of worker latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-mode", choices=["error", "malformed"], default="error")
+    parser.add_argument("--timeout-ms", type=int, default=10000, help="process_async compression timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--redis-url", help="Use this Redis server instead of fakeredis")
+    parser.add_argument("--postgres-dsn")
+    parser.add_argument("--mongo-url")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Print the change against a previous --json file")
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes.split(","):
+        for backend in args.backends.split(","):
+            scenario = Scenario(mode, backend, args)
+            if scenario.storage is None:
+                print(f"skipping {scenario.name}: no local stand-in (see --help)", file=sys.stderr)
+                continue
+            results.append(scenario.run())
+
+    print_table(results)
+    if args.compare:
+        print_comparison(results, args.compare)
+    if args.json:
+        try:
+            from importlib.metadata import version
+            chronicle_version = version("chronicle-gist")
+        except Exception:
+            chronicle_version = None
+        report = {
+            "meta": {
+                "chronicle_version": chronicle_version,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "args": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
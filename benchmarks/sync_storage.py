@@ -0,0 +1,92 @@
+"""
+Threaded synchronous storage throughput vs. the event-loop-per-request workaround.
+
+Each "request" reads a session and writes it back, the way `Chronicle.process`
+does on a compression turn. The sync path shares one pooled client across
+worker threads; the workaround builds an adapter and runs `asyncio.run` per
+request, as WSGI apps had to before the sync methods existed.
+
+    python benchmarks/sync_storage.py --backend redis --url redis://localhost:6379/0
+    python benchmarks/sync_storage.py --backend postgres --url postgresql://localhost/chronicle
+    python benchmarks/sync_storage.py --backend mongo --url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+LEDGER = {f"fact_{i}": f"value {i}" for i in range(20)}
+
+
+def make_storage(backend: str, url: str):
+    if backend == "redis":
+        from chronicle_gist.storage.redis_adapter import RedisStorage
+        return RedisStorage(url)
+    if backend == "postgres":
+        from chronicle_gist.storage.postgres import PostgresStorage
+        return PostgresStorage(url)
+    if backend == "mongo":
+        from chronicle_gist.storage.mongo import MongoStorage
+        return MongoStorage(url, db_name="chronicle_bench")
+    raise ValueError(f"unknown backend {backend}")
+
+
+def run_sync(backend: str, url: str, requests: int, threads: int) -> float:
+    storage = make_storage(backend, url)
+
+    def one(i):
+        sid = f"bench-{i % 100}"
+        storage.get_session(sid)
+        storage.save_session(sid, "summary", LEDGER)
+
+    one(0)  # open pools outside the timed section
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def run_loop_per_request(backend: str, url: str, requests: int, threads: int) -> float:
+    async def one_async(i):
+        # Async clients are bound to the loop that created them
+        storage = make_storage(backend, url)
+        sid = f"bench-{i % 100}"
+        await storage.aget_session(sid)
+        await storage.asave_session(sid, "summary", LEDGER)
+        disconnect = getattr(storage, "disconnect", None)
+        if disconnect is not None:
+            result = disconnect()
+            if asyncio.iscoroutine(result):
+                await result
+
+    def one(i):
+        asyncio.run(one_async(i))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["redis", "postgres", "mongo"], required=True)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    sync_rps = run_sync(args.backend, args.url, args.requests, args.threads)
+    loop_rps = run_loop_per_request(args.backend, args.url, args.requests, args.threads)
+    print(f"{'mode':>22} | {'req/s':>10}")
+    print(f"{'sync pooled threads':>22} | {sync_rps:>10.0f}")
+    print(f"{'loop per request':>22} | {loop_rps:>10.0f}")
+    print(f"speedup: {sync_rps / loop_rps:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Throughput and accuracy of the token counter backends.
+
+Counts a corpus of chat-sized texts (prose paragraphs, JSON fact ledgers and
+source code taken from this repository, plus synthetic chat turns) with:
+- litellm.token_counter, one call per text (what LitellmProvider does),
+- ExactTokenCounter, serial and split across a thread pool,
+- ApproximateTokenCounter with the default and a corpus-calibrated fit.
+Errors are relative to the exact counts; the calibrated fit is trained on
+half of the corpus and scored on the other half.
+
+    python benchmarks/token_counters.py --model gpt-3.5-turbo --repeat 20
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT)
+
+from chronicle_gist.tokens import ApproximateTokenCounter, ExactTokenCounter
+
+
+def corpus():
+    texts = []
+    for path in [os.path.join(ROOT, "README.md")] + sorted(glob.glob(os.path.join(ROOT, "chronicle_gist", "**", "*.py"), recursive=True)):
+        with open(path) as f:
+            texts += [p for p in re.split(r"\n\s*\n", f.read()) if p.strip()]
+    texts += [json.dumps({f"fact_{i}": f"user detail {i}: prefers option {i % 7}" for i in range(n)}) for n in range(1, 40, 3)]
+    texts += [f"Turn {i}: I'd like to change my order #{1000 + i} to the blue one, size {i % 12}. Thanks!" for i in range(200)]
+    return texts
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def errors(estimates, exact):
+    rel = sorted(abs(e - x) / max(x, 1) for e, x in zip(estimates, exact))
+    return sum(rel) / len(rel), rel[int(0.95 * (len(rel) - 1))], abs(sum(estimates) - sum(exact)) / sum(exact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    import litellm
+
+    texts = corpus()
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    exact_counter = ExactTokenCounter(max_workers=args.workers, parallel_threshold=1)
+    serial_counter = ExactTokenCounter(max_workers=1)
+    exact = serial_counter.count_texts(texts, args.model)
+
+    approximate = ApproximateTokenCounter()
+    calibrated = ApproximateTokenCounter()
+    calibrated.calibrate(texts[::2], serial_counter, args.model)
+
+    backends = [
+        ("litellm.token_counter", lambda: [litellm.token_counter(model=args.model, text=t) for t in texts], max(1, args.repeat // 10)),
+        ("exact (serial)", lambda: serial_counter.count_texts(texts, args.model), args.repeat),
+        (f"exact ({args.workers} threads)", lambda: exact_counter.count_texts(texts, args.model), args.repeat),
+        ("approximate (default)", lambda: approximate.count_texts(texts, args.model), args.repeat),
+        ("approximate (calibrated)", lambda: calibrated.count_texts(texts, args.model), args.repeat),
+    ]
+
+    print(f"{len(texts)} texts, {size_mb:.2f} MB, {sum(exact)} exact tokens ({args.model})")
+    print(f"{'backend':>26} | {'texts/s':>10} | {'MB/s':>7} | {'mean err':>8} | {'p95 err':>7} | {'total err':>9}")
+    for name, fn, repeat in backends:
+        counts, seconds = timed(fn, repeat)
+        held_out = slice(1, None, 2) if "calibrated" in name else slice(None)
+        mean, p95, total = errors(counts[held_out], exact[held_out])
+        print(f"{name:>26} | {len(texts) / seconds:>10.0f} | {size_mb / seconds:>7.2f} | {mean:>8.1%} | {p95:>7.1%} | {total:>9.1%}")
+    exact_counter.close()
+
+
+if __name__ == "__main__":
+    main()
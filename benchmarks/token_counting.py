@@ -0,0 +1,85 @@
+"""
+Per-turn tokenization cost as a session grows.
+
+Replays a synthetic conversation through `Chronicle.process` with a tokenizer
+that records how many characters it is asked to encode. With the per-message
+token cache, the work per turn stays flat; without it, it grows linearly with
+the history.
+
+    python benchmarks/token_counting.py --turns 300
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.llm.base import LLMProvider
+
+
+class CountingProvider(LLMProvider):
+    """Word-split tokenizer that tracks how much text it encodes."""
+
+    def __init__(self):
+        self.chars_encoded = 0
+
+    def count_tokens(self, messages, model):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        total = 3
+        for m in messages:
+            content = str(m.get("content", ""))
+            self.chars_encoded += len(content)
+            total += 3 + len(content.split())
+        return total
+
+    def completion(self, messages, model, response_format=None):
+        return '{"summary": "", "fact_ledger": {}}'
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+def run(turns: int, cache_size: int, report_every: int):
+    provider = CountingProvider()
+    # Threshold above the total so every turn exercises hybrid hydration
+    chronicle = Chronicle(
+        storage=InMemoryStorage(),
+        llm_provider=provider,
+        token_threshold=10 ** 9,
+        token_cache_size=cache_size,
+    )
+    history = []
+    rows = []
+    for turn in range(1, turns + 1):
+        new_msg = {"role": "user", "content": f"Turn {turn}: " + "please remember this detail " * 8}
+        before = provider.chars_encoded
+        t0 = time.perf_counter()
+        chronicle.process("bench", new_msg, history)
+        elapsed_us = (time.perf_counter() - t0) * 1e6
+        if turn % report_every == 0:
+            rows.append((turn, provider.chars_encoded - before, elapsed_us))
+        history.append(new_msg)
+        history.append({"role": "assistant", "content": f"Ack {turn}. " + "noted " * 12})
+    return rows, chronicle.token_counter.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--every", type=int, default=50)
+    args = parser.parse_args()
+
+    cached, stats = run(args.turns, cache_size=4096, report_every=args.every)
+    uncached, _ = run(args.turns, cache_size=0, report_every=args.every)
+
+    print(f"{'turn':>6} | {'chars/turn (cache)':>18} | {'us/turn (cache)':>15} | {'chars/turn (none)':>17} | {'us/turn (none)':>14}")
+    for (turn, c_chars, c_us), (_, u_chars, u_us) in zip(cached, uncached):
+        print(f"{turn:>6} | {c_chars:>18} | {c_us:>15.1f} | {u_chars:>17} | {u_us:>14.1f}")
+    print(f"\ncache stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
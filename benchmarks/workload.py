@@ -0,0 +1,113 @@
+"""
+Shared workload for the benchmark scripts: a deterministic synthetic
+conversation generator and a mock worker LLM with configurable latency and
+failure distributions. Importable from any script in this directory.
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from chronicle_gist.llm.base import LLMProvider
+from chronicle_gist.tokens import ApproximateTokenCounter, TokenCounter
+
+FILLER = (
+    "the order shipping week budget color size store return option delivery trail road pair "
+    "price model review weather training plan distance morning evening store coupon friend"
+).split()
+
+# Facts are stated as "Note: <key> = <value>." so the mock worker can find them again
+FACT_PATTERN = re.compile(r'(fact_\d+)(?:"\s*:\s*"| = )([a-z0-9 ]+)')
+
+
+class SyntheticConversation:
+    """
+    Deterministic chat generator. Each user turn has about `message_words`
+    words; with probability `fact_density` it states (or updates) one of
+    `fact_keys` facts. Assistant turns are short acknowledgements.
+    The same seed always yields the same conversation.
+    """
+
+    def __init__(self, seed: int = 0, message_words: int = 60, fact_density: float = 0.3, fact_keys: int = 50):
+        self.rng = random.Random(seed)
+        self.message_words = message_words
+        self.fact_density = fact_density
+        self.fact_keys = fact_keys
+
+    def user_message(self, turn: int) -> Dict[str, str]:
+        words = max(1, int(self.rng.gauss(self.message_words, self.message_words / 4)))
+        text = " ".join(self.rng.choice(FILLER) for _ in range(words))
+        if self.rng.random() < self.fact_density:
+            key = f"fact_{self.rng.randrange(self.fact_keys)}"
+            text += f". Note: {key} = value {turn} {self.rng.choice(FILLER)}."
+        return {"role": "user", "content": f"Turn {turn}: {text}"}
+
+    def assistant_message(self, turn: int) -> Dict[str, str]:
+        return {"role": "assistant", "content": f"Got it (turn {turn}), I will keep that in mind."}
+
+
+class MockWorker(LLMProvider):
+    """
+    Worker model stand-in. Each call waits a latency drawn from a lognormal
+    distribution (`latency_ms` median, `latency_sigma` spread) and fails with
+    probability `failure_rate`, either by raising (`"error"`) or returning
+    malformed JSON (`"malformed"`). The response folds every fact stated in
+    the prompt into the ledger and keeps a `summary_words`-word summary.
+    Token counts come from `tokenizer`.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        latency_sigma: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_mode: str = "error",
+        summary_words: int = 80,
+        tokenizer: Optional[TokenCounter] = None,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.summary_words = summary_words
+        self.tokenizer = tokenizer or ApproximateTokenCounter()
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def count_tokens(self, messages, model):
+        return self.tokenizer.count_tokens(messages, model)
+
+    def _latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * self.rng.lognormvariate(0, self.latency_sigma) / 1000.0
+
+    def _respond(self, messages: List[Dict[str, Any]]) -> str:
+        self.calls += 1
+        prompt = "".join(str(m.get("content", "")) for m in messages)
+        self.bytes_in += len(prompt.encode("utf-8"))
+        if self.rng.random() < self.failure_rate:
+            self.failures += 1
+            if self.failure_mode == "error":
+                raise ConnectionError("mock worker failure")
+            content = '{"summary": "truncated'
+        else:
+            ledger = {key: value.strip() for key, value in FACT_PATTERN.findall(prompt)}
+            summary = " ".join(FILLER[i % len(FILLER)] for i in range(self.summary_words))
+            content = json.dumps({"summary": summary, "fact_ledger": ledger})
+        self.bytes_out += len(content.encode("utf-8"))
+        return content
+
+    def completion(self, messages, model, response_format=None):
+        time.sleep(self._latency())
+        return self._respond(messages)
+
+    async def acompletion(self, messages, model, response_format=None):
+        await asyncio.sleep(self._latency())
+        return self._respond(messages)
@@ -1,3 +1,15 @@
+import logging
+
 from .core import Chronicle
 from .storage.base import Storage
-from .storage.memory import InMemoryStorage
\ No newline at end of file
+from .storage.memory import InMemoryStorage
+from .storage.cached import CachedStorage
+from .storage.base import SessionConflictError
+from .tokens import TokenCounter, ApproximateTokenCounter, ExactTokenCounter
+from .instrumentation import Instrumentation, RecordingInstrumentation, OpenTelemetryInstrumentation
+from .compression_cache import CompressionCache
+from .fact_index import FactSelector
+from .episodes import EpisodicMemory
+
+# Library logging: silent unless the application configures handlers
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CompressionQueue:
+    """
+    Bounded asyncio work queue for compressions deferred off the request path.
+
+    Jobs are keyed (by session id). Submitting a key that is still waiting in
+    the queue replaces its job with the newer one instead of queueing a
+    duplicate, so a burst of turns for one session costs one worker call.
+    Worker tasks are started lazily on the running event loop (and restarted
+    if the queue is later used from a different loop).
+    """
+
+    def __init__(self, max_pending: int = 100, workers: int = 2):
+        self.max_pending = max_pending
+        self.workers = workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._running_keys: Dict[str, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._jobs.clear()
+            self._running_keys.clear()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def submit(self, key: str, job: Callable[[], Awaitable[Any]]) -> str:
+        """
+        Queue `job` under `key`. Returns "queued", "coalesced" (replaced a job
+        still waiting for the same key) or "full" (rejected, queue at capacity).
+        """
+        self._ensure_started()
+        if key in self._jobs:
+            self._jobs[key] = job
+            self.coalesced += 1
+            return "coalesced"
+        if len(self._jobs) >= self.max_pending:
+            self.dropped += 1
+            return "full"
+        self._jobs[key] = job
+        self._queue.put_nowait(key)
+        return "queued"
+
+    def is_pending(self, key: str) -> bool:
+        """
+        True while a job for `key` is queued or running.
+        """
+        return key in self._jobs or key in self._running_keys
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._queue.get()
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                self.running += 1
+                self._running_keys[key] = self._running_keys.get(key, 0) + 1
+            try:
+                if job is not None:
+                    await job()
+                    self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Chronicle background compression error: %s", e, extra={"session_id": key})
+            finally:
+                if job is not None:
+                    self.running -= 1
+                    self._running_keys[key] -= 1
+                    if not self._running_keys[key]:
+                        del self._running_keys[key]
+                self._queue.task_done()
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued and running job has finished.
+        Returns False if `timeout` (seconds) expired first.
+        """
+        if self._queue is None:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Drain pending work (up to `timeout` seconds), then stop the workers.
+        """
+        drained = await self.drain(timeout)
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._queue = None
+        self._jobs.clear()
+        self._running_keys.clear()
+        return drained
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._jobs),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
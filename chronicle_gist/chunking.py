@@ -0,0 +1,38 @@
+import json
+from typing import Any, Dict, List
+
+
+def split_by_tokens(messages: List[Dict[str, Any]], token_counts: List[int], budget: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split `messages` into consecutive chunks of at most `budget` tokens each.
+    Order is kept; a single message over the budget gets a chunk of its own.
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = 0
+    for message, tokens in zip(messages, token_counts):
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(message)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def partial_messages(partials: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    Render per-chunk compression results as history messages, in order, so a
+    reduce step can fold them with the ordinary compression prompt.
+    """
+    return [
+        {
+            "role": "system",
+            "content": (
+                f"Part {i} of the conversation. Summary: {partial.get('summary', '')} "
+                f"Facts: {json.dumps(partial.get('fact_ledger', {}))}"
+            ),
+        }
+        for i, partial in enumerate(partials, 1)
+    ]
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .storage.base import Storage
+
+logger = logging.getLogger(__name__)
+
+
+def compression_key(model: str, template: str, summary: str, fact_ledger: Dict[str, Any], history: List[Dict[str, Any]]) -> str:
+    """
+    Content address of one compression request: everything the worker sees.
+    Ledger keys are sorted, so two equal ledgers hash alike whatever their
+    insertion order.
+    """
+    payload = json.dumps([model, template, summary, fact_ledger, history], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompressionCache:
+    """
+    Cache of worker results keyed by `compression_key`, so a retried or
+    replayed compression returns without calling the worker model.
+
+    The local tier is a thread-safe LRU of at most `max_entries` results, each
+    kept for `ttl_seconds`. With `shared` (any `Storage`; Redis, Postgres and
+    Mongo implement the cache entry methods) results are also written there
+    with the same TTL and looked up on a local miss, so replicas share them.
+    Results are stored as JSON and decoded on every hit, so callers get their
+    own copy. Shared tier errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600, shared: Optional[Storage] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_local(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.local_hits += 1
+            return value
+
+    def _put_local(self, key: str, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _shared_hit(self, key: str, value: Optional[str]) -> Optional[Dict[str, Any]]:
+        if value is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.shared_hits += 1
+        self._put_local(key, value)
+        return json.loads(value)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get_local(key)
+        if value is not None:
+            return json.loads(value)
+        if self.shared is not None:
+            try:
+                value = self.shared.get_cache_entry(key)
+            except Exception as e:
+                logger.warning("Compression cache read failed: %s", e)
+        return self._shared_hit(key, value)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._get_local(key)
+        if value is not None:
+            return json.loads(value)
+        if self.shared is not None:
+            try:
+                value = await self.shared.aget_cache_entry(key)
+            except Exception as e:
+                logger.warning("Compression cache read failed: %s", e)
+        return self._shared_hit(key, value)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        value = json.dumps(result)
+        self._put_local(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set_cache_entry(key, value, self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Compression cache write failed: %s", e)
+
+    async def aput(self, key: str, result: Dict[str, Any]) -> None:
+        value = json.dumps(result)
+        self._put_local(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.aset_cache_entry(key, value, self.ttl_seconds)
+            except Exception as e:
+                logger.warning("Compression cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.local_hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,12 +1,31 @@
 import json
 import time
 import asyncio
-from typing import List, Dict, Any, Optional, Union
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable, Awaitable
 
-from .storage.base import Storage
+from .storage.base import SessionConflictError, Storage
 from .storage.memory import InMemoryStorage
 from .llm.base import LLMProvider
 from .llm.default import LitellmProvider
+from .tokens import MessageTokenCounter, TokenCounter
+from .background import CompressionQueue
+from .singleflight import SingleFlight
+from .watermark import make_watermark, split_at_watermark
+from .policy import CompressionPolicy, ThresholdPolicy
+from .ledger import apply_delta, diff_ledgers, merge_ledgers
+from .streaming import IncrementalJSONParser, salvage_state
+from .instrumentation import NO_SPAN, Instrumentation
+from .compression_cache import CompressionCache, compression_key
+from .chunking import partial_messages, split_by_tokens
+from .fact_index import FactSelector
+from .episodes import EpisodicMemory, episode_text
+from .memory_block import MemoryBlockCache, render_facts, render_memory_block
+from .packing import TOOL_ROLES, last_user_turns_start, shrink_tool_message, window_start
+
+logger = logging.getLogger(__name__)
 
 class Chronicle:
     """
@@ -19,6 +38,9 @@ class Chronicle:
         optimized_context = chronicle.process(session_id, query, history)
     """
 
+    # Bump when the worker prompt changes, so cached compression results are not reused
+    PROMPT_VERSION = 1
+
     def __init__(
         self, 
         api_key: Optional[str] = None,
@@ -26,7 +48,31 @@ class Chronicle:
         llm_provider: Optional[LLMProvider] = None,
         model_name: str = "gpt-3.5-turbo", # Worker model for compression
         token_threshold: int = 1000,
-        custom_instructions: Optional[str] = None
+        custom_instructions: Optional[str] = None,
+        token_cache_size: int = 4096,
+        background_compression: bool = False,
+        max_pending_compressions: int = 100,
+        compression_workers: int = 2,
+        distributed_lease: bool = False,
+        lease_ttl_ms: int = 60000,
+        compression_policy: Optional[CompressionPolicy] = None,
+        max_save_retries: int = 3,
+        delta_output: bool = False,
+        stream_compression: bool = False,
+        bloat_token_counter: Optional[TokenCounter] = None,
+        metrics_token_counter: Optional[TokenCounter] = None,
+        instrumentation: Optional[Instrumentation] = None,
+        compression_cache: Optional[CompressionCache] = None,
+        chunk_tokens: Optional[int] = None,
+        chunk_concurrency: int = 4,
+        chunk_retries: int = 2,
+        target_budget: Optional[int] = None,
+        keep_user_turns: int = 0,
+        max_tool_tokens: Optional[int] = None,
+        tool_overflow: str = "trim",
+        fact_selector: Optional[FactSelector] = None,
+        episodic_memory: Optional[EpisodicMemory] = None,
+        memory_cache_size: int = 4096
     ):
         import os
         # 1. Resolve API Key
@@ -40,15 +86,121 @@ class Chronicle:
         # 3. Resolve Threshold
         env_threshold = os.getenv("CHRONICLE_THRESHOLD") # Keep namespaced to avoid collision
         self.token_threshold = int(env_threshold) if env_threshold else token_threshold
+        # Decides strict mode and when to call the worker; defaults to the single threshold
+        self.compression_policy = compression_policy or ThresholdPolicy(self.token_threshold)
 
         self.custom_instructions = custom_instructions
+        # Ask the worker for summary/ledger operations instead of a full rewrite
+        self.delta_output = delta_output
         self.storage = storage or InMemoryStorage()
         self.llm = llm_provider or LitellmProvider(api_key=resolved_key)
+        # Per-message token counts are memoized so each turn only tokenizes new messages.
+        # The bloat check (and every other decision) uses `bloat_token_counter`, e.g. a fast
+        # ApproximateTokenCounter; reported token metrics can use a different, exact one.
+        # Both default to the LLM provider's own counter.
+        self.token_counter = MessageTokenCounter(bloat_token_counter or self.llm, max_entries=token_cache_size)
+        self.metrics_token_counter = None
+        if metrics_token_counter is not None and metrics_token_counter is not bloat_token_counter:
+            self.metrics_token_counter = MessageTokenCounter(metrics_token_counter, max_entries=token_cache_size)
+        # The rendered memory block and its token count, reused while the session state is unchanged
+        self.memory_blocks = MemoryBlockCache(max_entries=memory_cache_size)
+
+        # Deferred mode: process_async returns immediately and compression runs on a bounded queue
+        self.background_compression = background_compression
+        self.compression_queue = CompressionQueue(max_pending=max_pending_compressions, workers=compression_workers)
+        self._background_applied: Dict[str, int] = {}
+
+        # Single-flight: one in-process compression per session at a time; optionally
+        # a storage-backed lease extends that across app instances
+        self._single_flight = SingleFlight()
+        self._detached = set()
+        self.distributed_lease = distributed_lease
+        self.lease_ttl_ms = lease_ttl_ms
+        self.lease_contended = 0
+
+        # Saves are compare-and-set on the session version; a lost race is merged and retried
+        self.max_save_retries = max_save_retries
+        self.save_conflicts = 0
+
+        # Stream worker output so a timed-out caller can use the facts received so far
+        self.stream_compression = stream_compression
+        self._streams: Dict[str, IncrementalJSONParser] = {}
+        self.salvaged_on_timeout = 0
+
+        # Phase timings and event counts go to this hook; None costs nothing per call
+        self.instrumentation = instrumentation
+
+        # Identical compression requests (retries, replays) reuse the earlier worker result
+        self.compression_cache = compression_cache
+
+        # Histories over `chunk_tokens` are compressed as chunks in parallel, then reduced
+        self.chunk_tokens = chunk_tokens
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self.chunk_retries = chunk_retries
+        self.chunked_compressions = 0
+        self.chunks_retried = 0
+
+        # Hybrid mode packs as many recent messages as fit in `target_budget` tokens
+        # (None keeps a fixed window of the last 5); tool messages over `max_tool_tokens`
+        # are trimmed or dropped first
+        if tool_overflow not in ("trim", "drop"):
+            raise ValueError(f"tool_overflow must be 'trim' or 'drop', not {tool_overflow!r}")
+        self.target_budget = target_budget
+        self.keep_user_turns = keep_user_turns
+        self.max_tool_tokens = max_tool_tokens
+        self.tool_overflow = tool_overflow
+
+        # Inject only the ledger entries relevant to the new message (None: the whole ledger)
+        self.fact_selector = fact_selector
+
+        # Archive compressed history verbatim and recall similar episodes into the prompt
+        self.episodic_memory = episodic_memory
+        if episodic_memory is not None and episodic_memory.storage is None:
+            episodic_memory.storage = self.storage
+
+    def _span(self, name: str, **attributes: Any):
+        if self.instrumentation is None:
+            return NO_SPAN
+        return self.instrumentation.span(name, attributes)
+
+    def _event(self, name: str, **attributes: Any) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.on_event(name, attributes)
+
+    def _compression_key(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict) -> str:
+        template = f"{self.PROMPT_VERSION}:{'delta' if self.delta_output else 'full'}"
+        return compression_key(self.model_name, template, current_summary, fact_ledger, raw_history)
+
+    def _cache_hit(self, cached: Optional[Dict], session_id: Optional[str]) -> bool:
+        self._event("compression_cache_hit" if cached is not None else "compression_cache_miss", session_id=session_id)
+        return cached is not None
+
+    def _worker_failed(self, event: str, error: Exception, session_id: Optional[str]) -> None:
+        self._event(event, session_id=session_id)
+        logger.warning("Chronicle compression failed (%s): %s", event, error, extra={"session_id": session_id})
 
     def _estimate_tokens(self, messages: Union[str, List[Dict[str, str]]]) -> int:
-        return self.llm.count_tokens(messages, model=self.model_name)
+        with self._span("tokens.count"):
+            return self.token_counter.count(messages, model=self.model_name)
+
+    def _history_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """
+        Tokens of messages as part of a longer list (no framing overhead).
+        """
+        with self._span("tokens.count"):
+            return sum(self.token_counter.count_message(m, self.model_name) for m in messages)
+
+    def _new_tokens(self, raw_history: List[Dict[str, str]], state: Dict[str, Any], total_tokens: int) -> int:
+        """
+        Tokens not yet folded into the stored summary, from the token count kept in the watermark.
+        Divergence is only checked (by hash) when compressing.
+        """
+        watermark = state.get("watermark")
+        if not watermark or watermark.get("count", 0) > len(raw_history):
+            return total_tokens
+        return max(0, total_tokens - watermark.get("tokens", 0))
 
-    def _compress_history(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict) -> Optional[Dict]:
+    def _build_compression_messages(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict) -> List[Dict[str, str]]:
         facts_str = json.dumps(fact_ledger, indent=2)
         history_str = json.dumps(raw_history)
         
@@ -67,30 +219,9 @@ class Chronicle:
         
         Do not lose important details. Merge new info with old info.
         """
-        
-        try:
-            content = self.llm.completion(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a precise JSON state manager."},
-                    {"role": "user", "content": system_prompt}
-                ],
-                response_format="json_object"
-            )
-            return json.loads(content)
-        except Exception as e:
-            print(f"Chronicle Compression Error: {e}")
-            return None
-
-    async def _compress_history_async(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict) -> Optional[Dict]:
-        """
-        Async version of history compression.
-        """
-        facts_str = json.dumps(fact_ledger, indent=2)
-        history_str = json.dumps(raw_history)
-        
-        system_prompt = f"""
-        You are the "Chronicle" engine. Your job is to compress chat history into a concise summary and a structured Fact Ledger.
+        if self.delta_output:
+            system_prompt = f"""
+        You are the "Chronicle" engine. Your job is to fold new chat history into an existing summary and Fact Ledger.
         
         Current Summary: {current_summary}
         Current Facts: {facts_str}
@@ -98,80 +229,399 @@ class Chronicle:
         New Chat History to Process:
         {history_str}
         
-        Output a valid JSON object with two keys:
-        1. "summary": Updated narrative summary of the conversation.
-        2. "fact_ledger": Updated dictionary of key facts about the user or project.
+        Output ONLY the changes, as a valid JSON object with two keys:
+        1. "summary": {{"op": "append", "text": "..."}} to add new narrative, or
+           {{"op": "replace", "text": "..."}} only if the summary must be rewritten.
+        2. "ledger_ops": a list of fact changes, each one of
+           {{"op": "set", "key": "...", "value": ...}} to add or change a fact,
+           {{"op": "delete", "key": "..."}} to remove an obsolete fact,
+           {{"op": "append", "key": "...", "value": ...}} to add an item to a list fact.
         
-        Do not lose important details. Merge new info with old info.
+        Do not restate unchanged facts. Use an empty list if no facts changed.
         """
-        
+        return [
+            {"role": "system", "content": "You are a precise JSON state manager."},
+            {"role": "user", "content": system_prompt}
+        ]
+
+    def _parse_worker_output(self, content: str, current_summary: str, fact_ledger: Dict) -> Dict:
+        """
+        Parse the worker response into a full {"summary", "fact_ledger"} state.
+        Delta responses are validated and applied to the state they were built from.
+        """
+        output = json.loads(content)
+        if self.delta_output:
+            return apply_delta(current_summary, fact_ledger, output)
+        return output
+
+    def _chunk_history(self, raw_history: List[Dict]) -> Optional[List[List[Dict]]]:
+        """
+        Token-budgeted chunks of `raw_history`, or None when it fits in one worker call.
+        """
+        if not self.chunk_tokens:
+            return None
+        with self._span("tokens.count"):
+            counts = [self.token_counter.count_message(m, self.model_name) for m in raw_history]
+        if sum(counts) <= self.chunk_tokens:
+            return None
+        return split_by_tokens(raw_history, counts, self.chunk_tokens)
+
+    def _compress_history(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict, session_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Fold `raw_history` into the current summary and fact ledger.
+        Callers pass only the messages after the stored watermark when they can.
+
+        A history over `chunk_tokens` is map-reduced: each chunk is compressed on
+        its own (up to `chunk_concurrency` at a time, each retried up to
+        `chunk_retries` times), and the partial results are folded into the
+        current state with the ordinary prompt, after further rounds of chunking
+        if they are still over budget.
+        """
+        chunks = self._chunk_history(raw_history)
+        if chunks is None:
+            return self._compress_once(raw_history, current_summary, fact_ledger, session_id)
+        self.chunked_compressions += 1
+        episodes = None
+        while True:
+            with ThreadPoolExecutor(max_workers=min(self.chunk_concurrency, len(chunks))) as pool:
+                partials = list(pool.map(lambda chunk: self._compress_chunk(chunk, session_id), chunks))
+            if any(partial is None for partial in partials):
+                return None
+            if episodes is None:
+                episodes = self._chunk_episodes(chunks, partials)
+            parts = partial_messages(partials)
+            next_chunks = self._chunk_history(parts)
+            # Reduce into the stored state once the partials fit, or stop shrinking
+            if next_chunks is None or len(next_chunks) >= len(chunks):
+                return self._with_episodes(self._compress_once(parts, current_summary, fact_ledger, session_id), episodes)
+            chunks = next_chunks
+
+    def _chunk_episodes(self, chunks: List[List[Dict]], partials: List[Dict]) -> List[Dict[str, Any]]:
+        if self.episodic_memory is None:
+            return []
+        return self.episodic_memory.make_episodes([(chunk, partial.get("summary", "")) for chunk, partial in zip(chunks, partials)])
+
+    @staticmethod
+    def _with_episodes(new_state: Optional[Dict], episodes: List[Dict[str, Any]]) -> Optional[Dict]:
+        # First-round chunks and their mini-summaries, for the episodic archive
+        if not new_state or not episodes:
+            return new_state
+        return dict(new_state, episodes=episodes)
+
+    def _compress_chunk(self, chunk: List[Dict], session_id: Optional[str]) -> Optional[Dict]:
+        for attempt in range(self.chunk_retries + 1):
+            if attempt:
+                self.chunks_retried += 1
+                self._event("chunk_retry", session_id=session_id)
+            partial = self._compress_once(chunk, "", {}, session_id)
+            if partial:
+                return partial
+        return None
+
+    def _compress_once(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict, session_id: Optional[str] = None) -> Optional[Dict]:
+        key = None
+        if self.compression_cache is not None:
+            key = self._compression_key(raw_history, current_summary, fact_ledger)
+            cached = self.compression_cache.get(key)
+            if self._cache_hit(cached, session_id):
+                return cached
+
+        messages = self._build_compression_messages(raw_history, current_summary, fact_ledger)
         try:
-            content = await self.llm.acompletion(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a precise JSON state manager."},
-                    {"role": "user", "content": system_prompt}
-                ],
-                response_format="json_object"
-            )
-            return json.loads(content)
+            with self._span("compression.llm"):
+                content = self.llm.completion(
+                    model=self.model_name,
+                    messages=messages,
+                    response_format="json_object"
+                )
         except Exception as e:
-            print(f"Chronicle Async Compression Error: {e}")
+            self._worker_failed("worker_error", e, session_id)
             return None
+        try:
+            new_state = self._parse_worker_output(content, current_summary, fact_ledger)
+        except Exception as e:
+            self._worker_failed("json_parse_failure", e, session_id)
+            return None
+        if key is not None:
+            self.compression_cache.put(key, new_state)
+        return new_state
 
-    def process(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]]) -> Dict[str, Any]:
+    async def _compress_history_async(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict, stream_key: Optional[str] = None) -> Optional[Dict]:
         """
-        Main entry point. Processes a message and history to return optimized context.
+        Async `_compress_history`; chunks run concurrently over `acompletion`.
+        Only the final reduce is streamed under `stream_key`.
         """
-        start_time = time.time()
-        
-        # 1. Get State
-        state = self.storage.get_session(session_id)
-        if not state:
-            state = {"summary": "", "fact_ledger": {}, "updated_at": time.time()}
+        chunks = self._chunk_history(raw_history)
+        if chunks is None:
+            return await self._compress_once_async(raw_history, current_summary, fact_ledger, stream_key)
+        self.chunked_compressions += 1
+        limit = asyncio.Semaphore(self.chunk_concurrency)
 
-        current_summary = state.get("summary", "")
-        current_facts = state.get("fact_ledger", {})
+        async def compress_chunk(chunk: List[Dict]) -> Optional[Dict]:
+            async with limit:
+                for attempt in range(self.chunk_retries + 1):
+                    if attempt:
+                        self.chunks_retried += 1
+                        self._event("chunk_retry", session_id=stream_key)
+                    partial = await self._compress_once_async(chunk, "", {})
+                    # A salvaged stream is incomplete; retry the chunk instead
+                    if partial and not partial.get("partial"):
+                        return partial
+                return None
 
-        # 2. Check for Bloat
-        naive_messages = raw_history + [new_message]
-        original_token_count = self._estimate_tokens(naive_messages)
-        
-        bloat_detected = original_token_count > self.token_threshold
-        
-        # 3. Process Bloat
-        if bloat_detected:
-            new_state = self._compress_history(raw_history, current_summary, current_facts)
-            if new_state:
-                current_summary = new_state.get("summary", current_summary)
-                current_facts = new_state.get("fact_ledger", current_facts)
-                self.storage.save_session(session_id, current_summary, current_facts)
-        
-        # 4. Hydrate Prompt
-        system_message = f"""
-        [MEMORY RECALL]
-        Summary: {current_summary}
-        
-        [FACT LEDGER]
-        {json.dumps(current_facts, indent=2)}
+        episodes = None
+        while True:
+            partials = await asyncio.gather(*(compress_chunk(chunk) for chunk in chunks))
+            if any(partial is None for partial in partials):
+                return None
+            if episodes is None:
+                episodes = self._chunk_episodes(chunks, partials)
+            parts = partial_messages(partials)
+            next_chunks = self._chunk_history(parts)
+            if next_chunks is None or len(next_chunks) >= len(chunks):
+                return self._with_episodes(await self._compress_once_async(parts, current_summary, fact_ledger, stream_key), episodes)
+            chunks = next_chunks
+
+    async def _compress_once_async(self, raw_history: List[Dict], current_summary: str, fact_ledger: Dict, stream_key: Optional[str] = None) -> Optional[Dict]:
         """
-        
-        hydrated_messages = []
-        if bloat_detected:
-            # Strict mode: System + New Message
-            hydrated_messages = [
-                {"role": "system", "content": system_message},
-                new_message
-            ]
+        Async `_compress_once`: one worker call for the whole history.
+        With `stream_compression`, the response is parsed as it streams in and the
+        parser is published under `stream_key` for timed-out callers. If the stream
+        breaks, whatever arrived complete is returned with "partial": True.
+        """
+        key = None
+        if self.compression_cache is not None:
+            key = self._compression_key(raw_history, current_summary, fact_ledger)
+            cached = await self.compression_cache.aget(key)
+            if self._cache_hit(cached, stream_key):
+                return cached
+
+        messages = self._build_compression_messages(raw_history, current_summary, fact_ledger)
+        if not self.stream_compression:
+            try:
+                with self._span("compression.llm"):
+                    content = await self.llm.acompletion(
+                        model=self.model_name,
+                        messages=messages,
+                        response_format="json_object"
+                    )
+            except Exception as e:
+                self._worker_failed("worker_error", e, stream_key)
+                return None
+            try:
+                new_state = self._parse_worker_output(content, current_summary, fact_ledger)
+            except Exception as e:
+                self._worker_failed("json_parse_failure", e, stream_key)
+                return None
+            if key is not None:
+                await self.compression_cache.aput(key, new_state)
+            return new_state
+
+        parser = IncrementalJSONParser()
+        if stream_key is not None:
+            self._streams[stream_key] = parser
+        received = False
+        try:
+            with self._span("compression.llm", stream=True):
+                async for chunk in self.llm.astream_completion(
+                    model=self.model_name,
+                    messages=messages,
+                    response_format="json_object"
+                ):
+                    parser.feed(chunk)
+            received = True
+            new_state = self._parse_worker_output(parser.text, current_summary, fact_ledger)
+        except Exception as e:
+            self._worker_failed("json_parse_failure" if received else "worker_error", e, stream_key)
+            salvaged, facts, _ = salvage_state(parser, current_summary, fact_ledger, self.delta_output)
+            if salvaged is None:
+                return None
+            return dict(salvaged, partial=True, salvaged_facts=facts)
+        if key is not None:
+            await self.compression_cache.aput(key, new_state)
+        return new_state
+
+    def _apply_compression(self, new_state: Dict, current_summary: str, current_facts: Dict) -> Tuple[str, Dict]:
+        return new_state.get("summary", current_summary), new_state.get("fact_ledger", current_facts)
+
+    def _episodes_to_archive(self, pending_history: List[Dict], new_state: Dict) -> List[Dict[str, Any]]:
+        """
+        Episodes for a compressed span: the chunks of a chunked compression with
+        their mini-summaries, else the span cut into `episode_tokens` pieces.
+        """
+        if "episodes" in new_state:
+            return new_state["episodes"]
+        counts = [self.token_counter.count_message(m, self.model_name) for m in pending_history]
+        chunks = split_by_tokens(pending_history, counts, self.episodic_memory.episode_tokens)
+        return self.episodic_memory.make_episodes([(chunk, "") for chunk in chunks])
+
+    def _archive_episodes(self, session_id: str, pending_history: List[Dict], new_state: Dict) -> None:
+        if self.episodic_memory is None:
+            return
+        try:
+            with self._span("episodes.archive"):
+                self.episodic_memory.archive(session_id, self._episodes_to_archive(pending_history, new_state))
+        except Exception as e:
+            logger.warning("Episode archive failed: %s", e, extra={"session_id": session_id})
+
+    async def _archive_episodes_async(self, session_id: str, pending_history: List[Dict], new_state: Dict) -> None:
+        if self.episodic_memory is None:
+            return
+        try:
+            with self._span("episodes.archive"):
+                await self.episodic_memory.aarchive(session_id, self._episodes_to_archive(pending_history, new_state))
+        except Exception as e:
+            logger.warning("Episode archive failed: %s", e, extra={"session_id": session_id})
+
+    def _episode_tokens(self, text: str) -> int:
+        return self.token_counter.count_message({"role": "system", "content": text}, self.model_name)
+
+    @staticmethod
+    def _query_text(new_message: Dict[str, str]) -> str:
+        content = new_message.get("content", "")
+        return content if isinstance(content, str) else json.dumps(content, default=str)
+
+    def _empty_state(self, session_id: str) -> Dict[str, Any]:
+        """
+        State of a session with nothing stored: new, expired or deleted. An
+        episode index left from an earlier life of the session is dropped.
+        """
+        if self.episodic_memory is not None:
+            self.episodic_memory.forget(session_id)
+        return {"summary": "", "fact_ledger": {}, "updated_at": time.time(), "version": 0}
+
+    def _recall_episodes(self, session_id: str, new_message: Dict[str, str]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        if self.episodic_memory is None:
+            return [], None
+        try:
+            with self._span("episodes.recall"):
+                return self.episodic_memory.recall(session_id, self._query_text(new_message), self._episode_tokens)
+        except Exception as e:
+            logger.warning("Episode recall failed: %s", e, extra={"session_id": session_id})
+            return [], None
+
+    async def _recall_episodes_async(self, session_id: str, new_message: Dict[str, str]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        if self.episodic_memory is None:
+            return [], None
+        try:
+            with self._span("episodes.recall"):
+                return await self.episodic_memory.arecall(session_id, self._query_text(new_message), self._episode_tokens)
+        except Exception as e:
+            logger.warning("Episode recall failed: %s", e, extra={"session_id": session_id})
+            return [], None
+
+    def _ledger_tokens(self, facts: Dict) -> int:
+        # Counted as a message so repeated ledgers hit the token cache
+        return self.token_counter.count_message({"role": "system", "content": render_facts(facts)}, self.model_name)
+
+    def _fact_tokens(self, key: str, value: Any) -> int:
+        return self.token_counter.count_message({"role": "system", "content": json.dumps({key: value}, default=str)}, self.model_name)
+
+    def _select_facts(self, session_id: str, current_facts: Dict, new_message: Dict[str, str]) -> Tuple[Dict, Optional[Dict[str, Any]]]:
+        """
+        Ledger entries to inject for `new_message`, and what the selection saved
+        against injecting the full ledger. Without a `fact_selector`, the full ledger.
+        """
+        if self.fact_selector is None or not current_facts:
+            return current_facts, None
+        with self._span("fact_selection"):
+            selected = self.fact_selector.select(session_id, current_facts, self._query_text(new_message), self._fact_tokens)
+            full_tokens = self._ledger_tokens(current_facts)
+            selected_tokens = self._ledger_tokens(selected)
+        return selected, {
+            "facts_total": len(current_facts),
+            "facts_selected": len(selected),
+            "full_ledger_tokens": full_tokens,
+            "selected_tokens": selected_tokens,
+            "tokens_saved": full_tokens - selected_tokens,
+        }
+
+    @staticmethod
+    def _state_stamp(state: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        """
+        Identifies a stored state for `MemoryBlockCache`: its version plus its
+        save time, since versions start over when a session expires. None if
+        the storage does not version sessions.
+        """
+        version = state.get("version")
+        return None if version is None else (version, state.get("updated_at"))
+
+    def _memory_messages(self, session_id: str, current_summary: str, current_facts: Dict, recalled: Optional[List[Dict[str, Any]]] = None, stamp: Optional[Tuple[Any, ...]] = None) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        The memory block system message (rendered once per state, see
+        `MemoryBlockCache`), then recalled episodes, if any, in a message of
+        their own so the memory block stays a stable prompt prefix. `stamp`
+        identifies the stored state the summary and facts are taken from,
+        with the selected fact keys when only part of its ledger is injected;
+        None when they differ from any stored state.
+        """
+        cached = self.memory_blocks.get(session_id, current_summary, current_facts, stamp)
+        if cached is not None:
+            text, tokens = cached
         else:
-            # Hybrid mode: System + Sliding Window + New Message
-            # Keep last 5 messages for fidelity if under threshold
-            recent_messages = raw_history[-5:] if len(raw_history) > 5 else raw_history
-            hydrated_messages = [
-                {"role": "system", "content": system_message}
-            ] + recent_messages + [new_message]
+            text = render_memory_block(current_summary, current_facts, self.custom_instructions)
+            tokens = self.token_counter.count_message({"role": "system", "content": text}, self.model_name)
+            self.memory_blocks.put(session_id, current_summary, current_facts, text, tokens, stamp)
+        messages = [{"role": "system", "content": text}]
+        if recalled:
+            episodes = "\n---\n".join(episode_text(episode) for episode in recalled)
+            messages.append({"role": "system", "content": f"[EPISODIC RECALL]\n{episodes}"})
+        return messages, {"tokens": tokens, "cached": cached is not None}
 
-        # 5. Calculate Metrics
+    def _hydrate(self, memory_messages: List[Dict[str, str]], bloat_detected: bool, uncovered_history: List[Dict[str, str]], raw_history: List[Dict[str, str]], new_message: Dict[str, str]) -> Tuple[List[Dict[str, str]], Optional[Dict[str, Any]]]:
+        """
+        Build the optimized prompt after the memory messages.
+        Strict mode appends only the messages the stored memory does not cover yet
+        (none once compression has caught up); hybrid mode keeps a sliding window,
+        packed to `target_budget` when set. Returns the messages and, for a packed
+        window, how the budget was spent.
+        """
+        if bloat_detected:
+            # Strict mode: System + Uncovered Messages + New Message
+            return memory_messages + uncovered_history + [new_message], None
+
+        # Hybrid mode: System + Sliding Window + New Message
+        if self.target_budget is not None:
+            return self._pack_window(memory_messages, raw_history, new_message)
+        # Keep last 5 messages for fidelity if under threshold
+        recent_messages = raw_history[-5:] if len(raw_history) > 5 else raw_history
+        return memory_messages + recent_messages + [new_message], None
+
+    def _pack_window(self, memory_messages: List[Dict[str, str]], raw_history: List[Dict[str, str]], new_message: Dict[str, str]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Memory block, then the longest run of recent messages that fits in
+        `target_budget`, then the new message. Per-message counts come from the
+        token cache, so only the cut itself is searched each turn.
+        """
+        fixed = memory_messages + [new_message]
+        fixed_tokens = self._estimate_tokens(fixed)
+        with self._span("tokens.count"):
+            history = list(raw_history)
+            counts = [self.token_counter.count_message(m, self.model_name) for m in history]
+            shrunk = []
+            if self.max_tool_tokens is not None:
+                for i, message in enumerate(history):
+                    if message.get("role") in TOOL_ROLES and counts[i] > self.max_tool_tokens:
+                        history[i] = shrink_tool_message(message, counts[i], self.max_tool_tokens, self.tool_overflow)
+                        counts[i] = self.token_counter.count_message(history[i], self.model_name)
+                        shrunk.append(i)
+
+        available = self.target_budget - fixed_tokens
+        start = window_start(counts, available, last_user_turns_start(history, self.keep_user_turns))
+        window = history[start:]
+        window_tokens = sum(counts[start:])
+        budget = {
+            "target": self.target_budget,
+            "memory_and_new_message": fixed_tokens,
+            "window": window_tokens,
+            "window_messages": len(window),
+            "dropped_messages": start,
+            "tool_messages_shrunk": sum(1 for i in shrunk if i >= start),
+            "unused": self.target_budget - fixed_tokens - window_tokens,
+        }
+        return memory_messages + window + [new_message], budget
+
+    def _finalize(self, hydrated_messages: List[Dict[str, str]], naive_messages: List[Dict[str, str]], original_token_count: int, meta: Dict[str, Any], current_facts: Dict, start_time: float) -> Dict[str, Any]:
         optimized_token_count = self._estimate_tokens(hydrated_messages)
         
         # Best-of-two check
@@ -183,12 +633,18 @@ class Chronicle:
             final_messages = naive_messages
             final_token_count = original_token_count
             used_strategy = "naive"
+            self._event("naive_fallback")
+
+        if self.metrics_token_counter is not None:
+            with self._span("tokens.count", metrics=True):
+                original_token_count = self.metrics_token_counter.count(naive_messages, model=self.model_name)
+                final_token_count = self.metrics_token_counter.count(final_messages, model=self.model_name)
 
         return {
             "hydrated_messages": final_messages,
             "meta": {
                 "strategy": used_strategy,
-                "bloat_detected": bloat_detected,
+                **meta,
                 "original_tokens": original_token_count,
                 "final_tokens": final_token_count,
                 "tokens_saved": max(0, original_token_count - final_token_count),
@@ -197,94 +653,473 @@ class Chronicle:
             }
         }
 
-    async def process_async(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]], timeout: int = 10000) -> Dict[str, Any]:
+    def _rebase(self, latest: Dict[str, Any], base_facts: Dict, facts: Dict, watermark: Optional[Dict[str, Any]]) -> Optional[Dict]:
         """
-        Async entry point. Processes a message and history to return optimized context without blocking.
-        :param timeout: Milliseconds to wait for compression before falling back to previous state. Default: 10000ms (10s).
+        After a lost save race: None if the concurrently saved state already covers
+        at least as much history (adopt it), else our ledger changes merged onto it.
+        """
+        if (latest.get("watermark") or {}).get("count", 0) >= (watermark or {}).get("count", 0):
+            return None
+        return merge_ledgers(base_facts, facts, latest.get("fact_ledger", {}))
+
+    def _save_state(self, session_id: str, summary: str, facts: Dict, watermark: Optional[Dict[str, Any]], state: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Save a compressed state conditionally on the version it was built from,
+        sending only the facts that differ from that version's ledger.
+        Returns `(status, state)`: "applied", "superseded" (a concurrent save already
+        covered this history; its state is returned) or "conflict" (retries exhausted;
+        our unsaved state is returned).
+        """
+        base_facts = state.get("fact_ledger", {})
+        expected = state.get("version")
+        for attempt in range(self.max_save_retries + 1):
+            try:
+                changed, removed = diff_ledgers(base_facts, facts)
+                version = self.storage.save_session_patch(session_id, summary, facts, changed, removed, watermark=watermark, expected_version=expected)
+                return "applied", {"summary": summary, "fact_ledger": facts, "watermark": watermark, "version": version}
+            except SessionConflictError:
+                self.save_conflicts += 1
+                self._event("save_conflict", session_id=session_id)
+                if attempt == self.max_save_retries:
+                    break
+                latest = self.storage.get_session(session_id) or {"version": 0}
+                merged = self._rebase(latest, base_facts, facts, watermark)
+                if merged is None:
+                    return "superseded", latest
+                base_facts, facts, expected = latest.get("fact_ledger", {}), merged, latest.get("version", 0)
+        return "conflict", {"summary": summary, "fact_ledger": facts, "watermark": watermark, "version": expected}
+
+    async def _save_state_async(self, session_id: str, summary: str, facts: Dict, watermark: Optional[Dict[str, Any]], state: Dict[str, Any], save: Optional[Callable[..., Awaitable[Optional[int]]]] = None, conflicted: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """
+        Async `_save_state`. `conflicted` starts from a save that already lost
+        its race (the batched path learns that from the bulk write).
+        """
+        base_facts = state.get("fact_ledger", {})
+        expected = state.get("version")
+        for attempt in range(self.max_save_retries + 1):
+            if not conflicted:
+                try:
+                    if save is not None:
+                        version = await save(session_id, summary, facts, watermark=watermark, expected_version=expected)
+                    else:
+                        changed, removed = diff_ledgers(base_facts, facts)
+                        version = await self.storage.asave_session_patch(session_id, summary, facts, changed, removed, watermark=watermark, expected_version=expected)
+                    return "applied", {"summary": summary, "fact_ledger": facts, "watermark": watermark, "version": version}
+                except SessionConflictError:
+                    pass
+            conflicted = False
+            self.save_conflicts += 1
+            self._event("save_conflict", session_id=session_id)
+            if attempt == self.max_save_retries:
+                break
+            latest = await self.storage.aget_session(session_id) or {"version": 0}
+            merged = self._rebase(latest, base_facts, facts, watermark)
+            if merged is None:
+                return "superseded", latest
+            base_facts, facts, expected = latest.get("fact_ledger", {}), merged, latest.get("version", 0)
+        return "conflict", {"summary": summary, "fact_ledger": facts, "watermark": watermark, "version": expected}
+
+    def process(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Main entry point. Processes a message and history to return optimized context.
+        Compression always runs inline here; `background_compression` only applies to `process_async`.
         """
+        with self._span("process", session_id=session_id, mode="sync"):
+            return self._process(session_id, new_message, raw_history)
+
+    def _process(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]]) -> Dict[str, Any]:
         start_time = time.time()
         
-        # 1. Get State (Async)
-        state = await self.storage.aget_session(session_id)
+        # 1. Get State
+        with self._span("storage.get"):
+            state = self.storage.get_session(session_id)
         if not state:
-            state = {"summary": "", "fact_ledger": {}, "updated_at": time.time()}
+            state = self._empty_state(session_id)
 
         current_summary = state.get("summary", "")
         current_facts = state.get("fact_ledger", {})
+        stamp = self._state_stamp(state)
 
         # 2. Check for Bloat
         naive_messages = raw_history + [new_message]
         original_token_count = self._estimate_tokens(naive_messages)
         
-        bloat_detected = original_token_count > self.token_threshold
-        timed_out = False
+        new_tokens = self._new_tokens(raw_history, state, original_token_count)
+        decision = self.compression_policy.decide(original_token_count, new_tokens, state)
+        bloat_detected = decision.strict
+        compression = "none"
+        compression_scope = None
+        uncovered_history = []
+        if bloat_detected:
+            self._event("bloat_triggered", session_id=session_id)
         
         # 3. Process Bloat
         if bloat_detected:
-            try:
-                # Convert ms to seconds for asyncio
-                timeout_seconds = timeout / 1000.0
-                new_state = await asyncio.wait_for(
-                    self._compress_history_async(raw_history, current_summary, current_facts),
-                    timeout=timeout_seconds
-                )
+            # Only messages after the watermark are new to the summary
+            watermark = state.get("watermark")
+            pending_history, is_delta = split_at_watermark(raw_history, watermark)
+            compression_scope = "delta" if is_delta else "full"
+            if not pending_history:
+                compression = "up_to_date"
+            elif is_delta and not decision.compress:
+                # Memory plus the verbatim tail is still small enough; wait for more new tokens
+                compression = "not_due"
+                uncovered_history = pending_history
+            else:
+                new_state = self._compress_history(pending_history, current_summary, current_facts, session_id=session_id)
                 if new_state:
-                    current_summary = new_state.get("summary", current_summary)
-                    current_facts = new_state.get("fact_ledger", current_facts)
-                    await self.storage.asave_session(session_id, current_summary, current_facts)
-            except asyncio.TimeoutError:
-                print(f"Chronicle Compression Timed Out after {timeout}ms")
-                timed_out = True
+                    current_summary, current_facts = self._apply_compression(new_state, current_summary, current_facts)
+                    stamp = None
+                    new_watermark = make_watermark(pending_history, base=watermark if is_delta else None, tokens=self._history_tokens(pending_history))
+                    with self._span("storage.save"):
+                        compression, saved = self._save_state(session_id, current_summary, current_facts, new_watermark, state)
+                    if compression == "applied":
+                        self._archive_episodes(session_id, pending_history, new_state)
+                    else:
+                        # Hydrate from whichever state won; it may not cover our latest messages
+                        current_summary, current_facts = saved.get("summary", ""), saved.get("fact_ledger", {})
+                        uncovered_history, _ = split_at_watermark(raw_history, saved.get("watermark"))
+                else:
+                    compression = "failed"
+                    uncovered_history = pending_history
         
         # 4. Hydrate Prompt
-        system_content = f"""
-        [MEMORY RECALL]
-        Summary: {current_summary}
-        
-        [FACT LEDGER]
-        {json.dumps(current_facts, indent=2)}
+        recalled, episodes = self._recall_episodes(session_id, new_message)
+        with self._span("hydration"):
+            injected_facts, fact_selection = self._select_facts(session_id, current_facts, new_message)
+            if stamp is not None and injected_facts is not current_facts:
+                stamp += (tuple(injected_facts),)
+            memory_messages, memory_block = self._memory_messages(session_id, current_summary, injected_facts, recalled, stamp)
+            hydrated_messages, budget = self._hydrate(memory_messages, bloat_detected, uncovered_history, raw_history, new_message)
+
+        # 5. Calculate Metrics
+        meta = {
+            "bloat_detected": bloat_detected,
+            "new_tokens": new_tokens,
+            "compression": compression,
+            "compression_scope": compression_scope,
+            "memory_block": memory_block,
+        }
+        if budget is not None:
+            meta["budget"] = budget
+        if fact_selection is not None:
+            meta["fact_selection"] = fact_selection
+        if episodes is not None:
+            meta["episodes"] = episodes
+        return self._finalize(hydrated_messages, naive_messages, original_token_count, meta, current_facts, start_time)
+
+    async def process_async(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]], timeout: int = 10000) -> Dict[str, Any]:
+        """
+        Async entry point. Processes a message and history to return optimized context without blocking.
+        :param timeout: Milliseconds to wait for compression before falling back to previous state. Default: 10000ms (10s).
+            Ignored with `background_compression`, where the call never waits for the worker model.
+        """
+        start_time = time.time()
+        with self._span("process", session_id=session_id, mode="async"):
+            # 1. Get State (Async)
+            with self._span("storage.get"):
+                state = await self.storage.aget_session(session_id)
+            return await self._process_state_async(session_id, new_message, raw_history, state, timeout, start_time)
+
+    async def process_many_async(self, requests: List[Dict[str, Any]], concurrency: int = 16, timeout: int = 10000) -> List[Dict[str, Any]]:
+        """
+        Batched entry point for many sessions at once.
+        Fetches every session state in one bulk storage call, processes the requests
+        with at most `concurrency` in flight, then writes all updated states back in
+        one bulk call. Sessions whose bulk save lost a version race are merged and
+        saved again individually. Compressions that outlive `timeout` finish in the
+        background and save individually.
+        :param requests: Dicts with "session_id", "new_message" and "raw_history".
+        :param timeout: Per-request compression timeout in milliseconds, as in `process_async`.
+        :return: Results in the same order as `requests`.
+        """
+        start_time = time.time()
+        session_ids = list(dict.fromkeys(r["session_id"] for r in requests))
+        with self._span("storage.get", sessions=len(session_ids)):
+            states = await self.storage.aget_sessions(session_ids)
+        loaded = dict(states)
+        pending_saves: Dict[str, Dict[str, Any]] = {}
+        flushed = False
+
+        async def collect_save(session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+            if flushed:
+                # A timed-out flight finishing after the bulk write saves on its own
+                return await self.storage.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+            first = pending_saves.get(session_id)
+            # The bulk write is conditional on the version loaded at the start of the batch
+            expected = first["expected_version"] if first else expected_version
+            pending_saves[session_id] = {"summary": summary, "fact_ledger": fact_ledger, "watermark": watermark, "expected_version": expected}
+            version = expected_version + 1 if expected_version is not None else None
+            # Later requests for the same session in this batch build on the new state
+            states[session_id] = {"summary": summary, "fact_ledger": fact_ledger, "updated_at": time.time(), "watermark": watermark, "version": version}
+            return version
+
+        # Under a distributed lease each compression must save before releasing it
+        save = None if self.distributed_lease else collect_save
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(request: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                session_id = request["session_id"]
+                with self._span("process", session_id=session_id, mode="batch"):
+                    return await self._process_state_async(
+                        session_id, request["new_message"], request["raw_history"],
+                        states.get(session_id), timeout, start_time, save=save
+                    )
+
+        results = await asyncio.gather(*[run_one(r) for r in requests])
+        flushed = True
+        if pending_saves:
+            with self._span("storage.save", sessions=len(pending_saves)):
+                conflicts = await self.storage.asave_sessions(pending_saves) or []
+                await asyncio.gather(*[
+                    self._save_state_async(
+                        sid, pending_saves[sid]["summary"], pending_saves[sid]["fact_ledger"], pending_saves[sid]["watermark"],
+                        loaded.get(sid) or {"version": 0}, conflicted=True
+                    )
+                    for sid in conflicts
+                ])
+        return list(results)
+
+    async def _process_state_async(self, session_id: str, new_message: Dict[str, str], raw_history: List[Dict[str, str]], state: Optional[Dict[str, Any]], timeout: int, start_time: float, save: Optional[Callable[..., Awaitable[Optional[int]]]] = None) -> Dict[str, Any]:
+        """
+        `process_async` after the state has been loaded. `save` overrides how a new
+        state is persisted (the batched path collects them for one bulk write).
         """
+        if not state:
+            state = self._empty_state(session_id)
+
+        current_summary = state.get("summary", "")
+        current_facts = state.get("fact_ledger", {})
+        stamp = self._state_stamp(state)
+
+        # 2. Check for Bloat
+        naive_messages = raw_history + [new_message]
+        original_token_count = self._estimate_tokens(naive_messages)
         
-        if self.custom_instructions:
-            system_content = f"{self.custom_instructions}\n\n{system_content}"
+        new_tokens = self._new_tokens(raw_history, state, original_token_count)
+        decision = self.compression_policy.decide(original_token_count, new_tokens, state)
+        bloat_detected = decision.strict
+        timed_out = False
+        time_to_first_fact_ms = None
+        salvaged_facts = 0
+        salvaged_summary = False
+        compression = "none"
+        compression_scope = None
+        uncovered_history = []
+        if bloat_detected:
+            self._event("bloat_triggered", session_id=session_id)
         
-        hydrated_messages = []
+        # 3. Process Bloat
         if bloat_detected:
-            # Strict mode: System + New Message
-            hydrated_messages = [
-                {"role": "system", "content": system_content},
-                new_message
-            ]
-        else:
-            # Hybrid mode: System + Sliding Window + New Message
-            recent_messages = raw_history[-5:] if len(raw_history) > 5 else raw_history
-            hydrated_messages = [
-                {"role": "system", "content": system_content}
-            ] + recent_messages + [new_message]
+            # Only messages after the watermark are new to the summary
+            watermark = state.get("watermark")
+            pending_history, is_delta = split_at_watermark(raw_history, watermark)
+            compression_scope = "delta" if is_delta else "full"
+            if not pending_history:
+                compression = "up_to_date"
+            elif is_delta and not decision.compress:
+                # Memory plus the verbatim tail is still small enough; wait for more new tokens
+                compression = "not_due"
+                uncovered_history = pending_history
+            elif self.background_compression:
+                # Hydrate from the stored state now; the worker result lands in storage later
+                submitted = self.compression_queue.submit(
+                    session_id, functools.partial(self._compress_in_background, session_id, list(raw_history), time.perf_counter())
+                )
+                compression = "dropped" if submitted == "full" else "pending"
+                uncovered_history = pending_history
+            else:
+                # Concurrent callers for this session share one compression.
+                # The flight is shielded so it still saves its result if this caller times out.
+                flight = asyncio.ensure_future(self._single_flight.run(
+                    session_id, functools.partial(self._compression_flight, session_id, list(raw_history), state, save)
+                ))
+                self._track(flight)
+                try:
+                    # Convert ms to seconds for asyncio
+                    timeout_seconds = timeout / 1000.0
+                    (status, new_state), shared = await asyncio.wait_for(asyncio.shield(flight), timeout=timeout_seconds)
+                    if not new_state:
+                        uncovered_history = pending_history
+                    else:
+                        current_summary, current_facts = new_state["summary"], new_state["fact_ledger"]
+                        stamp = None
+                        if shared or status != "applied":
+                            # Another flight's watermark may not cover this caller's latest messages
+                            uncovered_history, _ = split_at_watermark(raw_history, new_state.get("watermark"))
+                        time_to_first_fact_ms = new_state.get("time_to_first_fact_ms")
+                        salvaged_facts = new_state.get("salvaged_facts", 0)
+                    compression = "shared" if shared and status == "applied" else status
+                except asyncio.TimeoutError:
+                    self._event("compression_timeout", session_id=session_id)
+                    logger.warning("Chronicle compression timed out after %sms", timeout, extra={"session_id": session_id})
+                    timed_out = True
+                    compression = "timed_out"
+                    uncovered_history = pending_history
+                    parser = self._streams.get(session_id)
+                    if parser is not None:
+                        # The flight keeps running; meanwhile use what has fully arrived.
+                        # The uncovered messages stay verbatim, so nothing is lost if it's partial.
+                        time_to_first_fact_ms = parser.time_to_first_member_ms()
+                        salvaged, salvaged_facts, salvaged_summary = salvage_state(parser, current_summary, current_facts, self.delta_output)
+                        if salvaged is not None:
+                            current_summary, current_facts = salvaged["summary"], salvaged["fact_ledger"]
+                            stamp = None
+                            self.salvaged_on_timeout += 1
+        
+        # 4. Hydrate Prompt
+        recalled, episodes = await self._recall_episodes_async(session_id, new_message)
+        with self._span("hydration"):
+            injected_facts, fact_selection = self._select_facts(session_id, current_facts, new_message)
+            if stamp is not None and injected_facts is not current_facts:
+                stamp += (tuple(injected_facts),)
+            memory_messages, memory_block = self._memory_messages(session_id, current_summary, injected_facts, recalled, stamp)
+            hydrated_messages, budget = self._hydrate(memory_messages, bloat_detected, uncovered_history, raw_history, new_message)
 
         # 5. Calculate Metrics
-        optimized_token_count = self._estimate_tokens(hydrated_messages)
-        
-        # Best-of-two check
-        final_messages = hydrated_messages
-        final_token_count = optimized_token_count
-        used_strategy = "smart"
-        
-        if optimized_token_count > original_token_count:
-            final_messages = naive_messages
-            final_token_count = original_token_count
-            used_strategy = "naive"
+        meta = {
+            "bloat_detected": bloat_detected,
+            "new_tokens": new_tokens,
+            "compression": compression,
+            "compression_scope": compression_scope,
+            "compression_pending": self.background_compression and self.compression_queue.is_pending(session_id),
+            "background_applied": self._background_applied.pop(session_id, 0),
+            "timed_out": timed_out,
+            "time_to_first_fact_ms": time_to_first_fact_ms,
+            "salvaged_facts": salvaged_facts,
+            "salvaged_summary": salvaged_summary,
+            "memory_block": memory_block,
+        }
+        if budget is not None:
+            meta["budget"] = budget
+        if fact_selection is not None:
+            meta["fact_selection"] = fact_selection
+        if episodes is not None:
+            meta["episodes"] = episodes
+        return self._finalize(hydrated_messages, naive_messages, original_token_count, meta, current_facts, start_time)
 
+    async def _compression_flight(self, session_id: str, raw_history: List[Dict[str, str]], state: Optional[Dict[str, Any]] = None, save: Optional[Callable[..., Awaitable[Optional[int]]]] = None) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Compress whatever `raw_history` has beyond the stored watermark and save it
+        (through `save` if given, else `storage.asave_session`).
+        Returns `(status, state)`: status is "applied", "up_to_date", "failed",
+        "contended" (another instance holds the distributed lease), "salvaged" (the
+        worker stream broke; the facts received were saved without advancing the
+        watermark), or "superseded" / "conflict" from a lost save race (see
+        `_save_state`); state carries summary, fact_ledger, watermark and version
+        when known, plus stream metrics with `stream_compression`.
+        """
+        lease_name = f"compress:{session_id}"
+        token = None
+        if self.distributed_lease:
+            token = await self.storage.aacquire_lease(lease_name, self.lease_ttl_ms)
+            if token is None:
+                self.lease_contended += 1
+                return "contended", None
+            # Another instance may have saved while we were deciding to compress
+            state = None
+
+        try:
+            if state is None:
+                with self._span("storage.get"):
+                    state = await self.storage.aget_session(session_id) or {"version": 0}
+            current_summary = state.get("summary", "")
+            current_facts = state.get("fact_ledger", {})
+            watermark = state.get("watermark")
+            pending_history, is_delta = split_at_watermark(raw_history, watermark)
+            if not pending_history:
+                return "up_to_date", {"summary": current_summary, "fact_ledger": current_facts, "watermark": watermark, "version": state.get("version")}
+
+            new_state = await self._compress_history_async(pending_history, current_summary, current_facts, stream_key=session_id)
+            parser = self._streams.pop(session_id, None)
+            if not new_state:
+                return "failed", None
+            current_summary, current_facts = self._apply_compression(new_state, current_summary, current_facts)
+            if new_state.get("partial"):
+                # Persist what arrived but keep the old watermark, so the same
+                # history is compressed again instead of being marked as covered
+                with self._span("storage.save"):
+                    status, saved = await self._save_state_async(session_id, current_summary, current_facts, watermark, state, save)
+                status = "salvaged" if status == "applied" else status
+                saved = dict(saved, salvaged_facts=new_state.get("salvaged_facts", 0))
+            else:
+                new_watermark = make_watermark(pending_history, base=watermark if is_delta else None, tokens=self._history_tokens(pending_history))
+                with self._span("storage.save"):
+                    status, saved = await self._save_state_async(session_id, current_summary, current_facts, new_watermark, state, save)
+                if status == "applied":
+                    await self._archive_episodes_async(session_id, pending_history, new_state)
+            if parser is not None:
+                saved = dict(saved, time_to_first_fact_ms=parser.time_to_first_member_ms())
+            return status, saved
+        finally:
+            self._streams.pop(session_id, None)
+            if token is not None:
+                await self.storage.arelease_lease(lease_name, token)
+
+    async def _compress_in_background(self, session_id: str, raw_history: List[Dict[str, str]], submitted_at: Optional[float] = None) -> None:
+        """
+        Deferred compression job. Re-reads the session when it actually runs, so a
+        job that waited in the queue only compresses what is still uncovered.
+        """
+        if submitted_at is not None and self.instrumentation is not None:
+            self.instrumentation.on_phase("compression.queue_wait", (time.perf_counter() - submitted_at) * 1000, {"session_id": session_id})
+        (status, _), shared = await self._single_flight.run(
+            session_id, functools.partial(self._compression_flight, session_id, raw_history)
+        )
+        if status == "applied" and not shared:
+            self._background_applied[session_id] = self._background_applied.get(session_id, 0) + 1
+
+    def _track(self, task: "asyncio.Future") -> None:
+        """
+        Keep a reference to a compression that may outlive its caller, so drain() can wait for it.
+        """
+        self._detached.add(task)
+        task.add_done_callback(self._detached.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Counters for sizing and monitoring: worker compressions started, duplicates
+        avoided by single-flight, distributed lease contention, lost save races,
+        timed-out calls that used a partially streamed result, chunked (map-reduce)
+        compressions and chunk retries, queue, token cache, memory block cache and
+        compression cache (hit rate).
+        """
         return {
-            "hydrated_messages": final_messages,
-            "meta": {
-                "strategy": used_strategy,
-                "bloat_detected": bloat_detected,
-                "timed_out": timed_out,
-                "original_tokens": original_token_count,
-                "final_tokens": final_token_count,
-                "tokens_saved": max(0, original_token_count - final_token_count),
-                "latency_ms": round((time.time() - start_time) * 1000, 2),
-                "fact_ledger": current_facts
-            }
+            "compressions_started": self._single_flight.executed,
+            "compressions_deduplicated": self._single_flight.deduplicated,
+            "lease_contended": self.lease_contended,
+            "save_conflicts": self.save_conflicts,
+            "salvaged_on_timeout": self.salvaged_on_timeout,
+            "chunked_compressions": self.chunked_compressions,
+            "chunks_retried": self.chunks_retried,
+            "queue": self.compression_queue.stats(),
+            "token_cache": self.token_counter.stats(),
+            "memory_block_cache": self.memory_blocks.stats(),
+            "compression_cache": self.compression_cache.stats() if self.compression_cache is not None else None,
         }
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for queued background compressions, and inline ones whose callers
+        timed out, to finish and be saved.
+        :param timeout: Seconds to wait. Returns False if it expired first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        drained = await self.compression_queue.drain(timeout)
+        if self._detached:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            _, still_running = await asyncio.wait(list(self._detached), timeout=remaining)
+            drained = drained and not still_running
+        return drained
+
+    async def aclose(self, timeout: Optional[float] = None) -> bool:
+        """
+        Graceful shutdown: drain background compressions (up to `timeout` seconds),
+        then stop the queue workers. Returns False if work was left unfinished.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        drained = await self.drain(timeout)
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return await self.compression_queue.close(remaining) and drained
@@ -0,0 +1,246 @@
+import copy
+import json
+import math
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .fact_index import terms
+from .storage.base import Storage
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("EpisodicMemory requires NumPy: pip install 'chronicle-gist[episodic]'") from e
+    return numpy
+
+
+def episode_text(episode: Dict[str, Any]) -> str:
+    """
+    An episode as prompt text: its mini-summary, if any, then the raw messages.
+    """
+    lines = [f"Summary: {episode['summary']}"] if episode.get("summary") else []
+    for message in episode.get("messages", []):
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        lines.append(f"{message.get('role', '')}: {content}")
+    return "\n".join(lines)
+
+
+class HashingEmbedder:
+    """
+    Local text vectors with the hashing trick: each term is hashed (CRC-32,
+    so vectors are stable across processes) to one of `dim` signed buckets,
+    weighted 1 + log(tf), and the vector is L2-normalized. No model, no network.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, text: str) -> Any:
+        np = _numpy()
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term, tf in Counter(terms(text)).items():
+            h = zlib.crc32(term.encode("utf-8"))
+            vector[h % self.dim] += (1.0 + math.log(tf)) * (1.0 if h & 0x80000000 else -1.0)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+class EpisodeIndex:
+    """
+    One session's episodes and their vectors, as rows of a matrix grown by
+    doubling, so a search is one matrix-vector product plus a partial sort.
+    """
+
+    def __init__(self, dim: int):
+        self.vectors = _numpy().zeros((16, dim), dtype=_numpy().float32)
+        self.episodes: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.episodes)
+
+    def add(self, episodes: List[Dict[str, Any]], embedder: HashingEmbedder) -> None:
+        np = _numpy()
+        needed = len(self.episodes) + len(episodes)
+        if needed > len(self.vectors):
+            grown = np.zeros((max(needed, 2 * len(self.vectors)), self.vectors.shape[1]), dtype=np.float32)
+            grown[:len(self.episodes)] = self.vectors[:len(self.episodes)]
+            self.vectors = grown
+        for episode in episodes:
+            self.vectors[len(self.episodes)] = embedder.embed(episode_text(episode))
+            self.episodes.append(episode)
+
+    def snapshot(self) -> "EpisodeIndex":
+        """
+        The current rows, searchable without the lock while this index keeps
+        growing. Vectors are shared, not copied: rows already written never
+        change, and growing moves them to a new matrix.
+        """
+        view = copy.copy(self)
+        view.vectors = self.vectors[:len(self.episodes)]
+        view.episodes = list(self.episodes)
+        return view
+
+    def search(self, query: Any, k: int) -> List[Tuple[int, float]]:
+        """
+        Indexes and cosine scores of the `k` most similar episodes, best first.
+        """
+        np = _numpy()
+        n = len(self.episodes)
+        if not n or k <= 0:
+            return []
+        scores = self.vectors[:n] @ query
+        if k < n:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(n)
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class EpisodicMemory:
+    """
+    Third memory tier: compressed history is archived verbatim as episodes
+    (raw messages plus a mini-summary when the compression was chunked)
+    through the storage backend, and the episodes most similar to a new
+    message are recalled into the prompt.
+
+    Episodes are embedded locally with `HashingEmbedder` and searched in a
+    per-session in-process index, kept for up to `max_sessions` sessions and
+    caught up from storage on every search, so episodes archived by other
+    instances are found too. Each catch-up re-reads the last indexed
+    episode, and an index whose archive was dropped with its session is
+    rebuilt. Recall returns up to `top_k` episodes scoring at least
+    `min_score` that fit in `token_budget` tokens. Histories compressed in
+    one piece are archived in episodes of about `episode_tokens` tokens.
+    `storage` defaults to the Chronicle's storage. Requires NumPy.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[Storage] = None,
+        top_k: int = 3,
+        token_budget: int = 500,
+        min_score: float = 0.1,
+        episode_tokens: int = 512,
+        dim: int = 1024,
+        max_sessions: int = 256,
+    ):
+        _numpy()
+        self.storage = storage
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.episode_tokens = episode_tokens
+        self.embedder = HashingEmbedder(dim)
+        self.max_sessions = max_sessions
+        self._indexes: "OrderedDict[str, EpisodeIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_episodes(parts: List[Tuple[List[Dict[str, Any]], str]]) -> List[Dict[str, Any]]:
+        now = time.time()
+        return [{"summary": summary, "messages": messages, "archived_at": now} for messages, summary in parts]
+
+    def _index(self, session_id: str) -> EpisodeIndex:
+        with self._lock:
+            index = self._indexes.get(session_id)
+            if index is None:
+                index = self._indexes[session_id] = EpisodeIndex(self.embedder.dim)
+                while len(self._indexes) > self.max_sessions:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(session_id)
+            return index
+
+    @staticmethod
+    def _fetch_start(index: EpisodeIndex) -> int:
+        # Re-read the last indexed episode too, so a changed archive shows up
+        return max(len(index) - 1, 0)
+
+    def _catch_up(self, session_id: str, index: EpisodeIndex, start: int, fetched: List[Dict[str, Any]]) -> bool:
+        """
+        Add the episodes in `fetched` (read from position `start`) that `index`
+        lacks, under the lock. If the archive no longer holds the episode last
+        indexed at `start`, it was dropped with an expired or deleted session
+        and perhaps refilled: the index is discarded and False returned.
+        """
+        if start < len(index) and (not fetched or fetched[0] != index.episodes[start]):
+            if self._indexes.get(session_id) is index:
+                del self._indexes[session_id]
+            return False
+        # Another caller may have indexed some of these since they were fetched
+        new = fetched[len(index) - start:]
+        if new:
+            index.add(new, self.embedder)
+        return True
+
+    def archive(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if episodes:
+            self.storage.append_episodes(session_id, episodes)
+
+    async def aarchive(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if episodes:
+            await self.storage.aappend_episodes(session_id, episodes)
+
+    def _select(self, index: EpisodeIndex, query: str, count_tokens: Callable[[str], int]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        start = time.perf_counter()
+        # Over-fetch a little, since some hits may not fit the token budget
+        hits = index.search(self.embedder.embed(query), 2 * self.top_k)
+        search_ms = (time.perf_counter() - start) * 1000
+        chosen: List[int] = []
+        used = 0
+        for i, score in hits:
+            if score < self.min_score or len(chosen) >= self.top_k:
+                break
+            tokens = count_tokens(episode_text(index.episodes[i]))
+            if used + tokens > self.token_budget:
+                continue
+            chosen.append(i)
+            used += tokens
+        recalled = [index.episodes[i] for i in sorted(chosen)]
+        return recalled, {"searched": len(index), "recalled": len(recalled), "tokens": used, "search_ms": round(search_ms, 3)}
+
+    def recall(self, session_id: str, query: str, count_tokens: Callable[[str], int]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Episodes to inject for `query`, in archive order, and recall metrics.
+        `count_tokens(text)` prices one episode.
+        """
+        while True:
+            index = self._index(session_id)
+            start = self._fetch_start(index)
+            fetched = self.storage.get_episodes(session_id, start=start)
+            with self._lock:
+                if not self._catch_up(session_id, index, start, fetched):
+                    continue
+                snapshot = index.snapshot()
+            # Scored and priced unlocked, so recalls for other sessions are not held up
+            return self._select(snapshot, query, count_tokens)
+
+    async def arecall(self, session_id: str, query: str, count_tokens: Callable[[str], int]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Async `recall`.
+        """
+        while True:
+            index = self._index(session_id)
+            start = self._fetch_start(index)
+            fetched = await self.storage.aget_episodes(session_id, start=start)
+            with self._lock:
+                if not self._catch_up(session_id, index, start, fetched):
+                    continue
+                snapshot = index.snapshot()
+            # Scored and priced unlocked, so recalls for other sessions are not held up
+            return self._select(snapshot, query, count_tokens)
+
+    def forget(self, session_id: str) -> None:
+        """
+        Drop the session's index; the next recall rebuilds it from storage.
+        """
+        with self._lock:
+            self._indexes.pop(session_id, None)
@@ -0,0 +1,141 @@
+import copy
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .ledger import diff_ledgers
+
+_TERM = re.compile(r"[^\W_]+")
+
+
+def terms(text: str) -> List[str]:
+    """
+    Lowercased alphanumeric terms; underscores split, so `shipping_address`
+    matches "shipping" and "address".
+    """
+    return _TERM.findall(text.lower())
+
+
+def fact_text(key: str, value: Any) -> str:
+    return f"{key} {value if isinstance(value, str) else json.dumps(value, default=str)}"
+
+
+class FactIndex:
+    """
+    BM25 inverted index over one session's fact ledger; each fact (key and
+    value) is a document. `update` re-indexes only the facts that changed.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.facts: Dict[str, Any] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def update(self, ledger: Dict[str, Any]) -> None:
+        changed, removed = diff_ledgers(self.facts, ledger)
+        for key in removed:
+            self._remove(key)
+            del self.facts[key]
+        for key, value in changed.items():
+            if key in self.facts:
+                self._remove(key)
+            # A copy, so facts changed in place are still seen as changed next time
+            self.facts[key] = copy.deepcopy(value)
+            counts = Counter(terms(fact_text(key, value)))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[key] = tf
+            self._lengths[key] = sum(counts.values())
+            self._total_length += self._lengths[key]
+
+    def _remove(self, key: str) -> None:
+        for term in set(terms(fact_text(key, self.facts[key]))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(key, 0)
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """
+        Facts matching any query term, best first.
+        """
+        n = len(self.facts)
+        if not n:
+            return []
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / avg_length)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        # Ties break by key so results do not depend on set iteration order
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+class FactSelector:
+    """
+    Picks the ledger entries worth injecting for a message: the `pinned_keys`
+    that exist, then up to `top_k` facts ranked by BM25 against the message,
+    while they fit in `token_budget` tokens (pinned facts always go in).
+    Selected facts keep their ledger order. One `FactIndex` per session is
+    kept in an LRU of `max_sessions` and brought up to date incrementally.
+    """
+
+    def __init__(self, top_k: int = 10, token_budget: Optional[int] = None, pinned_keys: Iterable[str] = (), max_sessions: int = 1024):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.pinned_keys = list(pinned_keys)
+        self.max_sessions = max_sessions
+        self._indexes: "OrderedDict[str, FactIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rank(self, session_id: str, ledger: Dict[str, Any], query: str) -> List[Tuple[str, float]]:
+        """
+        Bring the session's index up to `ledger` and search it for `query`.
+        """
+        with self._lock:
+            index = self._indexes.get(session_id)
+            if index is None:
+                index = self._indexes[session_id] = FactIndex()
+                while len(self._indexes) > self.max_sessions:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(session_id)
+            index.update(ledger)
+            return index.search(query)
+
+    def select(self, session_id: str, ledger: Dict[str, Any], query: str, fact_tokens: Callable[[str, Any], int]) -> Dict[str, Any]:
+        """
+        The selected sub-ledger. `fact_tokens(key, value)` prices one fact.
+        """
+        chosen = [key for key in self.pinned_keys if key in ledger]
+        used = sum(fact_tokens(key, ledger[key]) for key in chosen)
+        ranked = 0
+        for key, _ in self.rank(session_id, ledger, query):
+            if ranked >= self.top_k:
+                break
+            if key in chosen:
+                continue
+            cost = fact_tokens(key, ledger[key])
+            if self.token_budget is not None and used + cost > self.token_budget:
+                continue
+            chosen.append(key)
+            used += cost
+            ranked += 1
+        selected = set(chosen)
+        return {key: value for key, value in ledger.items() if key in selected}
+
+    def forget(self, session_id: str) -> None:
+        with self._lock:
+            self._indexes.pop(session_id, None)
@@ -0,0 +1,152 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Optional
+
+# Phases timed per call (see Chronicle):
+#   process                  the whole call (root span)
+#   storage.get              loading session state
+#   tokens.count             token counting for the bloat check and metrics
+#   compression.queue_wait   time a background compression waited for a worker
+#   compression.llm          the worker model call (streamed or not)
+#   storage.save             saving a compressed state, conflict retries included
+#   hydration                building the optimized prompt
+#   fact_selection           picking the ledger entries to inject (inside hydration)
+#   episodes.archive         archiving compressed history as episodes
+#   episodes.recall          finding episodes similar to the new message
+# Events counted:
+#   bloat_triggered, compression_timeout, json_parse_failure, worker_error,
+#   save_conflict, naive_fallback, compression_cache_hit, compression_cache_miss,
+#   chunk_retry
+
+
+class _Span:
+    __slots__ = ("hook", "name", "attributes", "start")
+
+    def __init__(self, hook: "Instrumentation", name: str, attributes: Dict[str, Any]):
+        self.hook = hook
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.hook.on_phase(self.name, (time.perf_counter() - self.start) * 1000, self.attributes)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+# Shared by every call when no hook is installed
+NO_SPAN = _NoSpan()
+
+
+class Instrumentation:
+    """
+    Hook for per-phase timings and event counts.
+
+    Override `on_phase` and `on_event` to forward them to a metrics system;
+    override `span` too when phases should become trace spans (see
+    `OpenTelemetryInstrumentation`). Both callbacks run inline on the request
+    path, so they should be cheap and must not raise.
+    """
+
+    def span(self, name: str, attributes: Dict[str, Any]) -> ContextManager[Any]:
+        """
+        Context manager around one phase; reports its duration to `on_phase`.
+        """
+        return _Span(self, name, attributes)
+
+    def on_phase(self, name: str, duration_ms: float, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def on_event(self, name: str, attributes: Dict[str, Any]) -> None:
+        pass
+
+
+class RecordingInstrumentation(Instrumentation):
+    """
+    Aggregates phase timings (count, total and max milliseconds) and event
+    counts in memory; `snapshot()` returns them. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.events: Dict[str, int] = {}
+
+    def on_phase(self, name: str, duration_ms: float, attributes: Dict[str, Any]) -> None:
+        with self._lock:
+            phase = self.phases.get(name)
+            if phase is None:
+                phase = self.phases[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            phase["count"] += 1
+            phase["total_ms"] += duration_ms
+            phase["max_ms"] = max(phase["max_ms"], duration_ms)
+
+    def on_event(self, name: str, attributes: Dict[str, Any]) -> None:
+        with self._lock:
+            self.events[name] = self.events.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": {name: dict(phase) for name, phase in self.phases.items()},
+                "events": dict(self.events),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.phases.clear()
+            self.events.clear()
+
+
+def _otel_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenTelemetry attribute values must be str, bool, int or float
+    return {k: v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Phases become spans named `chronicle.<phase>` (nested under the
+    caller's current span) and are recorded in the `chronicle.phase.duration`
+    histogram; events go to the `chronicle.events` counter and onto the
+    current span. Requires `opentelemetry-api`; without an SDK configured
+    everything is a no-op. Session ids are kept on spans only, not on metrics.
+    """
+
+    def __init__(self, tracer: Optional[Any] = None, meter: Optional[Any] = None):
+        from opentelemetry import metrics, trace
+
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("chronicle_gist")
+        meter = meter or metrics.get_meter("chronicle_gist")
+        self._durations = meter.create_histogram("chronicle.phase.duration", unit="ms", description="Chronicle phase duration")
+        self._events = meter.create_counter("chronicle.events", description="Chronicle events")
+
+    @contextmanager
+    def span(self, name: str, attributes: Dict[str, Any]):
+        start = time.perf_counter()
+        with self.tracer.start_as_current_span(f"chronicle.{name}", attributes=_otel_attributes(attributes)) as span:
+            try:
+                yield span
+            finally:
+                self.on_phase(name, (time.perf_counter() - start) * 1000, attributes)
+
+    def on_phase(self, name: str, duration_ms: float, attributes: Dict[str, Any]) -> None:
+        labels = _otel_attributes({k: v for k, v in attributes.items() if k != "session_id"})
+        self._durations.record(duration_ms, dict(labels, phase=name))
+
+    def on_event(self, name: str, attributes: Dict[str, Any]) -> None:
+        labels = _otel_attributes({k: v for k, v in attributes.items() if k != "session_id"})
+        self._events.add(1, dict(labels, event=name))
+        self._trace.get_current_span().add_event(name, _otel_attributes(attributes))
@@ -0,0 +1,98 @@
+from typing import Any, Dict, List, Tuple
+
+# Marks a key removed from the ledger in a three-way merge
+_MISSING = object()
+
+
+def merge_ledgers(base: Dict[str, Any], ours: Dict[str, Any], theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Three-way merge of fact ledgers that both started from `base`.
+    Keys we added, changed or removed relative to `base` win; every other
+    key keeps the value from `theirs` (the concurrently saved ledger).
+    """
+    merged = dict(theirs)
+    for key in set(base) | set(ours):
+        mine = ours.get(key, _MISSING)
+        if mine == base.get(key, _MISSING):
+            continue
+        if mine is _MISSING:
+            merged.pop(key, None)
+        else:
+            merged[key] = mine
+    return merged
+
+
+def diff_ledgers(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Facts set or changed in `new`, and keys removed from `old`.
+    """
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+_LEDGER_OPS = ("set", "delete", "append")
+
+
+def apply_delta(summary: str, ledger: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a delta-mode worker response to the stored summary and ledger and
+    return the full new state ({"summary", "fact_ledger"}). The stored state
+    is not modified.
+
+    Expected shape:
+        {
+            "summary": {"op": "append" | "replace", "text": str},  # optional
+            "ledger_ops": [
+                {"op": "set", "key": str, "value": any},
+                {"op": "delete", "key": str},
+                {"op": "append", "key": str, "value": any}  # onto a list fact
+            ]
+        }
+    Raises ValueError on a malformed operation, so a bad response is rejected
+    as a whole instead of being half-applied. Deleting a missing key is a no-op.
+    """
+    if not isinstance(delta, dict):
+        raise ValueError("Delta must be a JSON object")
+
+    new_summary = summary
+    summary_op = delta.get("summary")
+    if isinstance(summary_op, str):
+        # Plain text is treated as a replacement
+        new_summary = summary_op
+    elif summary_op is not None:
+        if not isinstance(summary_op, dict) or not isinstance(summary_op.get("text"), str):
+            raise ValueError(f"Invalid summary operation: {summary_op!r}")
+        if summary_op.get("op") == "replace":
+            new_summary = summary_op["text"]
+        elif summary_op.get("op") == "append":
+            text = summary_op["text"].strip()
+            new_summary = f"{summary}\n{text}" if summary and text else (summary or text)
+        else:
+            raise ValueError(f"Unknown summary op: {summary_op.get('op')!r}")
+
+    ops = delta.get("ledger_ops", [])
+    if not isinstance(ops, list):
+        raise ValueError("ledger_ops must be a list")
+
+    new_ledger = dict(ledger)
+    for op in ops:
+        if not isinstance(op, dict) or op.get("op") not in _LEDGER_OPS:
+            raise ValueError(f"Invalid ledger operation: {op!r}")
+        key = op.get("key")
+        if not isinstance(key, str) or not key:
+            raise ValueError(f"Ledger operation needs a string key: {op!r}")
+        if op["op"] == "delete":
+            new_ledger.pop(key, None)
+            continue
+        if "value" not in op:
+            raise ValueError(f"Ledger operation needs a value: {op!r}")
+        if op["op"] == "set":
+            new_ledger[key] = op["value"]
+        else:
+            current = new_ledger.get(key, [])
+            if not isinstance(current, list):
+                raise ValueError(f"Cannot append to non-list fact {key!r}")
+            new_ledger[key] = current + [op["value"]]
+
+    return {"summary": new_summary, "fact_ledger": new_ledger}
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Union
+from typing import AsyncIterator, List, Dict, Any, Union
 
 class LLMProvider(ABC):
     """
@@ -27,3 +27,10 @@ class LLMProvider(ABC):
         Async generate a completion from the LLM.
         """
         pass
+
+    async def astream_completion(self, messages: List[Dict[str, str]], model: str, response_format: str = None) -> AsyncIterator[str]:
+        """
+        Async generate a completion as a stream of text chunks.
+        Providers without streaming yield the full `acompletion` result as one chunk.
+        """
+        yield await self.acompletion(messages, model, response_format)
@@ -1,6 +1,18 @@
-from typing import List, Dict, Union
-import litellm
+import logging
+from typing import AsyncIterator, List, Dict, Union
 from .base import LLMProvider
+from ..tokens import ApproximateTokenCounter
+
+logger = logging.getLogger(__name__)
+
+_FALLBACK_COUNTER = ApproximateTokenCounter()
+
+
+def _litellm():
+    # litellm takes hundreds of milliseconds to import; only pay for it on first use
+    import litellm
+
+    return litellm
 
 class LitellmProvider(LLMProvider):
     """
@@ -19,20 +31,21 @@ class LitellmProvider(LLMProvider):
 
     def count_tokens(self, messages: Union[str, List[Dict[str, str]]], model: str) -> int:
         try:
+            litellm = _litellm()
             if isinstance(messages, str):
                 return litellm.token_counter(model=model, messages=[{"role": "user", "content": messages}])
             return litellm.token_counter(model=model, messages=messages)
         except Exception as e:
-            # Fallback for minimal robustness
-            print(f"Token count error: {e}")
-            return len(str(messages)) // 4
+            # Fallback for minimal robustness: a local estimate, no stringifying of the whole list
+            logger.warning("Token count error, using a local estimate: %s", e, extra={"model": model})
+            return _FALLBACK_COUNTER.count_tokens(messages, model)
 
     def completion(self, messages: List[Dict[str, str]], model: str, response_format: str = None) -> str:
         kwargs = {}
         if response_format == "json_object":
              kwargs["response_format"] = {"type": "json_object"}
 
-        response = litellm.completion(
+        response = _litellm().completion(
             model=model,
             messages=messages,
             **kwargs
@@ -44,9 +57,27 @@ class LitellmProvider(LLMProvider):
         if response_format == "json_object":
              kwargs["response_format"] = {"type": "json_object"}
 
-        response = await litellm.acompletion(
+        response = await _litellm().acompletion(
             model=model,
             messages=messages,
             **kwargs
         )
         return response.choices[0].message.content
+
+    async def astream_completion(self, messages: List[Dict[str, str]], model: str, response_format: str = None) -> AsyncIterator[str]:
+        kwargs = {}
+        if response_format == "json_object":
+             kwargs["response_format"] = {"type": "json_object"}
+
+        response = await _litellm().acompletion(
+            model=model,
+            messages=messages,
+            stream=True,
+            **kwargs
+        )
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                yield content
@@ -0,0 +1,76 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def render_facts(facts: Dict[str, Any]) -> str:
+    """
+    Deterministic ledger text: sorted keys, one line, non-ASCII kept as is.
+    """
+    return json.dumps(facts, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def render_memory_block(summary: str, facts: Dict[str, Any], custom_instructions: Optional[str] = None) -> str:
+    """
+    The memory system message. Custom instructions and the summary come first
+    and change least often, so the rendered text keeps a stable prefix for
+    provider-side prompt caching; the same state always renders identically.
+    """
+    parts = [custom_instructions] if custom_instructions else []
+    parts.append(f"[MEMORY RECALL]\nSummary: {summary}")
+    parts.append(f"[FACT LEDGER]\n{render_facts(facts)}")
+    return "\n\n".join(parts)
+
+
+class MemoryBlockCache:
+    """
+    Last rendered memory block and its token count per session (LRU of
+    `max_entries` sessions). With a `version` identifying the stored state
+    the block was rendered from, an entry is reused while the version is
+    unchanged, one comparison however large the state. Without one, the
+    summary and ledger are compared instead. Either way the same string
+    object is handed back each time, which keeps the token cache lookup for
+    it O(1). `max_entries=0` disables it.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, str, Dict[str, Any], str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _matches(entry: Tuple[Any, str, Dict[str, Any], str, int], summary: str, facts: Dict[str, Any], version: Any) -> bool:
+        if version is not None:
+            return entry[0] == version
+        return entry[1] == summary and entry[2] == facts
+
+    def get(self, session_id: str, summary: str, facts: Dict[str, Any], version: Any = None) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or not self._matches(entry, summary, facts, version):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[3], entry[4]
+
+    def put(self, session_id: str, summary: str, facts: Dict[str, Any], text: str, tokens: int, version: Any = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            # A shallow copy: ledger values are replaced, never changed in place
+            self._entries[session_id] = (version, summary, dict(facts), text, tokens)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
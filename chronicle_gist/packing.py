@@ -0,0 +1,52 @@
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+TOOL_ROLES = ("tool", "function")
+TRUNCATED = " ...[truncated]"
+OMITTED = "[tool output omitted]"
+
+
+def window_start(token_counts: List[int], available: int, min_start: Optional[int] = None) -> int:
+    """
+    Index of the first message of the longest suffix whose tokens fit in
+    `available`, found by binary search over prefix sums. `min_start` caps
+    the index, so the messages from there on are always kept.
+    """
+    prefix = [0, *accumulate(token_counts)]
+    total = prefix[-1]
+    start = bisect_left(prefix, total - available) if available >= 0 else len(token_counts)
+    start = min(start, len(token_counts))
+    if min_start is not None:
+        start = min(start, min_start)
+    return start
+
+
+def last_user_turns_start(messages: List[Dict[str, Any]], turns: int) -> Optional[int]:
+    """
+    Index of the `turns`-th user message from the end (the first one if there are
+    fewer), or None when `turns` is 0 or there is no user message.
+    """
+    if turns <= 0:
+        return None
+    found = None
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].get("role") == "user":
+            found = i
+            turns -= 1
+            if turns == 0:
+                break
+    return found
+
+
+def shrink_tool_message(message: Dict[str, Any], tokens: int, max_tokens: int, mode: str = "trim") -> Dict[str, Any]:
+    """
+    Copy of an oversized tool message. "trim" keeps the head of its text, cut in
+    proportion to `max_tokens / tokens`; "drop" replaces the text with a short
+    placeholder. The message itself stays, so tool call pairing remains valid.
+    """
+    content = message.get("content")
+    if mode == "drop" or not isinstance(content, str):
+        return dict(message, content=OMITTED)
+    keep = max(0, int(len(content) * max_tokens / tokens) - len(TRUNCATED))
+    return dict(message, content=content[:keep] + TRUNCATED)
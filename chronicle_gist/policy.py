@@ -0,0 +1,68 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, NamedTuple
+
+
+class CompressionDecision(NamedTuple):
+    # Hydrate in strict mode: memory block + messages the memory does not cover yet
+    strict: bool
+    # Call the worker model to fold the uncovered messages into the memory now
+    compress: bool
+
+
+class CompressionPolicy(ABC):
+    """
+    Decides, per turn, whether a session is in strict (summary) mode and
+    whether it is time to run the worker model.
+    """
+
+    @abstractmethod
+    def decide(self, total_tokens: int, new_tokens: int, state: Dict[str, Any]) -> CompressionDecision:
+        """
+        :param total_tokens: Tokens of the full raw history plus the new message.
+        :param new_tokens: Tokens not yet folded into the stored summary (everything
+            after the watermark; equal to `total_tokens` for uncompressed sessions).
+        :param state: Stored session state.
+        """
+        pass
+
+
+class ThresholdPolicy(CompressionPolicy):
+    """
+    Single threshold: strict mode and compression whenever the conversation
+    is over `threshold` tokens. This is the default behavior.
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+
+    def decide(self, total_tokens: int, new_tokens: int, state: Dict[str, Any]) -> CompressionDecision:
+        over = total_tokens > self.threshold
+        return CompressionDecision(strict=over, compress=over)
+
+
+class HysteresisPolicy(CompressionPolicy):
+    """
+    High/low watermark triggering for long-running sessions.
+
+    A session is first compressed once it exceeds `high_watermark` tokens.
+    After that it stays in strict mode while it is above `low_watermark`, and
+    is only recompressed once more than `high_watermark - low_watermark` new
+    tokens have piled up since the last compression. Callers that keep sending
+    the full raw history therefore pay one worker call per band of new tokens
+    instead of one per turn.
+    """
+
+    def __init__(self, high_watermark: int, low_watermark: int):
+        if low_watermark >= high_watermark:
+            raise ValueError("low_watermark must be below high_watermark")
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+
+    def decide(self, total_tokens: int, new_tokens: int, state: Dict[str, Any]) -> CompressionDecision:
+        if not state.get("watermark"):
+            over = total_tokens > self.high_watermark
+            return CompressionDecision(strict=over, compress=over)
+
+        strict = total_tokens > self.low_watermark
+        compress = strict and new_tokens > self.high_watermark - self.low_watermark
+        return CompressionDecision(strict=strict, compress=compress)
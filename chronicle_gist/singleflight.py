@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    Per-key call deduplication for asyncio.
+
+    While a call for a key is in flight, further callers for the same key
+    await the first call's result instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.deduplicated = 0
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run `fn` unless a call for `key` is already in flight.
+        Returns `(result, shared)`, where `shared` is True if the result came
+        from another caller's flight.
+        """
+        loop = asyncio.get_running_loop()
+        existing = self._calls.get(key)
+        if existing is not None and not existing.done() and existing.get_loop() is loop:
+            self.deduplicated += 1
+            # Shield so a follower giving up does not cancel the leader's flight
+            return await asyncio.shield(existing), True
+
+        future = loop.create_future()
+        self._calls[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved: the leader re-raises it, followers are optional
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def in_flight(self, key: str) -> bool:
+        future = self._calls.get(key)
+        return future is not None and not future.done()
@@ -0,0 +1,15 @@
+# Adapters are imported on first access so their drivers load only when used
+_ADAPTERS = {
+    "RedisStorage": ".redis_adapter",
+    "PostgresStorage": ".postgres",
+    "MongoStorage": ".mongo",
+    "Codec": ".codec",
+}
+
+
+def __getattr__(name):
+    if name in _ADAPTERS:
+        import importlib
+
+        return getattr(importlib.import_module(_ADAPTERS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
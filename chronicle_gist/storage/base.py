@@ -1,12 +1,80 @@
+import asyncio
+import functools
+import inspect
+import warnings
 from abc import ABC, abstractmethod
-from typing import Dict, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
+
+# Keywords added to save_session/asave_session after the 3-argument interface
+_SAVE_KEYWORDS = ("watermark", "expected_version")
+
+class SessionConflictError(Exception):
+    """
+    Raised by a conditional save when the stored session version no longer
+    matches `expected_version` (another writer saved in between).
+    """
+
+    def __init__(self, session_id: str, expected_version: Optional[int] = None, actual_version: Optional[int] = None):
+        super().__init__(f"Session {session_id!r} changed concurrently (expected version {expected_version}, found {actual_version})")
+        self.session_id = session_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+def _legacy_save(func: Callable[..., Any]) -> Optional[Callable[..., Any]]:
+    """
+    A wrapper dropping the save keywords `func` does not accept, or None if it
+    accepts them all (or takes **kwargs).
+    """
+    try:
+        params = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind == p.VAR_KEYWORD for p in params.values()):
+        return None
+    dropped = [key for key in _SAVE_KEYWORDS if key not in params]
+    if not dropped:
+        return None
+
+    def accepted(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in kwargs.items() if key not in dropped}
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(self, *args, **kwargs):
+            return await func(self, *args, **accepted(kwargs))
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return func(self, *args, **accepted(kwargs))
+    return wrapper
 
 class Storage(ABC):
     """
     Abstract Base Class for Chronicle Storage.
     Manages persistence of Session State (Summary + Facts).
+
+    Subclasses written against the original `save_session(session_id, summary,
+    fact_ledger)` signature keep working: the `watermark` and `expected_version`
+    keywords are not passed to overrides that do not accept them (with a
+    DeprecationWarning at class definition). Such backends save
+    unconditionally and store no watermark, so Chronicle cannot detect
+    concurrent saves and always compresses the full history.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in ("save_session", "asave_session"):
+            func = cls.__dict__.get(name)
+            wrapper = _legacy_save(func) if func is not None else None
+            if wrapper is not None:
+                warnings.warn(
+                    f"{cls.__name__}.{name} should accept watermark= and expected_version= keywords; "
+                    "they are dropped for this backend, so its saves are unconditional",
+                    DeprecationWarning, stacklevel=2
+                )
+                setattr(cls, name, wrapper)
+
     @abstractmethod
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -16,15 +84,22 @@ class Storage(ABC):
         {
             "summary": str,
             "fact_ledger": dict,
-            "updated_at": float
+            "updated_at": float,
+            "watermark": Optional[dict],  # {"count": int, "hash": str, "tokens": int}
+            "version": int                # bumped by every save; 0 if never versioned
         }
         """
         pass
 
     @abstractmethod
-    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
         """
-        Save or update session state.
+        Save or update session state and return its new version.
+        `watermark` marks the prefix of the raw history already folded into
+        the summary and must be returned as-is by `get_session`.
+        If `expected_version` is given, the save is conditional: it raises
+        `SessionConflictError` unless the stored version still equals it
+        (0 for a session that does not exist). None overwrites unconditionally.
         """
         pass
 
@@ -36,8 +111,120 @@ class Storage(ABC):
         pass
 
     @abstractmethod
-    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
         """
-        Async save or update session state.
+        Async save or update session state, with the same versioning contract as `save_session`.
         """
         pass
+
+    def save_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Save a session whose new ledger differs from the stored one only by the
+        facts in `changed` (set) and the keys in `removed` (deleted); `fact_ledger`
+        is the full new ledger. Same versioning contract as `save_session`.
+        Backends that can update single fields override this to write only the
+        changes; the default writes the full state.
+        """
+        return self.save_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+
+    async def asave_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        """
+        Async `save_session_patch`.
+        """
+        return await self.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+
+    async def aget_sessions(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Bulk retrieve session states, keyed by session id (None if not found).
+        Backends override this with a single round trip; the default issues
+        concurrent `aget_session` calls.
+        """
+        states = await asyncio.gather(*[self.aget_session(sid) for sid in session_ids])
+        return dict(zip(session_ids, states))
+
+    async def asave_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        Bulk save session states. `sessions` maps session id to a dict with
+        "summary", "fact_ledger" and optionally "watermark" and "expected_version".
+        Returns the ids whose conditional save hit a version conflict (and were
+        not written). The default issues concurrent `asave_session` calls.
+        """
+        async def save_one(sid: str, state: Dict[str, Any]) -> Optional[str]:
+            try:
+                await self.asave_session(
+                    sid, state["summary"], state["fact_ledger"],
+                    watermark=state.get("watermark"), expected_version=state.get("expected_version")
+                )
+            except SessionConflictError:
+                return sid
+            return None
+
+        results = await asyncio.gather(*[save_one(sid, state) for sid, state in sessions.items()])
+        return [sid for sid in results if sid is not None]
+
+    async def aacquire_lease(self, name: str, ttl_ms: int) -> Optional[str]:
+        """
+        Try to take a cross-process lease (used to single-flight compressions
+        across app instances). Returns an opaque token on success, or None if
+        another holder has it. Backends without shared locking grant every
+        request; Chronicle still deduplicates within the process.
+        """
+        return "local"
+
+    async def arelease_lease(self, name: str, token: str) -> None:
+        """
+        Release a lease taken with `aacquire_lease`. Must be a no-op if the
+        lease expired and was taken by someone else.
+        """
+        pass
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        """
+        Shared cache tier (used for compression results): the value stored
+        under `key`, or None if missing or expired. Backends without a shared
+        store return None, so only Chronicle's local cache is used.
+        """
+        return None
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        """
+        Store `value` under `key` for `ttl_seconds`. Default: not stored.
+        """
+        pass
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        """
+        Async `get_cache_entry`.
+        """
+        return None
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        """
+        Async `set_cache_entry`.
+        """
+        pass
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        """
+        Episodic archive (see `EpisodicMemory`): append JSON-serializable
+        episodes to the session's archive, keeping their order.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not archive episodes")
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        The session's archived episodes from position `start` on, oldest first.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not archive episodes")
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        """
+        Async `append_episodes`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not archive episodes")
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        """
+        Async `get_episodes`.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not archive episodes")
@@ -0,0 +1,242 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .base import SessionConflictError, Storage
+
+class CachedStorage(Storage):
+    """
+    Read-through / write-through cache in front of another Storage.
+
+    Session reads are served from a bounded local LRU for up to `ttl` seconds;
+    saves go to the inner backend first and then refresh the cache.
+    For several app replicas sharing one backend, either:
+    - pass `publish` (called with the session id after every write) and feed
+      the other replicas' messages into `invalidate`, e.g. with
+      `RedisStorage.apublish_invalidation` / `RedisStorage.asubscribe_invalidations`; or
+    - pass `version_of`, a cheap async lookup of the stored version token
+      (compared with the cached state's "version", falling back to "updated_at"),
+      to revalidate each cached hit.
+    `publish` and `version_of` are coroutines and serve the async methods; the
+    sync methods (threaded `Chronicle.process`) use `publish_sync` and
+    `version_of_sync`, their plain-function counterparts (e.g.
+    `RedisStorage.publish_invalidation`). Without them, sync reads are only
+    as fresh as `ttl` and sync writes are not announced to other replicas.
+    Conditional saves that hit a version conflict drop the cached entry.
+    """
+
+    def __init__(
+        self,
+        inner: Storage,
+        max_entries: int = 10000,
+        ttl: float = 30.0,
+        publish: Optional[Callable[[str], Awaitable[None]]] = None,
+        version_of: Optional[Callable[[str], Awaitable[Any]]] = None,
+        publish_sync: Optional[Callable[[str], None]] = None,
+        version_of_sync: Optional[Callable[[str], Any]] = None
+    ):
+        self.inner = inner
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.publish = publish
+        self.version_of = version_of
+        self.publish_sync = publish_sync
+        self.version_of_sync = version_of_sync
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _lookup(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, state = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[session_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return state
+
+    def _store(self, session_id: str, state: Optional[Dict[str, Any]]) -> None:
+        # Missing sessions are not cached: the next turn usually creates them
+        if state is None or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[session_id] = (time.monotonic() + self.ttl, state)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, session_id: str) -> None:
+        """
+        Drop a cached session (e.g. on a pub/sub message from another replica).
+        """
+        with self._lock:
+            if self._entries.pop(session_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _after_write(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]], version: Optional[int]) -> None:
+        if version is None and (self.version_of is not None or self.version_of_sync is not None):
+            # Unknown version token: re-read it from the backend on the next lookup
+            self.invalidate(session_id)
+            return
+        state = {"summary": summary, "fact_ledger": fact_ledger, "updated_at": time.time(), "watermark": watermark}
+        if version is not None:
+            state["version"] = version
+        self._store(session_id, state)
+
+    @staticmethod
+    def _version(state: Dict[str, Any]) -> Any:
+        return state.get("version", state.get("updated_at"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        state = self._lookup(session_id)
+        if state is not None:
+            if self.version_of_sync is None or self.version_of_sync(session_id) == self._version(state):
+                return state
+            self.invalidate(session_id)
+        state = self.inner.get_session(session_id)
+        self._store(session_id, state)
+        return state
+
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        try:
+            version = self.inner.save_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        except SessionConflictError:
+            self.invalidate(session_id)
+            raise
+        self._after_write(session_id, summary, fact_ledger, watermark, version)
+        if self.publish_sync is not None:
+            self.publish_sync(session_id)
+        return version
+
+    def save_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        try:
+            version = self.inner.save_session_patch(session_id, summary, fact_ledger, changed, removed, watermark=watermark, expected_version=expected_version)
+        except SessionConflictError:
+            self.invalidate(session_id)
+            raise
+        self._after_write(session_id, summary, fact_ledger, watermark, version)
+        if self.publish_sync is not None:
+            self.publish_sync(session_id)
+        return version
+
+    async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        state = self._lookup(session_id)
+        if state is not None:
+            if self.version_of is None or await self.version_of(session_id) == self._version(state):
+                return state
+            self.invalidate(session_id)
+        state = await self.inner.aget_session(session_id)
+        self._store(session_id, state)
+        return state
+
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        try:
+            version = await self.inner.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        except SessionConflictError:
+            # Our cached copy is stale: someone else saved in between
+            self.invalidate(session_id)
+            raise
+        self._after_write(session_id, summary, fact_ledger, watermark, version)
+        if self.publish is not None:
+            await self.publish(session_id)
+        return version
+
+    async def asave_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        try:
+            version = await self.inner.asave_session_patch(session_id, summary, fact_ledger, changed, removed, watermark=watermark, expected_version=expected_version)
+        except SessionConflictError:
+            self.invalidate(session_id)
+            raise
+        self._after_write(session_id, summary, fact_ledger, watermark, version)
+        if self.publish is not None:
+            await self.publish(session_id)
+        return version
+
+    async def aget_sessions(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        states: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        for sid in session_ids:
+            state = self._lookup(sid) if self.version_of is None else None
+            if state is None:
+                missing.append(sid)
+            states[sid] = state
+        if missing:
+            fetched = await self.inner.aget_sessions(missing)
+            for sid, state in fetched.items():
+                states[sid] = state
+                self._store(sid, state)
+        return states
+
+    async def asave_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> List[str]:
+        conflicts = await self.inner.asave_sessions(sessions)
+        for sid in conflicts:
+            self.invalidate(sid)
+        for sid, state in sessions.items():
+            if sid in conflicts:
+                continue
+            # Bulk saves don't report versions; only a conditional save implies one
+            expected = state.get("expected_version")
+            version = expected + 1 if expected is not None else None
+            self._after_write(sid, state["summary"], state["fact_ledger"], state.get("watermark"), version)
+            if self.publish is not None:
+                await self.publish(sid)
+        return conflicts
+
+    async def aacquire_lease(self, name: str, ttl_ms: int) -> Optional[str]:
+        return await self.inner.aacquire_lease(name, ttl_ms)
+
+    async def arelease_lease(self, name: str, token: str) -> None:
+        await self.inner.arelease_lease(name, token)
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        return self.inner.get_cache_entry(key)
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.inner.set_cache_entry(key, value, ttl_seconds)
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        return await self.inner.aget_cache_entry(key)
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        await self.inner.aset_cache_entry(key, value, ttl_seconds)
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        self.inner.append_episodes(session_id, episodes)
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        return self.inner.get_episodes(session_id, start)
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        await self.inner.aappend_episodes(session_id, episodes)
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        return await self.inner.aget_episodes(session_id, start)
@@ -0,0 +1,127 @@
+import importlib
+import json
+import threading
+import zlib
+from typing import Any, Optional, Union
+
+# Tagged payloads start with 0xC1, a byte that never starts UTF-8 text (so
+# never legacy JSON) and is unused by MessagePack; then a format id and a
+# compression id. Plain uncompressed JSON is written untagged, exactly as
+# before, so it stays readable by older releases.
+_MAGIC = 0xC1
+_FORMATS = {"json": ord("j"), "msgpack": ord("m")}
+_COMPRESSIONS = {None: ord("-"), "zlib": ord("z"), "zstd": ord("s")}
+_FORMAT_NAMES = {v: k for k, v in _FORMATS.items()}
+_COMPRESSION_NAMES = {v: k for k, v in _COMPRESSIONS.items()}
+
+
+def _optional(module: str, extra: str) -> Any:
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(f"This codec requires {module}: pip install 'chronicle-gist[{extra}]'") from e
+
+
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+def json_dumps(obj: Any) -> str:
+    """
+    Compact JSON text, with orjson when installed. Falls back to the standard
+    library for values orjson rejects (e.g. integers wider than 64 bits).
+    """
+    if _orjson is not None:
+        try:
+            return _orjson.dumps(obj, option=_orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec:
+    """
+    Serializer for stored payloads: `format` is "json" (orjson when installed)
+    or "msgpack", and payloads of at least `threshold` bytes are compressed
+    with `compression` ("zlib", "zstd" or None) at `level` when that makes
+    them smaller. `decode` reads every combination, whatever this codec
+    writes, plus untagged JSON from before codecs existed, so settings can
+    change on a live deployment. The default writes plain JSON, readable by
+    older releases during a rolling upgrade.
+    """
+
+    def __init__(self, format: str = "json", compression: Optional[str] = None, threshold: int = 1024, level: Optional[int] = None):
+        if format not in _FORMATS:
+            raise ValueError(f"format must be one of {sorted(_FORMATS)}, not {format!r}")
+        if compression not in _COMPRESSIONS:
+            raise ValueError(f"compression must be None, 'zlib' or 'zstd', not {compression!r}")
+        if compression == "zstd":
+            _optional("zstandard", "codecs")
+        self._msgpack = _optional("msgpack", "codecs") if format == "msgpack" else None
+        self.format = format
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        # zstandard (de)compressors must not be shared between threads
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"Codec(format={self.format!r}, compression={self.compression!r}, threshold={self.threshold})"
+
+    def _zstd_compressor(self) -> Any:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            zstandard = _optional("zstandard", "codecs")
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=3 if self.level is None else self.level)
+        return compressor
+
+    def _zstd_decompressor(self) -> Any:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = _optional("zstandard", "codecs").ZstdDecompressor()
+        return decompressor
+
+    def _compress(self, body: bytes) -> Optional[bytes]:
+        if self.compression is None or len(body) < self.threshold:
+            return None
+        if self.compression == "zlib":
+            packed = zlib.compress(body, 6 if self.level is None else self.level)
+        else:
+            packed = self._zstd_compressor().compress(body)
+        return packed if len(packed) < len(body) else None
+
+    def encode(self, obj: Any) -> bytes:
+        if self.format == "json":
+            body = json_dumps(obj).encode("utf-8")
+        else:
+            body = self._msgpack.packb(obj, use_bin_type=True)
+        packed = self._compress(body)
+        if packed is None:
+            if self.format == "json":
+                return body
+            return bytes((_MAGIC, _FORMATS[self.format], _COMPRESSIONS[None])) + body
+        return bytes((_MAGIC, _FORMATS[self.format], _COMPRESSIONS[self.compression])) + packed
+
+    def decode(self, data: Union[str, bytes]) -> Any:
+        if isinstance(data, str) or not data or data[0] != _MAGIC:
+            return json_loads(data)
+        if len(data) < 3 or data[1] not in _FORMAT_NAMES or data[2] not in _COMPRESSION_NAMES:
+            raise ValueError(f"Unknown payload tag {bytes(data[:3])!r}")
+        format, compression = _FORMAT_NAMES[data[1]], _COMPRESSION_NAMES[data[2]]
+        body = data[3:]
+        if compression == "zlib":
+            body = zlib.decompress(body)
+        elif compression == "zstd":
+            body = self._zstd_decompressor().decompress(body)
+        if format == "json":
+            return json_loads(body)
+        msgpack = self._msgpack or _optional("msgpack", "codecs")
+        return msgpack.unpackb(body, raw=False)
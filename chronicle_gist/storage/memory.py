@@ -1,41 +1,207 @@
+import heapq
+import json
+import threading
 import time
-from typing import Dict, Optional, Any
-from .base import Storage
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from .base import SessionConflictError, Storage
 
 class InMemoryStorage(Storage):
     """
     In-Memory implementation of Storage using a Python dictionary.
-    Includes basic TTL (Time To Live) support to clean up old sessions.
+    Includes TTL (Time To Live) support to clean up old sessions, optional
+    size caps with LRU eviction, and a lock so it can be shared by threaded
+    `process()` callers and asyncio code alike.
+
+    Expired sessions are removed lazily on read and actively by `sweep()`,
+    which pops a heap ordered by expiry time and so only touches expired
+    entries. `sweep()` runs on every save; pass `sweep_interval` (seconds) to
+    also run it from a background daemon thread for sessions that are never
+    written or read again. Archived episodes are dropped with their session
+    and count toward its size, so `max_bytes` bounds them too.
     """
 
-    def __init__(self, ttl_seconds: int = 3600):
-        self._store: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        ttl_seconds: int = 3600,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sweep_interval: Optional[float] = None
+    ):
+        self._store: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self._ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._expiry: List[Tuple[float, str]] = []
+        self._episodes: Dict[str, List[Dict[str, Any]]] = {}
+        self._episode_sizes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.expirations = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+        if sweep_interval:
+            self.start_sweeper(sweep_interval)
+
+    def _is_expired(self, session: Dict[str, Any], now: Optional[float] = None) -> bool:
+        return ((now or time.time()) - session["updated_at"]) > self._ttl
+
+    def _remove(self, session_id: str) -> None:
+        del self._store[session_id]
+        self._bytes -= self._sizes.pop(session_id, 0)
 
-    def _is_expired(self, session: Dict[str, Any]) -> bool:
-        return (time.time() - session["updated_at"]) > self._ttl
+    def _drop(self, session_id: str) -> None:
+        # Expiry and eviction, unlike a re-save, also discard the episode archive
+        self._remove(session_id)
+        self._episodes.pop(session_id, None)
+        self._bytes -= self._episode_sizes.pop(session_id, 0)
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        session = self._store.get(session_id)
-        
-        if not session:
-            return None
-            
-        if self._is_expired(session):
-            del self._store[session_id]
-            return None
-            
-        return session
-
-    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
-        self._store[session_id] = {
+        with self._lock:
+            session = self._store.get(session_id)
+
+            if not session:
+                return None
+
+            if self._is_expired(session):
+                self._drop(session_id)
+                self.expirations += 1
+                return None
+
+            self._store.move_to_end(session_id)
+            return session
+
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        now = time.time()
+        session = {
             "summary": summary,
             "fact_ledger": fact_ledger,
-            "updated_at": time.time()
+            "updated_at": now,
+            "watermark": watermark,
+            "version": 0
         }
+        # Serialized size is a stable, cheap proxy for the session's footprint
+        size = len(session_id) + len(json.dumps(session, default=str))
+
+        with self._lock:
+            current = self._store.get(session_id)
+            if current is not None and self._is_expired(current, now):
+                # The new session starts without the expired one's episodes
+                self._drop(session_id)
+                self.expirations += 1
+                current = None
+            current_version = current.get("version", 0) if current else 0
+            if expected_version is not None and expected_version != current_version:
+                raise SessionConflictError(session_id, expected_version, current_version)
+            session["version"] = current_version + 1
+
+            if session_id in self._store:
+                self._remove(session_id)
+            self._store[session_id] = session
+            self._sizes[session_id] = size
+            self._bytes += size
+            heapq.heappush(self._expiry, (now + self._ttl, session_id))
+
+            self.sweep(now)
+            self._evict()
+            return session["version"]
+
+    def _evict(self) -> None:
+        # Always keep the session just written, even if it alone exceeds max_bytes
+        while len(self._store) > 1 and (
+            (self.max_entries is not None and len(self._store) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            session_id = next(iter(self._store))
+            self._drop(session_id)
+            self.evictions += 1
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove expired sessions. Returns how many were removed.
+        """
+        now = now or time.time()
+        removed = 0
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, session_id = heapq.heappop(self._expiry)
+                session = self._store.get(session_id)
+                # Heap entries left behind by re-saves or evictions are skipped
+                if session is not None and self._is_expired(session, now):
+                    self._drop(session_id)
+                    removed += 1
+
+            # Keep the heap proportional to the live sessions
+            if len(self._expiry) > 2 * len(self._store) + 64:
+                self._expiry = [(s["updated_at"] + self._ttl, sid) for sid, s in self._store.items()]
+                heapq.heapify(self._expiry)
+            self.expirations += removed
+        return removed
+
+    def start_sweeper(self, interval: float) -> None:
+        """
+        Run `sweep()` every `interval` seconds from a daemon thread.
+        """
+        if self._sweeper is not None:
+            return
+        self._stop_sweeper.clear()
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=run, name="chronicle-memory-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def close(self) -> None:
+        """
+        Stop the background sweeper, if running.
+        """
+        if self._sweeper is not None:
+            self._stop_sweeper.set()
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Memory footprint and housekeeping counters. `bytes` is the summed
+        JSON-serialized size of the stored sessions and episode archives.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._store),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "expiry_heap_size": len(self._expiry),
+            }
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        size = sum(len(json.dumps(episode, default=str)) for episode in episodes)
+        with self._lock:
+            self._episodes.setdefault(session_id, []).extend(episodes)
+            self._episode_sizes[session_id] = self._episode_sizes.get(session_id, 0) + size
+            self._bytes += size
+            if session_id in self._store:
+                self._store.move_to_end(session_id)
+            self._evict()
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._episodes.get(session_id, [])[start:])
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        self.append_episodes(session_id, episodes)
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        return self.get_episodes(session_id, start)
 
     async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         return self.get_session(session_id)
 
-    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
-        return self.save_session(session_id, summary, fact_ledger)
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        return self.save_session(session_id, summary, fact_ledger, watermark, expected_version)
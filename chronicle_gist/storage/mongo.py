@@ -1,59 +1,354 @@
 import time
-from typing import Dict, Optional, Any
-from motor.motor_asyncio import AsyncIOMotorClient
-from .base import Storage
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
+import threading
+from .base import SessionConflictError, Storage
+from .codec import Codec
+
+# Duplicate `_id` on upsert: a conditional save expected no document but one exists
+_DUPLICATE_KEY = 11000
+
+def _doc_to_state(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "summary": doc.get("summary", ""),
+        "fact_ledger": doc.get("fact_ledger", {}),
+        "updated_at": doc.get("updated_at", time.time()),
+        "watermark": doc.get("watermark"),
+        "version": doc.get("version", 0)
+    }
+
+def _version_query(session_id: str, expected_version: Optional[int]) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"_id": session_id}
+    if expected_version == 0:
+        # Documents written before versioning have no version field
+        query["version"] = {"$in": [0, None]}
+    elif expected_version is not None:
+        query["version"] = expected_version
+    return query
+
+def _save_op(session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]], expected_version: Optional[int], now: float, write_token: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any], bool]:
+    """
+    Filter, update and upsert flag for a (conditional) save. The version is
+    part of the filter, so a document changed in between simply does not match.
+    `write_token` marks the document as written by one bulk save (see
+    `asave_sessions`); every other save clears it.
+    """
+    update = {
+        "$set": {
+            "summary": summary,
+            "fact_ledger": fact_ledger,
+            "updated_at": now,
+            "watermark": watermark,
+            "write_token": write_token
+        },
+        "$inc": {"version": 1}
+    }
+    # Only create the document if we expected it not to exist (or don't care)
+    return _version_query(session_id, expected_version), update, expected_version in (None, 0)
+
+def _patch_update(summary: str, changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]], now: float) -> Optional[Dict[str, Any]]:
+    """
+    Update touching only the changed facts through dotted paths, or None if a
+    key cannot be used in a path (empty, '.' or a leading '$').
+    """
+    if any(not key or "." in key or key.startswith("$") for key in list(changed) + list(removed)):
+        return None
+    update: Dict[str, Any] = {
+        "$set": {"summary": summary, "updated_at": now, "watermark": watermark, "write_token": None},
+        "$inc": {"version": 1}
+    }
+    for key, value in changed.items():
+        update["$set"][f"fact_ledger.{key}"] = value
+    if removed:
+        update["$unset"] = {f"fact_ledger.{key}": "" for key in removed}
+    return update
 
 class MongoStorage(Storage):
     """
-    MongoDB storage adapter using Motor.
-    Stores sessions in a collection `sessions` within the specified database.
+    MongoDB storage adapter using Motor (async methods) and a pooled
+    `pymongo.MongoClient` (sync methods, created on first use).
+    Stores sessions in a collection `sessions` within the specified database,
+    and shared compression cache entries in `<collection>_cache`, expired by
+    a TTL index on `expires_at`. Archived episodes are documents in
+    `<collection>_episodes`, read back in `_id` (insertion) order.
+    Sessions stay native documents so ledger patches can use dotted paths;
+    episodes are written once, so with a `codec` they are stored as one
+    encoded binary `payload` each (native and encoded episodes both read
+    back). `compressors` (e.g. "zstd,zlib") turns on driver wire compression.
     """
 
-    def __init__(self, uri: str, db_name: str = "chronicle", collection_name: str = "sessions"):
+    def __init__(self, uri: str, db_name: str = "chronicle", collection_name: str = "sessions", max_pool_size: int = 100, codec: Optional[Codec] = None, compressors: Optional[str] = None):
         self.uri = uri
         self.db_name = db_name
         self.collection_name = collection_name
+        self.max_pool_size = max_pool_size
+        self.codec = codec
+        self.compressors = compressors
         self.client = None
         self.db = None
         self.collection = None
+        self.sync_client = None
+        self.sync_collection = None
+        self.cache_collection = None
+        self.sync_cache_collection = None
+        self._cache_indexed = False
+        self._sync_cache_indexed = False
+        self.episode_collection = None
+        self.sync_episode_collection = None
+        self._episodes_indexed = False
+        self._sync_episodes_indexed = False
+        self._sync_lock = threading.Lock()
+
+    def _client_options(self) -> Dict[str, Any]:
+        options: Dict[str, Any] = {"maxPoolSize": self.max_pool_size}
+        if self.compressors:
+            options["compressors"] = self.compressors
+        return options
+
+    def _episode_docs(self, session_id: str, episodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.codec is None:
+            return [{"session_id": session_id, "episode": episode} for episode in episodes]
+        return [{"session_id": session_id, "payload": self.codec.encode(episode)} for episode in episodes]
+
+    def _episode(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if "episode" in doc:
+            return doc["episode"]
+        return (self.codec or Codec()).decode(bytes(doc["payload"]))
 
     async def connect(self):
         if not self.client:
-            self.client = AsyncIOMotorClient(self.uri)
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            self.client = AsyncIOMotorClient(self.uri, **self._client_options())
             self.db = self.client[self.db_name]
             self.collection = self.db[self.collection_name]
+            self.cache_collection = self.db[f"{self.collection_name}_cache"]
+            self.episode_collection = self.db[f"{self.collection_name}_episodes"]
+
+    def connect_sync(self):
+        with self._sync_lock:
+            if not self.sync_client:
+                from pymongo import MongoClient
+
+                # MongoClient is thread-safe and pools connections internally
+                client = MongoClient(self.uri, **self._client_options())
+                self.sync_collection = client[self.db_name][self.collection_name]
+                self.sync_cache_collection = client[self.db_name][f"{self.collection_name}_cache"]
+                self.sync_episode_collection = client[self.db_name][f"{self.collection_name}_episodes"]
+                self.sync_client = client
+
+    async def disconnect(self):
+        if self.client:
+            self.client.close()
+            self.client = None
+        self.disconnect_sync()
+
+    def disconnect_sync(self):
+        with self._sync_lock:
+            if self.sync_client:
+                self.sync_client.close()
+                self.sync_client = None
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        raise NotImplementedError("MongoStorage only supports async methods. Use aget_session.")
+        if not self.sync_client:
+            self.connect_sync()
+
+        doc = self.sync_collection.find_one({"_id": session_id})
+        return _doc_to_state(doc) if doc else None
+
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
 
-    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
-        raise NotImplementedError("MongoStorage only supports async methods. Use asave_session.")
+        query, update, upsert = _save_op(session_id, summary, fact_ledger, watermark, expected_version, time.time())
+        try:
+            doc = self.sync_collection.find_one_and_update(
+                query, update, upsert=upsert, projection={"version": 1}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            doc = None
+        if doc is None:
+            raise SessionConflictError(session_id, expected_version)
+        return doc["version"]
+
+    def save_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        update = _patch_update(summary, changed, removed, watermark, time.time())
+        if update is not None:
+            from pymongo import ReturnDocument
+
+            # No upsert: a missing document would get a partial ledger
+            doc = self.sync_collection.find_one_and_update(
+                _version_query(session_id, expected_version), update, projection={"version": 1}, return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                return doc["version"]
+        # New session, unpatchable key or lost race: the full save inserts or raises the conflict
+        return self.save_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
 
     async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         if not self.client:
             await self.connect()
             
         doc = await self.collection.find_one({"_id": session_id})
-        if doc:
-            return {
-                "summary": doc.get("summary", ""),
-                "fact_ledger": doc.get("fact_ledger", {}),
-                "updated_at": doc.get("updated_at", time.time())
-            }
-        return None
+        return _doc_to_state(doc) if doc else None
 
-    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
         if not self.client:
             await self.connect()
             
-        await self.collection.update_one(
-            {"_id": session_id},
-            {
-                "$set": {
-                    "summary": summary,
-                    "fact_ledger": fact_ledger,
-                    "updated_at": time.time()
-                }
-            },
-            upsert=True
-        )
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        query, update, upsert = _save_op(session_id, summary, fact_ledger, watermark, expected_version, time.time())
+        try:
+            doc = await self.collection.find_one_and_update(
+                query, update, upsert=upsert, projection={"version": 1}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            doc = None
+        if doc is None:
+            raise SessionConflictError(session_id, expected_version)
+        return doc["version"]
+
+    async def asave_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.client:
+            await self.connect()
+
+        update = _patch_update(summary, changed, removed, watermark, time.time())
+        if update is not None:
+            from pymongo import ReturnDocument
+
+            # No upsert: a missing document would get a partial ledger
+            doc = await self.collection.find_one_and_update(
+                _version_query(session_id, expected_version), update, projection={"version": 1}, return_document=ReturnDocument.AFTER
+            )
+            if doc is not None:
+                return doc["version"]
+        # New session, unpatchable key or lost race: the full save inserts or raises the conflict
+        return await self.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+
+    async def aget_sessions(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.client:
+            await self.connect()
+
+        states: Dict[str, Optional[Dict[str, Any]]] = {sid: None for sid in session_ids}
+        async for doc in self.collection.find({"_id": {"$in": list(session_ids)}}):
+            states[doc["_id"]] = _doc_to_state(doc)
+        return states
+
+    async def asave_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> List[str]:
+        if not self.client:
+            await self.connect()
+        if not sessions:
+            return []
+
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        now = time.time()
+        token = uuid.uuid4().hex
+        ids = list(sessions)
+        operations = []
+        for sid in ids:
+            state = sessions[sid]
+            query, update, upsert = _save_op(
+                sid, state["summary"], state["fact_ledger"], state.get("watermark"), state.get("expected_version"), now, token
+            )
+            operations.append(UpdateOne(query, update, upsert=upsert))
+
+        conflicts = set()
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            written = result.matched_count + result.upserted_count
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") != _DUPLICATE_KEY:
+                    raise
+                conflicts.add(ids[error["index"]])
+            written = e.details.get("nMatched", 0) + e.details.get("nUpserted", 0)
+
+        if written + len(conflicts) < len(ids):
+            # Some conditional updates matched nothing; ours are the documents carrying
+            # this call's token (a version check would also accept a concurrent writer's
+            # bump from the same expected version). A document overwritten again since
+            # is reported too, and the caller's retry sorts it out.
+            conditional = [sid for sid in ids if sid not in conflicts and sessions[sid].get("expected_version") is not None]
+            ours = set()
+            async for doc in self.collection.find({"_id": {"$in": conditional}, "write_token": token}, {"_id": 1}):
+                ours.add(doc["_id"])
+            conflicts.update(sid for sid in conditional if sid not in ours)
+        return [sid for sid in ids if sid in conflicts]
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        # The TTL monitor runs about once a minute, so filter on expiry too
+        doc = self.sync_cache_collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        return doc["value"] if doc else None
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.sync_client:
+            self.connect_sync()
+        if not self._sync_cache_indexed:
+            self.sync_cache_collection.create_index("expires_at", expireAfterSeconds=0)
+            self._sync_cache_indexed = True
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        self.sync_cache_collection.replace_one({"_id": key}, {"value": value, "expires_at": expires_at}, upsert=True)
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        if not self.client:
+            await self.connect()
+
+        doc = await self.cache_collection.find_one({"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+        return doc["value"] if doc else None
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.client:
+            await self.connect()
+        if not self._cache_indexed:
+            await self.cache_collection.create_index("expires_at", expireAfterSeconds=0)
+            self._cache_indexed = True
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        await self.cache_collection.replace_one({"_id": key}, {"value": value, "expires_at": expires_at}, upsert=True)
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.sync_client:
+            self.connect_sync()
+        if not self._sync_episodes_indexed:
+            self.sync_episode_collection.create_index([("session_id", 1), ("_id", 1)])
+            self._sync_episodes_indexed = True
+
+        self.sync_episode_collection.insert_many(self._episode_docs(session_id, episodes))
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        cursor = self.sync_episode_collection.find({"session_id": session_id}, {"episode": 1, "payload": 1}).sort("_id", 1).skip(start)
+        return [self._episode(doc) for doc in cursor]
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.client:
+            await self.connect()
+        if not self._episodes_indexed:
+            await self.episode_collection.create_index([("session_id", 1), ("_id", 1)])
+            self._episodes_indexed = True
+
+        await self.episode_collection.insert_many(self._episode_docs(session_id, episodes))
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.client:
+            await self.connect()
+
+        cursor = self.episode_collection.find({"session_id": session_id}, {"episode": 1, "payload": 1}).sort("_id", 1).skip(start)
+        return [self._episode(doc) async for doc in cursor]
@@ -1,69 +1,697 @@
-import json
+import asyncio
+import functools
+import logging
+import threading
 import time
-from typing import Dict, Optional, Any
-import asyncpg
-from .base import Storage
+import uuid
+from typing import Dict, List, Optional, Any
+from .base import SessionConflictError, Storage
+from .codec import json_dumps, json_loads
+
+logger = logging.getLogger(__name__)
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS chronicle_sessions (
+        id TEXT PRIMARY KEY,
+        summary TEXT,
+        fact_ledger JSONB,
+        updated_at FLOAT,
+        watermark JSONB,
+        version BIGINT NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS chronicle_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at FLOAT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS chronicle_episodes (
+        seq BIGSERIAL PRIMARY KEY,
+        session_id TEXT NOT NULL,
+        episode JSONB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS chronicle_episodes_session ON chronicle_episodes (session_id, seq);
+"""
+# Tables created before watermarks and versions were tracked, and the
+# indexes the TTL purge walks
+_MIGRATE_SQL = """
+    ALTER TABLE chronicle_sessions ADD COLUMN IF NOT EXISTS watermark JSONB;
+    ALTER TABLE chronicle_sessions ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS chronicle_sessions_updated_at ON chronicle_sessions (updated_at);
+    CREATE INDEX IF NOT EXISTS chronicle_cache_expires_at ON chronicle_cache (expires_at);
+"""
+
+_GET_SQL = "SELECT summary, fact_ledger, updated_at, watermark, version FROM chronicle_sessions WHERE id = $1"
+_GET_SQL_SYNC = "SELECT summary, fact_ledger, updated_at, watermark, version FROM chronicle_sessions WHERE id = %s"
+
+# Upsert for unconditional saves and expected version 0 (a session that does
+# not exist yet, or a row from before versioning): the update only happens
+# while the stored version still matches, so a lost race returns no row.
+_SAVE_SQL = """
+    INSERT INTO chronicle_sessions (id, summary, fact_ledger, updated_at, watermark, version)
+    VALUES ($1, $2, $3, $4, $5, 1)
+    ON CONFLICT (id) DO UPDATE
+    SET summary = EXCLUDED.summary, fact_ledger = EXCLUDED.fact_ledger,
+        updated_at = EXCLUDED.updated_at, watermark = EXCLUDED.watermark,
+        version = chronicle_sessions.version + 1
+    WHERE $6::bigint IS NULL OR chronicle_sessions.version = $6::bigint
+    RETURNING version
+"""
+_SAVE_SQL_SYNC = """
+    INSERT INTO chronicle_sessions (id, summary, fact_ledger, updated_at, watermark, version)
+    VALUES (%(id)s, %(summary)s, %(fact_ledger)s::jsonb, %(updated_at)s, %(watermark)s::jsonb, 1)
+    ON CONFLICT (id) DO UPDATE
+    SET summary = EXCLUDED.summary, fact_ledger = EXCLUDED.fact_ledger,
+        updated_at = EXCLUDED.updated_at, watermark = EXCLUDED.watermark,
+        version = chronicle_sessions.version + 1
+    WHERE %(expected)s::bigint IS NULL OR chronicle_sessions.version = %(expected)s::bigint
+    RETURNING version
+"""
+
+# Conditional save against an existing version: a plain update, so a row that
+# was deleted or expired in between is a conflict rather than a fresh insert.
+_UPDATE_SQL = """
+    UPDATE chronicle_sessions
+    SET summary = $2, fact_ledger = $3, updated_at = $4, watermark = $5, version = version + 1
+    WHERE id = $1 AND version = $6
+    RETURNING version
+"""
+_UPDATE_SQL_SYNC = """
+    UPDATE chronicle_sessions
+    SET summary = %(summary)s, fact_ledger = %(fact_ledger)s::jsonb, updated_at = %(updated_at)s,
+        watermark = %(watermark)s::jsonb, version = version + 1
+    WHERE id = %(id)s AND version = %(expected)s
+    RETURNING version
+"""
+
+# Ledger patch: drop removed keys, then merge changed facts in with `||`.
+# Only updates an existing row; a missing one falls back to the full save.
+_PATCH_SQL = """
+    UPDATE chronicle_sessions
+    SET summary = $2, fact_ledger = (COALESCE(fact_ledger, '{}'::jsonb) - $3::text[]) || $4::jsonb,
+        updated_at = $5, watermark = $6, version = version + 1
+    WHERE id = $1 AND ($7::bigint IS NULL OR version = $7::bigint)
+    RETURNING version
+"""
+_PATCH_SQL_SYNC = """
+    UPDATE chronicle_sessions
+    SET summary = %(summary)s, fact_ledger = (COALESCE(fact_ledger, '{}'::jsonb) - %(removed)s::text[]) || %(changed)s::jsonb,
+        updated_at = %(updated_at)s, watermark = %(watermark)s::jsonb, version = version + 1
+    WHERE id = %(id)s AND (%(expected)s::bigint IS NULL OR version = %(expected)s::bigint)
+    RETURNING version
+"""
+
+# Statements prepared on every new async connection (see `prepare`)
+_PREPARED = {"get": _GET_SQL, "save": _SAVE_SQL, "update": _UPDATE_SQL, "patch": _PATCH_SQL}
+
+# TTL purge: one batch of the oldest idle sessions, located through the
+# `updated_at` index, deleted together with their episodes. SKIP LOCKED lets
+# concurrent purgers (one per replica) take different rows.
+_PURGE_SESSIONS_SQL = """
+    WITH expired AS (
+        DELETE FROM chronicle_sessions WHERE id IN (
+            SELECT id FROM chronicle_sessions WHERE updated_at < $1
+            ORDER BY updated_at LIMIT $2 FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+    ), episodes AS (
+        DELETE FROM chronicle_episodes WHERE session_id IN (SELECT id FROM expired)
+    )
+    SELECT count(*) FROM expired
+"""
+_PURGE_SESSIONS_SQL_SYNC = """
+    WITH expired AS (
+        DELETE FROM chronicle_sessions WHERE id IN (
+            SELECT id FROM chronicle_sessions WHERE updated_at < %s
+            ORDER BY updated_at LIMIT %s FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id
+    ), episodes AS (
+        DELETE FROM chronicle_episodes WHERE session_id IN (SELECT id FROM expired)
+    )
+    SELECT count(*) FROM expired
+"""
+_PURGE_CACHE_SQL = """
+    DELETE FROM chronicle_cache WHERE key IN (
+        SELECT key FROM chronicle_cache WHERE expires_at < $1 LIMIT $2 FOR UPDATE SKIP LOCKED
+    )
+"""
+_PURGE_CACHE_SQL_SYNC = """
+    DELETE FROM chronicle_cache WHERE key IN (
+        SELECT key FROM chronicle_cache WHERE expires_at < %s LIMIT %s FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Bulk import: COPY into a transaction-scoped staging table, then one
+# set-based upsert. Existing rows are overwritten and their version bumped.
+_IMPORT_COLUMNS = ["id", "summary", "fact_ledger", "updated_at", "watermark"]
+_IMPORT_STAGE_SQL = """
+    CREATE TEMP TABLE chronicle_import (
+        id TEXT, summary TEXT, fact_ledger JSONB, updated_at FLOAT, watermark JSONB
+    ) ON COMMIT DROP
+"""
+_IMPORT_SQL = """
+    INSERT INTO chronicle_sessions (id, summary, fact_ledger, updated_at, watermark, version)
+    SELECT id, summary, fact_ledger, updated_at, watermark, 1 FROM chronicle_import
+    ON CONFLICT (id) DO UPDATE
+    SET summary = EXCLUDED.summary, fact_ledger = EXCLUDED.fact_ledger,
+        updated_at = EXCLUDED.updated_at, watermark = EXCLUDED.watermark,
+        version = chronicle_sessions.version + 1
+"""
+
+_CACHE_SET_SQL = """
+    INSERT INTO chronicle_cache (key, value, expires_at) VALUES ($1, $2, $3)
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+"""
+_CACHE_SET_SQL_SYNC = """
+    INSERT INTO chronicle_cache (key, value, expires_at) VALUES (%s, %s, %s)
+    ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+"""
+
+def _json_column(value: Any) -> Any:
+    return json_loads(value) if isinstance(value, str) else value
+
+def _row_count(status: str) -> int:
+    # asyncpg returns the command tag, e.g. "DELETE 500" or "INSERT 0 500"
+    return int(status.split()[-1]) if status else 0
+
+@functools.lru_cache(maxsize=None)
+def _prepared_connection_class() -> Any:
+    import asyncpg
+
+    class PreparedConnection(asyncpg.Connection):
+        """asyncpg connection carrying the statements prepared for it."""
+        __slots__ = ("statements",)
+
+    return PreparedConnection
+
+async def _prepare_statements(conn: Any) -> None:
+    conn.statements = {name: await conn.prepare(sql) for name, sql in _PREPARED.items()}
+
+async def _run(conn: Any, name: str, method: str, *args: Any) -> Any:
+    # The connection's prepared statement, or the plain query with `prepare=False`
+    statement = getattr(conn, "statements", {}).get(name)
+    if statement is not None:
+        return await getattr(statement, method)(*args)
+    return await getattr(conn, method)(_PREPARED[name], *args)
+
+def _import_rows(sessions: Dict[str, Dict[str, Any]], now: float) -> List[tuple]:
+    return [
+        (
+            sid, state.get("summary", ""), json_dumps(state.get("fact_ledger", {})), state.get("updated_at") or now,
+            json_dumps(state["watermark"]) if state.get("watermark") else None
+        )
+        for sid, state in sessions.items()
+    ]
+
+def _row_to_state(row: Any) -> Dict[str, Any]:
+    return {
+        "summary": row["summary"],
+        "fact_ledger": _json_column(row["fact_ledger"]),
+        "updated_at": row["updated_at"],
+        "watermark": _json_column(row["watermark"]),
+        "version": row["version"]
+    }
 
 class PostgresStorage(Storage):
     """
-    PostgreSQL storage adapter using asyncpg.
+    PostgreSQL storage adapter using asyncpg (async methods) and a psycopg 3
+    connection pool (sync methods, created on first use).
     Requires a table `chronicle_sessions` with columns:
     - id (TEXT PRIMARY KEY)
     - summary (TEXT)
     - fact_ledger (JSONB)
     - updated_at (FLOAT)
+    - watermark (JSONB)
+    - version (BIGINT, bumped by every save for compare-and-set)
+    and a table `chronicle_cache` (key, value, expires_at) for the shared
+    compression cache tier; expired rows are ignored and overwritten.
+    Archived episodes are rows of `chronicle_episodes` (seq, session_id,
+    episode JSONB), read back in `seq` order.
+
+    Pools hold `min_size` to `max_size` connections and close connections
+    idle for `max_idle` seconds; `statement_timeout` (seconds) is set on every
+    connection. Concurrent first calls share one pool. With `prepare`, the
+    session read, save and patch are prepared once per connection; turn it
+    off behind a transaction-pooling PgBouncer. The tables and indexes
+    (`SCHEMA_SQL`) are created on connect unless `create_schema` is False,
+    for deployments that migrate out of band.
+
+    With `ttl` (seconds), `apurge_expired`/`purge_expired` delete sessions
+    not updated for that long, with their episodes, `purge_batch` rows per
+    statement; `arun_purger` runs the purge periodically. Expired cache
+    entries are purged either way. `aimport_sessions`/`import_sessions` bulk
+    load states through COPY for migrations.
     """
 
-    def __init__(self, dsn: str):
+    SCHEMA_SQL = _CREATE_TABLE_SQL + _MIGRATE_SQL
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        max_idle: float = 300.0,
+        statement_timeout: Optional[float] = None,
+        prepare: bool = True,
+        create_schema: bool = True,
+        ttl: Optional[int] = None,
+        purge_batch: int = 1000,
+    ):
         self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.statement_timeout = statement_timeout
+        self.prepare = prepare
+        self.create_schema = create_schema
+        self.ttl = ttl
+        self.purge_batch = purge_batch
         self.pool = None
+        self.sync_pool = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._sync_lock = threading.Lock()
+        # Advisory locks belong to a database session: every lease this
+        # process holds lives on one dedicated connection outside the pool
+        self._lease_conn = None
+        self._lease_lock: Optional[asyncio.Lock] = None
+        self._leases: Dict[str, str] = {}
+
+    def _server_settings(self) -> Dict[str, str]:
+        if self.statement_timeout is None:
+            return {}
+        return {"statement_timeout": str(int(self.statement_timeout * 1000))}
 
     async def connect(self):
-        if not self.pool:
-            self.pool = await asyncpg.create_pool(self.dsn)
-            # Ensure table exists
-            async with self.pool.acquire() as conn:
-                await conn.execute("""
-                    CREATE TABLE IF NOT EXISTS chronicle_sessions (
-                        id TEXT PRIMARY KEY,
-                        summary TEXT,
-                        fact_ledger JSONB,
-                        updated_at FLOAT
-                    );
-                """)
+        if self.pool:
+            return
+        # Created here rather than in __init__ so it binds to the running loop
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self.pool:
+                return
+            import asyncpg
+
+            options: Dict[str, Any] = {}
+            if self.prepare:
+                options = {"connection_class": _prepared_connection_class(), "init": _prepare_statements}
+            if self.create_schema:
+                # Statements are prepared against the tables, so create them first
+                conn = await asyncpg.connect(self.dsn)
+                try:
+                    await conn.execute(_CREATE_TABLE_SQL)
+                    await conn.execute(_MIGRATE_SQL)
+                finally:
+                    await conn.close()
+            self.pool = await asyncpg.create_pool(
+                self.dsn, min_size=self.min_size, max_size=self.max_size,
+                max_inactive_connection_lifetime=self.max_idle, server_settings=self._server_settings(), **options
+            )
+
+    def connect_sync(self):
+        with self._sync_lock:
+            if not self.sync_pool:
+                from psycopg.rows import dict_row
+                from psycopg_pool import ConnectionPool
+
+                kwargs: Dict[str, Any] = {"row_factory": dict_row}
+                if self.statement_timeout is not None:
+                    kwargs["options"] = f"-c statement_timeout={int(self.statement_timeout * 1000)}"
+                pool = ConnectionPool(
+                    self.dsn, min_size=self.min_size, max_size=self.max_size, max_idle=self.max_idle,
+                    kwargs=kwargs, open=True
+                )
+                if self.create_schema:
+                    with pool.connection() as conn:
+                        conn.execute(_CREATE_TABLE_SQL)
+                        conn.execute(_MIGRATE_SQL)
+                self.sync_pool = pool
 
     async def disconnect(self):
+        if self._lease_conn is not None:
+            await self._lease_conn.close()
+            self._lease_conn = None
+            self._leases.clear()
         if self.pool:
             await self.pool.close()
+            self.pool = None
+        self.disconnect_sync()
+
+    def disconnect_sync(self):
+        with self._sync_lock:
+            if self.sync_pool:
+                self.sync_pool.close()
+                self.sync_pool = None
+
+    @property
+    def _prepare_sync(self) -> Optional[bool]:
+        # psycopg prepares on first use when True, after a few uses when None
+        return True if self.prepare else None
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        raise NotImplementedError("PostgresStorage only supports async methods. Use aget_session.")
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            row = conn.execute(_GET_SQL_SYNC, (session_id,), prepare=self._prepare_sync).fetchone()
+            return _row_to_state(row) if row else None
 
-    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
-        raise NotImplementedError("PostgresStorage only supports async methods. Use asave_session.")
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            row = conn.execute(_UPDATE_SQL_SYNC if expected_version else _SAVE_SQL_SYNC, {
+                "id": session_id, "summary": summary, "fact_ledger": json_dumps(fact_ledger),
+                "updated_at": time.time(), "watermark": json_dumps(watermark) if watermark else None,
+                "expected": expected_version
+            }, prepare=self._prepare_sync).fetchone()
+        if row is None:
+            raise SessionConflictError(session_id, expected_version)
+        return row["version"]
+
+    def save_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            row = conn.execute(_PATCH_SQL_SYNC, {
+                "id": session_id, "summary": summary, "removed": list(removed), "changed": json_dumps(changed),
+                "updated_at": time.time(), "watermark": json_dumps(watermark) if watermark else None,
+                "expected": expected_version
+            }, prepare=self._prepare_sync).fetchone()
+        if row is None:
+            # New session or lost race: the full save inserts or raises the conflict
+            return self.save_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        return row["version"]
 
     async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         if not self.pool:
             await self.connect()
             
         async with self.pool.acquire() as conn:
-            row = await conn.fetchrow("SELECT summary, fact_ledger, updated_at FROM chronicle_sessions WHERE id = $1", session_id)
-            if row:
-                return {
-                    "summary": row["summary"],
-                    "fact_ledger": json.loads(row["fact_ledger"]) if isinstance(row["fact_ledger"], str) else row["fact_ledger"],
-                    "updated_at": row["updated_at"]
-                }
-            return None
-
-    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
+            row = await _run(conn, "get", "fetchrow", session_id)
+            return _row_to_state(row) if row else None
+
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
         if not self.pool:
             await self.connect()
             
         async with self.pool.acquire() as conn:
-            await conn.execute("""
-                INSERT INTO chronicle_sessions (id, summary, fact_ledger, updated_at)
-                VALUES ($1, $2, $3, $4)
-                ON CONFLICT (id) DO UPDATE 
-                SET summary = $2, fact_ledger = $3, updated_at = $4
-            """, session_id, summary, json.dumps(fact_ledger), time.time())
+            version = await _run(
+                conn, "update" if expected_version else "save", "fetchval", session_id, summary, json_dumps(fact_ledger), time.time(),
+                json_dumps(watermark) if watermark else None, expected_version
+            )
+        if version is None:
+            raise SessionConflictError(session_id, expected_version)
+        return version
+
+    async def asave_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.pool:
+            await self.connect()
+
+        async with self.pool.acquire() as conn:
+            version = await _run(
+                conn, "patch", "fetchval", session_id, summary, list(removed), json_dumps(changed), time.time(),
+                json_dumps(watermark) if watermark else None, expected_version
+            )
+        if version is None:
+            # New session or lost race: the full save inserts or raises the conflict
+            return await self.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        return version
+
+    async def aget_sessions(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.pool:
+            await self.connect()
+
+        states: Dict[str, Optional[Dict[str, Any]]] = {sid: None for sid in session_ids}
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT id, summary, fact_ledger, updated_at, watermark, version FROM chronicle_sessions WHERE id = ANY($1::text[])",
+                session_ids
+            )
+        for row in rows:
+            states[row["id"]] = _row_to_state(row)
+        return states
+
+    async def asave_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> List[str]:
+        if not self.pool:
+            await self.connect()
+        if not sessions:
+            return []
+
+        now = time.time()
+        ids = list(sessions)
+        # One statement: the columns travel as arrays and are zipped back by unnest.
+        # Rows expecting an existing version are plain updates, the rest a multi-row
+        # upsert, as in `asave_session`. Rows whose expected version no longer
+        # matches (or whose session is gone) are skipped and not returned.
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                WITH input AS (
+                    SELECT * FROM unnest($1::text[], $2::text[], $3::jsonb[], $4::jsonb[], $5::bigint[])
+                        AS t(id, summary, fact_ledger, watermark, expected)
+                ), updated AS (
+                    UPDATE chronicle_sessions
+                    SET summary = input.summary, fact_ledger = input.fact_ledger, updated_at = $6,
+                        watermark = input.watermark, version = chronicle_sessions.version + 1
+                    FROM input
+                    WHERE input.expected <> 0 AND chronicle_sessions.id = input.id
+                        AND chronicle_sessions.version = input.expected
+                    RETURNING chronicle_sessions.id
+                ), upserted AS (
+                    INSERT INTO chronicle_sessions (id, summary, fact_ledger, updated_at, watermark, version)
+                    SELECT id, summary, fact_ledger, $6, watermark, 1 FROM input
+                    WHERE expected IS NULL OR expected = 0
+                    ON CONFLICT (id) DO UPDATE
+                    SET summary = EXCLUDED.summary, fact_ledger = EXCLUDED.fact_ledger,
+                        updated_at = EXCLUDED.updated_at, watermark = EXCLUDED.watermark,
+                        version = chronicle_sessions.version + 1
+                    WHERE (SELECT expected FROM input WHERE input.id = EXCLUDED.id) IS NULL
+                        OR chronicle_sessions.version = (SELECT expected FROM input WHERE input.id = EXCLUDED.id)
+                    RETURNING chronicle_sessions.id
+                )
+                SELECT id FROM updated UNION ALL SELECT id FROM upserted
+            """,
+                ids,
+                [sessions[sid]["summary"] for sid in ids],
+                [json_dumps(sessions[sid]["fact_ledger"]) for sid in ids],
+                [json_dumps(sessions[sid]["watermark"]) if sessions[sid].get("watermark") else None for sid in ids],
+                [sessions[sid].get("expected_version") for sid in ids],
+                now
+            )
+        saved = {row["id"] for row in rows}
+        return [sid for sid in ids if sid not in saved]
+
+    async def _lease_connection(self) -> Any:
+        if self._lease_conn is None or self._lease_conn.is_closed():
+            import asyncpg
+
+            # Locks held by a lost connection were released with it
+            self._leases.clear()
+            self._lease_conn = await asyncpg.connect(self.dsn, server_settings=self._server_settings())
+        return self._lease_conn
+
+    async def aacquire_lease(self, name: str, ttl_ms: int) -> Optional[str]:
+        """
+        Session-level advisory lock keyed by `hashtext(name)`, taken on a
+        dedicated connection that holds all of this instance's leases, so
+        leases never tie up pool connections the compression itself needs.
+        The lock lives as long as that connection, so `ttl_ms` is not needed:
+        a crashed holder's locks are released with its connection.
+        """
+        # Created here rather than in __init__ so it binds to the running loop
+        if self._lease_lock is None:
+            self._lease_lock = asyncio.Lock()
+        async with self._lease_lock:
+            # Advisory locks are re-entrant within a session; a name we hold is contended
+            if name in self._leases:
+                return None
+            conn = await self._lease_connection()
+            if not await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", name):
+                return None
+            token = uuid.uuid4().hex
+            self._leases[name] = token
+            return token
+
+    async def arelease_lease(self, name: str, token: str) -> None:
+        if self._lease_lock is None:
+            return
+        async with self._lease_lock:
+            if self._leases.get(name) != token:
+                return
+            del self._leases[name]
+            if self._lease_conn is not None and not self._lease_conn.is_closed():
+                await self._lease_conn.execute("SELECT pg_advisory_unlock(hashtext($1))", name)
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            row = conn.execute("SELECT value FROM chronicle_cache WHERE key = %s AND expires_at > %s", (key, time.time())).fetchone()
+        return row["value"] if row else None
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            conn.execute(_CACHE_SET_SQL_SYNC, (key, value, time.time() + ttl_seconds))
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        if not self.pool:
+            await self.connect()
+
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("SELECT value FROM chronicle_cache WHERE key = $1 AND expires_at > $2", key, time.time())
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.pool:
+            await self.connect()
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(_CACHE_SET_SQL, key, value, time.time() + ttl_seconds)
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO chronicle_episodes (session_id, episode) VALUES (%s, %s::jsonb)",
+                    [(session_id, json_dumps(episode)) for episode in episodes]
+                )
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.sync_pool:
+            self.connect_sync()
+
+        with self.sync_pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT episode FROM chronicle_episodes WHERE session_id = %s ORDER BY seq OFFSET %s", (session_id, start)
+            ).fetchall()
+        return [_json_column(row["episode"]) for row in rows]
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.pool:
+            await self.connect()
+
+        async with self.pool.acquire() as conn:
+            await conn.executemany(
+                "INSERT INTO chronicle_episodes (session_id, episode) VALUES ($1, $2::jsonb)",
+                [(session_id, json_dumps(episode)) for episode in episodes]
+            )
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.pool:
+            await self.connect()
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT episode FROM chronicle_episodes WHERE session_id = $1 ORDER BY seq OFFSET $2", session_id, start)
+        return [_json_column(row["episode"]) for row in rows]
+
+    async def apurge_expired(self) -> int:
+        """
+        Delete sessions not updated for `ttl` seconds, with their episodes, and
+        expired cache entries, in batches of `purge_batch` rows so no single
+        statement holds many locks. Returns the number of sessions deleted.
+        """
+        if not self.pool:
+            await self.connect()
+
+        deleted = 0
+        async with self.pool.acquire() as conn:
+            if self.ttl is not None:
+                while True:
+                    count = await conn.fetchval(_PURGE_SESSIONS_SQL, time.time() - self.ttl, self.purge_batch)
+                    deleted += count
+                    if count < self.purge_batch:
+                        break
+            while True:
+                count = _row_count(await conn.execute(_PURGE_CACHE_SQL, time.time(), self.purge_batch))
+                if count < self.purge_batch:
+                    break
+        return deleted
+
+    def purge_expired(self) -> int:
+        """
+        Sync `apurge_expired`.
+        """
+        if not self.sync_pool:
+            self.connect_sync()
+
+        deleted = 0
+        with self.sync_pool.connection() as conn:
+            # One transaction per batch, like the async path
+            if self.ttl is not None:
+                while True:
+                    count = conn.execute(_PURGE_SESSIONS_SQL_SYNC, (time.time() - self.ttl, self.purge_batch)).fetchone()["count"]
+                    conn.commit()
+                    deleted += count
+                    if count < self.purge_batch:
+                        break
+            while True:
+                count = conn.execute(_PURGE_CACHE_SQL_SYNC, (time.time(), self.purge_batch)).rowcount
+                conn.commit()
+                if count < self.purge_batch:
+                    break
+        return deleted
+
+    async def arun_purger(self, interval: float = 60.0) -> None:
+        """
+        Call `apurge_expired` every `interval` seconds. Failures are logged and
+        retried on the next round. Runs until cancelled; start it with
+        `asyncio.create_task`.
+        """
+        while True:
+            try:
+                deleted = await self.apurge_expired()
+                if deleted:
+                    logger.info("Purged %d expired Chronicle sessions", deleted)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Chronicle session purge failed: %s", e)
+            await asyncio.sleep(interval)
+
+    async def aimport_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Bulk upsert for migrations: session id -> state with "summary",
+        "fact_ledger" and optional "watermark" and "updated_at" (kept, so the
+        TTL still counts from the original activity). Rows are streamed with
+        COPY and merged in one statement, in one transaction; existing sessions
+        are overwritten and their version bumped. Returns the rows written.
+        """
+        if not self.pool:
+            await self.connect()
+        if not sessions:
+            return 0
+
+        rows = _import_rows(sessions, time.time())
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(_IMPORT_STAGE_SQL)
+                await conn.copy_records_to_table("chronicle_import", records=rows, columns=_IMPORT_COLUMNS)
+                return _row_count(await conn.execute(_IMPORT_SQL))
+
+    def import_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Sync `aimport_sessions`.
+        """
+        if not self.sync_pool:
+            self.connect_sync()
+        if not sessions:
+            return 0
+
+        rows = _import_rows(sessions, time.time())
+        with self.sync_pool.connection() as conn:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    cur.execute(_IMPORT_STAGE_SQL)
+                    with cur.copy(f"COPY chronicle_import ({', '.join(_IMPORT_COLUMNS)}) FROM STDIN") as copy:
+                        for row in rows:
+                            copy.write_row(row)
+                    cur.execute(_IMPORT_SQL)
+                    return cur.rowcount
@@ -1,50 +1,371 @@
-import json
 import time
-from typing import Dict, Optional, Any
-import redis.asyncio as redis
-from .base import Storage
+import uuid
+from typing import Callable, Dict, List, Optional, Any
+from .base import SessionConflictError, Storage
+from .codec import Codec
+
+# Delete the lease only if we still own it
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Versioned compare-and-set of the full state. KEYS: state key, version key, ledger hash.
+# ARGV: expected version ('' for unconditional), payload, ttl seconds, then ledger field/value pairs.
+# Returns the new version, or -1 on a version mismatch.
+_SAVE_SESSION_SCRIPT = """
+local current = tonumber(redis.call('get', KEYS[2]) or '0')
+if ARGV[1] ~= '' and tonumber(ARGV[1]) ~= current then
+    return -1
+end
+redis.call('setex', KEYS[1], ARGV[3], ARGV[2])
+redis.call('del', KEYS[3])
+for i = 4, #ARGV, 2 do
+    redis.call('hset', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+if #ARGV > 3 then
+    redis.call('expire', KEYS[3], ARGV[3])
+end
+redis.call('setex', KEYS[2], ARGV[3], current + 1)
+return current + 1
+"""
+
+# Same, but only touches the changed ledger fields.
+# ARGV: expected version, payload, ttl seconds, number of removed fields,
+# the removed fields, then field/value pairs to set.
+# Returns -2 if the ledger is not stored as a hash yet (a full save is needed).
+_PATCH_SESSION_SCRIPT = """
+local current = tonumber(redis.call('get', KEYS[2]) or '0')
+if ARGV[1] ~= '' and tonumber(ARGV[1]) ~= current then
+    return -1
+end
+if redis.call('exists', KEYS[3]) == 0 then
+    return -2
+end
+redis.call('setex', KEYS[1], ARGV[3], ARGV[2])
+local removed = tonumber(ARGV[4])
+for i = 5, 4 + removed do
+    redis.call('hdel', KEYS[3], ARGV[i])
+end
+for i = 5 + removed, #ARGV, 2 do
+    redis.call('hset', KEYS[3], ARGV[i], ARGV[i + 1])
+end
+redis.call('expire', KEYS[3], ARGV[3])
+redis.call('setex', KEYS[2], ARGV[3], current + 1)
+return current + 1
+"""
 
 class RedisStorage(Storage):
     """
     Redis storage adapter using redis-py.
-    Models sessions as a JSON string stored under key `chronicle:session:{id}`.
+    Models sessions as an encoded string (summary, watermark) stored under key
+    `chronicle:session:{id}`, the fact ledger as a hash of encoded facts
+    under `chronicle:session:{id}:ledger`, and the version counter under
+    `chronicle:session:{id}:version`. Saves go through Lua compare-and-set
+    scripts so conditional writes are atomic; ledger patches only HSET/HDEL
+    the changed facts. Sessions saved before the ledger hash existed keep their
+    ledger inside the JSON string until their next full save. Archived episodes
+    are a list of encoded strings under `chronicle:episodes:{id}`, expiring with
+    the same TTL (refreshed on every append).
+    Values are written with `codec` (plain JSON by default; see `Codec` for
+    MessagePack and compression) and any codec's output reads back.
+    Async methods use `redis.asyncio`; sync methods use a pooled `redis.Redis`
+    client built from the same URL on first use.
     """
 
-    def __init__(self, url: str, ttl: int = 3600):
+    INVALIDATION_CHANNEL = "chronicle:invalidate"
+
+    def __init__(self, url: str, ttl: int = 3600, max_connections: Optional[int] = None, codec: Optional[Codec] = None):
         self.url = url
         self.ttl = ttl
+        self.max_connections = max_connections
+        self.codec = codec or Codec()
         self.client = None
+        self.sync_client = None
+        self._save_script = None
+        self._patch_script = None
+        self._sync_save_script = None
+        self._sync_patch_script = None
+        # Tags our own invalidation messages so subscribers can skip them
+        self._instance_id = uuid.uuid4().hex
 
     async def connect(self):
         if not self.client:
-            self.client = redis.from_url(self.url)
+            import redis.asyncio as redis
+
+            self.client = redis.from_url(self.url, max_connections=self.max_connections)
+            self._save_script = self.client.register_script(_SAVE_SESSION_SCRIPT)
+            self._patch_script = self.client.register_script(_PATCH_SESSION_SCRIPT)
+
+    def connect_sync(self):
+        # redis.Redis is thread-safe; its connection pool is shared by all threads
+        if not self.sync_client:
+            import redis as redis_sync
+
+            self.sync_client = redis_sync.Redis.from_url(self.url, max_connections=self.max_connections)
+            self._sync_save_script = self.sync_client.register_script(_SAVE_SESSION_SCRIPT)
+            self._sync_patch_script = self.sync_client.register_script(_PATCH_SESSION_SCRIPT)
 
     async def disconnect(self):
         if self.client:
             await self.client.close()
+        self.disconnect_sync()
+
+    def disconnect_sync(self):
+        if self.sync_client:
+            self.sync_client.close()
+            self.sync_client = None
+
+    @staticmethod
+    def _keys(session_id: str) -> List[str]:
+        return [f"chronicle:session:{session_id}", f"chronicle:session:{session_id}:version", f"chronicle:session:{session_id}:ledger"]
+
+    def _encode(self, summary: str, watermark: Optional[Dict[str, Any]]) -> bytes:
+        return self.codec.encode({
+            "summary": summary,
+            "updated_at": time.time(),
+            "watermark": watermark
+        })
+
+    def _decode(self, data: Optional[bytes], version: Optional[bytes], ledger: Dict[bytes, bytes]) -> Optional[Dict[str, Any]]:
+        if not data:
+            return None
+        state = self.codec.decode(data)
+        if ledger:
+            state["fact_ledger"] = {key.decode("utf-8"): self.codec.decode(value) for key, value in ledger.items()}
+        else:
+            state.setdefault("fact_ledger", {})
+        state["version"] = int(version) if version else 0
+        return state
+
+    def _fields(self, facts: Dict[str, Any]) -> List[Any]:
+        return [item for key, value in facts.items() for item in (key, self.codec.encode(value))]
+
+    def _save_args(self, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]], expected_version: Optional[int]) -> List[Any]:
+        expected = "" if expected_version is None else str(expected_version)
+        return [expected, self._encode(summary, watermark), self.ttl] + self._fields(fact_ledger)
+
+    def _patch_args(self, summary: str, changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]], expected_version: Optional[int]) -> List[Any]:
+        expected = "" if expected_version is None else str(expected_version)
+        return [expected, self._encode(summary, watermark), self.ttl, len(removed)] + list(removed) + self._fields(changed)
 
     def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
-        raise NotImplementedError("RedisStorage only supports async methods. Use aget_session.")
+        if not self.sync_client:
+            self.connect_sync()
+
+        state_key, version_key, ledger_key = self._keys(session_id)
+        pipe = self.sync_client.pipeline()
+        pipe.mget(state_key, version_key)
+        pipe.hgetall(ledger_key)
+        (data, version), ledger = pipe.execute()
+        return self._decode(data, version, ledger)
+
+    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        version = self._sync_save_script(
+            keys=self._keys(session_id), args=self._save_args(summary, fact_ledger, watermark, expected_version)
+        )
+        if version < 0:
+            raise SessionConflictError(session_id, expected_version)
+        return version
+
+    def save_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.sync_client:
+            self.connect_sync()
 
-    def save_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
-        raise NotImplementedError("RedisStorage only supports async methods. Use asave_session.")
+        version = self._sync_patch_script(
+            keys=self._keys(session_id), args=self._patch_args(summary, changed, removed, watermark, expected_version)
+        )
+        if version == -2:
+            return self.save_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        if version < 0:
+            raise SessionConflictError(session_id, expected_version)
+        return version
 
     async def aget_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         if not self.client:
             await self.connect()
             
-        data = await self.client.get(f"chronicle:session:{session_id}")
-        if data:
-            return json.loads(data)
-        return None
+        state_key, version_key, ledger_key = self._keys(session_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.mget(state_key, version_key)
+            pipe.hgetall(ledger_key)
+            (data, version), ledger = await pipe.execute()
+        return self._decode(data, version, ledger)
 
-    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any]) -> None:
+    async def asave_session(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
         if not self.client:
             await self.connect()
             
-        state = {
-            "summary": summary,
-            "fact_ledger": fact_ledger,
-            "updated_at": time.time()
+        version = await self._save_script(
+            keys=self._keys(session_id), args=self._save_args(summary, fact_ledger, watermark, expected_version)
+        )
+        if version < 0:
+            raise SessionConflictError(session_id, expected_version)
+        return version
+
+    async def asave_session_patch(self, session_id: str, summary: str, fact_ledger: Dict[str, Any], changed: Dict[str, Any], removed: List[str], watermark: Optional[Dict[str, Any]] = None, expected_version: Optional[int] = None) -> Optional[int]:
+        if not self.client:
+            await self.connect()
+
+        version = await self._patch_script(
+            keys=self._keys(session_id), args=self._patch_args(summary, changed, removed, watermark, expected_version)
+        )
+        if version == -2:
+            return await self.asave_session(session_id, summary, fact_ledger, watermark=watermark, expected_version=expected_version)
+        if version < 0:
+            raise SessionConflictError(session_id, expected_version)
+        return version
+
+    async def aget_sessions(self, session_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.client:
+            await self.connect()
+        if not session_ids:
+            return {}
+
+        keys = [self._keys(sid) for sid in session_ids]
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.mget([key for state_key, version_key, _ in keys for key in (state_key, version_key)])
+            for _, _, ledger_key in keys:
+                pipe.hgetall(ledger_key)
+            values, *ledgers = await pipe.execute()
+        return {
+            sid: self._decode(values[2 * i], values[2 * i + 1], ledgers[i])
+            for i, sid in enumerate(session_ids)
         }
-        await self.client.setex(f"chronicle:session:{session_id}", self.ttl, json.dumps(state))
+
+    async def asave_sessions(self, sessions: Dict[str, Dict[str, Any]]) -> List[str]:
+        if not self.client:
+            await self.connect()
+        if not sessions:
+            return []
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for sid, state in sessions.items():
+                await self._save_script(
+                    keys=self._keys(sid),
+                    args=self._save_args(state["summary"], state["fact_ledger"], state.get("watermark"), state.get("expected_version")),
+                    client=pipe
+                )
+            versions = await pipe.execute()
+        return [sid for sid, version in zip(sessions, versions) if version < 0]
+
+    async def aacquire_lease(self, name: str, ttl_ms: int) -> Optional[str]:
+        if not self.client:
+            await self.connect()
+
+        token = uuid.uuid4().hex
+        acquired = await self.client.set(f"chronicle:lease:{name}", token, nx=True, px=ttl_ms)
+        return token if acquired else None
+
+    async def arelease_lease(self, name: str, token: str) -> None:
+        if not self.client:
+            await self.connect()
+
+        await self.client.eval(_RELEASE_LEASE_SCRIPT, 1, f"chronicle:lease:{name}", token)
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        value = self.sync_client.get(f"chronicle:cache:{key}")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.sync_client:
+            self.connect_sync()
+
+        self.sync_client.set(f"chronicle:cache:{key}", value, ex=max(1, int(ttl_seconds)))
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        if not self.client:
+            await self.connect()
+
+        value = await self.client.get(f"chronicle:cache:{key}")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        if not self.client:
+            await self.connect()
+
+        await self.client.set(f"chronicle:cache:{key}", value, ex=max(1, int(ttl_seconds)))
+
+    def append_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.sync_client:
+            self.connect_sync()
+
+        key = f"chronicle:episodes:{session_id}"
+        pipe = self.sync_client.pipeline(transaction=True)
+        pipe.rpush(key, *[self.codec.encode(episode) for episode in episodes])
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def get_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.sync_client:
+            self.connect_sync()
+
+        return [self.codec.decode(item) for item in self.sync_client.lrange(f"chronicle:episodes:{session_id}", start, -1)]
+
+    async def aappend_episodes(self, session_id: str, episodes: List[Dict[str, Any]]) -> None:
+        if not self.client:
+            await self.connect()
+
+        key = f"chronicle:episodes:{session_id}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.rpush(key, *[self.codec.encode(episode) for episode in episodes])
+        pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+    async def aget_episodes(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        if not self.client:
+            await self.connect()
+
+        return [self.codec.decode(item) for item in await self.client.lrange(f"chronicle:episodes:{session_id}", start, -1)]
+
+    async def apublish_invalidation(self, session_id: str) -> None:
+        """
+        Tell other replicas' `CachedStorage` that `session_id` changed.
+        Use as `CachedStorage(redis_storage, publish=redis_storage.apublish_invalidation)`.
+        """
+        if not self.client:
+            await self.connect()
+
+        await self.client.publish(self.INVALIDATION_CHANNEL, f"{self._instance_id}:{session_id}")
+
+    def publish_invalidation(self, session_id: str) -> None:
+        """
+        Sync `apublish_invalidation`, for `CachedStorage(publish_sync=...)`.
+        """
+        if not self.sync_client:
+            self.connect_sync()
+
+        self.sync_client.publish(self.INVALIDATION_CHANNEL, f"{self._instance_id}:{session_id}")
+
+    async def asubscribe_invalidations(self, callback: Callable[[str], Any]) -> None:
+        """
+        Listen for invalidations published by other replicas and call
+        `callback(session_id)` for each, e.g. `CachedStorage.invalidate`.
+        Runs until cancelled; start it with `asyncio.create_task`.
+        """
+        if not self.client:
+            await self.connect()
+
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                origin, _, session_id = data.partition(":")
+                if origin != self._instance_id:
+                    callback(session_id)
+        finally:
+            await pubsub.unsubscribe(self.INVALIDATION_CHANNEL)
+            await pubsub.close()
@@ -0,0 +1,186 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .ledger import apply_delta
+
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a streamed worker response (one JSON object).
+
+    Feed it chunks as they arrive. Top-level values become available in
+    `values` once each is complete; members of the containers named in
+    `stream_keys` (the fact ledger, or delta-mode ledger operations) are
+    reported one by one in `members` as soon as each member is complete.
+    Text outside the object (e.g. a Markdown fence) is ignored.
+    """
+
+    def __init__(self, stream_keys: Tuple[str, ...] = ("fact_ledger", "ledger_ops")):
+        self.stream_keys = stream_keys
+        self.values: Dict[str, Any] = {}
+        # Object members as (key, value) pairs, array members as items
+        self.members: Dict[str, List[Any]] = {}
+        self.complete = False
+        self.started_at = time.monotonic()
+        self.first_member_at: Optional[float] = None
+
+        self._chars: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._top_start = 0
+        self._member_start = 0
+        self._streaming_key: Optional[str] = None
+        # Current member of the streamed container: past its ':' / already emitted
+        self._seen_colon = False
+        self._member_done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def _span(self, start: int, end: int) -> str:
+        return "".join(self._chars[start:end]).strip()
+
+    def feed(self, chunk: str) -> None:
+        offset = len(self._chars)
+        self._chars.extend(chunk)
+        if self.complete:
+            return
+
+        for i, c in enumerate(chunk, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._in_member_value():
+                        # A string value is complete at its closing quote
+                        self._finish_member(i + 1)
+                continue
+
+            if c == '"':
+                if self._stack:
+                    self._in_string = True
+            elif c in "{[":
+                depth = len(self._stack)
+                if depth == 0 and c != "{":
+                    continue
+                if depth == 1:
+                    key = self._key(self._top_start, i)
+                    if key in self.stream_keys:
+                        self._streaming_key = key
+                        self.members.setdefault(key, [])
+                        self._member_start = i + 1
+                self._stack.append(c)
+                if depth == 0:
+                    self._top_start = i + 1
+            elif c in "}]":
+                if not self._stack:
+                    continue
+                opened = self._stack.pop()
+                depth = len(self._stack)
+                if depth == 2 and self._streaming_key is not None:
+                    # A nested value of a member just closed
+                    self._finish_member(i + 1)
+                elif depth == 1 and self._streaming_key is not None:
+                    if not self._member_done:
+                        self._emit_member(self._member_start, i, opened)
+                    self._streaming_key = None
+                    self._seen_colon = self._member_done = False
+                elif depth == 0:
+                    self._emit_value(self._top_start, i)
+                    self.complete = True
+                    return
+            elif c == ":":
+                if len(self._stack) == 2 and self._streaming_key is not None:
+                    self._seen_colon = True
+            elif c == ",":
+                depth = len(self._stack)
+                if depth == 2 and self._streaming_key is not None:
+                    if not self._member_done:
+                        self._emit_member(self._member_start, i, self._stack[-1])
+                    self._member_start = i + 1
+                    self._seen_colon = self._member_done = False
+                elif depth == 1:
+                    self._emit_value(self._top_start, i)
+                    self._top_start = i + 1
+
+    def _in_member_value(self) -> bool:
+        if len(self._stack) != 2 or self._streaming_key is None or self._member_done:
+            return False
+        return self._stack[-1] == "[" or self._seen_colon
+
+    def _finish_member(self, end: int) -> None:
+        if not self._member_done:
+            self._emit_member(self._member_start, end, self._stack[-1])
+            self._member_done = True
+
+    def _key(self, start: int, end: int) -> Optional[str]:
+        try:
+            return json.loads(self._span(start, end).rstrip(":").strip())
+        except ValueError:
+            return None
+
+    def _emit_value(self, start: int, end: int) -> None:
+        text = self._span(start, end)
+        if not text:
+            return
+        try:
+            self.values.update(json.loads("{" + text + "}"))
+        except ValueError:
+            # Malformed member: the final parse will reject the whole response
+            pass
+
+    def _emit_member(self, start: int, end: int, container: str) -> None:
+        text = self._span(start, end)
+        if not text:
+            return
+        try:
+            if container == "{":
+                self.members[self._streaming_key].extend(json.loads("{" + text + "}").items())
+            else:
+                self.members[self._streaming_key].append(json.loads(text))
+        except ValueError:
+            return
+        if self.first_member_at is None:
+            self.first_member_at = time.monotonic()
+
+    def time_to_first_member_ms(self) -> Optional[float]:
+        if self.first_member_at is None:
+            return None
+        return round((self.first_member_at - self.started_at) * 1000, 2)
+
+
+def salvage_state(parser: IncrementalJSONParser, current_summary: str, fact_ledger: Dict[str, Any], delta: bool = False) -> Tuple[Optional[Dict[str, Any]], int, bool]:
+    """
+    Best state recoverable from a partially received worker response.
+    Returns `(state, facts_received, summary_received)`; state is None if
+    nothing usable arrived. Until the ledger section is complete, received
+    facts are layered over the current ledger (nothing is removed).
+    """
+    summary_received = "summary" in parser.values
+    if delta:
+        ops = parser.values.get("ledger_ops", parser.members.get("ledger_ops", []))
+        if not ops and not summary_received:
+            return None, 0, False
+        try:
+            state = apply_delta(current_summary, fact_ledger, {"summary": parser.values.get("summary"), "ledger_ops": ops})
+        except ValueError:
+            return None, 0, False
+        return state, len(ops), summary_received
+
+    received = parser.members.get("fact_ledger", [])
+    if not received and not summary_received and "fact_ledger" not in parser.values:
+        return None, 0, False
+    if isinstance(parser.values.get("fact_ledger"), dict):
+        ledger = parser.values["fact_ledger"]
+    else:
+        ledger = dict(fact_ledger, **dict(received))
+    summary = parser.values.get("summary", current_summary)
+    if not isinstance(summary, str):
+        summary = current_summary
+    return {"summary": summary, "fact_ledger": ledger}, len(received), summary_received
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .llm.base import LLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+def message_digest(message: Dict[str, Any]) -> str:
+    """
+    Stable content hash of a chat message, excluding its role.
+    Plain text messages hash the content directly; anything richer
+    (multi-part content, tool calls, names) hashes its canonical JSON form.
+    """
+    content = message.get("content")
+    if isinstance(content, str) and len(message) - ("role" in message) == 1:
+        payload = content.encode("utf-8")
+    else:
+        rest = {k: v for k, v in message.items() if k != "role"}
+        payload = json.dumps(rest, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class TokenCounter(ABC):
+    """
+    Counts chat tokens locally. Has the same `count_tokens(messages, model)`
+    signature as `LLMProvider`, so it can stand in for the provider's counter.
+
+    Messages are counted the way OpenAI-style chat formats are billed (and
+    litellm counts them): each message costs `tokens_per_message` plus its
+    role and content (plus `tokens_per_name` and the name, if any), and a
+    message list costs `reply_priming` on top.
+    """
+
+    tokens_per_message = 3
+    tokens_per_name = 1
+    reply_priming = 3
+
+    @abstractmethod
+    def count_texts(self, texts: List[str], model: str) -> List[int]:
+        """
+        Token counts of plain texts, in one batch.
+        """
+        pass
+
+    def count_tokens(self, messages: Union[str, List[Dict[str, Any]]], model: str) -> int:
+        if isinstance(messages, str):
+            return self.count_texts([messages], model)[0]
+        return self.reply_priming + sum(self.count_messages(messages, model))
+
+    def count_messages(self, messages: List[Dict[str, Any]], model: str) -> List[int]:
+        """
+        Tokens of each message, excluding list framing. All texts go to the
+        tokenizer in a single `count_texts` batch.
+        """
+        texts: List[str] = []
+        owners: List[int] = []
+        counts = []
+        for i, message in enumerate(messages):
+            base = self.tokens_per_message
+            for key, value in message.items():
+                if value is None:
+                    continue
+                if key == "name":
+                    base += self.tokens_per_name
+                texts.append(value if isinstance(value, str) else json.dumps(value, default=str))
+                owners.append(i)
+            counts.append(base)
+        if texts:
+            for i, tokens in zip(owners, self.count_texts(texts, model)):
+                counts[i] += tokens
+        return counts
+
+
+def _model_family(model: str) -> str:
+    name = model.lower().rsplit("/", 1)[-1]
+    if name.startswith(("gpt-4o", "gpt-4.1", "gpt-4.5", "gpt-5", "o1", "o3", "o4", "chatgpt-4o")):
+        return "o200k"
+    return "cl100k"
+
+
+class ApproximateTokenCounter(TokenCounter):
+    """
+    Tokenizer-free estimate: tokens ~ a * bytes + b * words + c * punctuation,
+    with (a, b, c) calibrated per model family. The defaults were fit on a
+    mixed corpus of prose, JSON ledgers and code against `cl100k_base` and
+    `o200k_base`; `calibrate` refits them for your own traffic or another
+    tokenizer. `benchmarks/token_counters.py` measures its error and speed
+    against `ExactTokenCounter` and `litellm.token_counter` on a sample corpus.
+    """
+
+    DEFAULT_CALIBRATION: Dict[str, Tuple[float, float, float]] = {
+        "cl100k": (0.037, 1.0985, 0.77),
+        "o200k": (0.038, 1.0871, 0.7752),
+    }
+
+    def __init__(self, calibration: Optional[Dict[str, Tuple[float, float, float]]] = None):
+        self.calibration = dict(self.DEFAULT_CALIBRATION)
+        if calibration:
+            self.calibration.update(calibration)
+
+    @staticmethod
+    def _features(text: str) -> Tuple[int, int, int]:
+        size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        # str.count runs in C; these characters cover most of what splits into extra tokens
+        punctuation = (
+            text.count('"') + text.count(",") + text.count(".") + text.count(":") + text.count("{")
+            + text.count("}") + text.count("(") + text.count(")") + text.count("_") + text.count("=")
+        )
+        return size, len(text.split()), punctuation
+
+    def _coefficients(self, model: str) -> Tuple[float, float, float]:
+        if model in self.calibration:
+            return self.calibration[model]
+        return self.calibration.get(_model_family(model), self.DEFAULT_CALIBRATION["cl100k"])
+
+    def count_texts(self, texts: List[str], model: str) -> List[int]:
+        a, b, c = self._coefficients(model)
+        counts = []
+        for text in texts:
+            size, words, punctuation = self._features(text)
+            counts.append(int(round(a * size + b * words + c * punctuation)) if text else 0)
+        return counts
+
+    def calibrate(self, corpus: List[str], exact: TokenCounter, model: str, key: Optional[str] = None) -> Tuple[float, float, float]:
+        """
+        Least-squares fit of the coefficients against `exact` counts over `corpus`.
+        Stored under `key` (default: the model's family) and returned.
+        """
+        features = [self._features(text) for text in corpus]
+        targets = exact.count_texts(list(corpus), model)
+        # Normal equations (X^T X) w = X^T y, solved by Gaussian elimination
+        rows = [
+            [sum(f[i] * f[j] for f in features) for j in range(3)] + [sum(f[i] * y for f, y in zip(features, targets))]
+            for i in range(3)
+        ]
+        for col in range(3):
+            pivot = max(range(col, 3), key=lambda r: abs(rows[r][col]))
+            rows[col], rows[pivot] = rows[pivot], rows[col]
+            if rows[col][col] == 0:
+                raise ValueError("Calibration corpus is too uniform to fit")
+            for r in range(3):
+                if r != col:
+                    factor = rows[r][col] / rows[col][col]
+                    rows[r] = [x - factor * y for x, y in zip(rows[r], rows[col])]
+        coefficients = tuple(rows[i][3] / rows[i][i] for i in range(3))
+        self.calibration[key or _model_family(model)] = coefficients
+        return coefficients
+
+
+class ExactTokenCounter(TokenCounter):
+    """
+    Exact counts with the tokenizer `litellm.token_counter` uses for the model (tiktoken or
+    a Hugging Face tokenizer). Large batches are split across a thread pool,
+    which pays off on multi-core hosts since the tokenizers encode outside
+    the GIL; `max_workers` defaults to the CPU count, capped at 4.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, parallel_threshold: int = 64):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.parallel_threshold = parallel_threshold
+        self._tokenizers: Dict[str, Any] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _litellm_tokenizer(model: str) -> Callable[[str], int]:
+        # litellm internals: the tokenizer behind `token_counter`, called directly
+        from litellm.utils import _select_tokenizer
+
+        selected = _select_tokenizer(model=model)
+        if selected["type"] == "openai_tokenizer":
+            encoding = selected["tokenizer"]
+            try:
+                # Newer litellm counts with a per-model encoding (o200k for gpt-4o)
+                from litellm.litellm_core_utils.token_counter import openai_tokenizer_encoding
+
+                encoding = openai_tokenizer_encoding(model)
+            except ImportError:
+                pass
+            if hasattr(encoding, "count"):
+                return encoding.count
+            return lambda text: len(encoding.encode_ordinary(text))
+        encode = selected["tokenizer"].encode
+        return lambda text: len(encode(text).ids)
+
+    def _tokenizer(self, model: str) -> Callable[[str], int]:
+        tokenizer = self._tokenizers.get(model)
+        if tokenizer is None:
+            try:
+                tokenizer = self._litellm_tokenizer(model)
+                # A reshaped encoding only fails once used, so try it here
+                tokenizer("probe")
+            except Exception as e:
+                # Renamed or reshaped internals: same counts through the public API, just slower
+                logger.warning("Falling back to litellm.token_counter for %s: %r", model, e)
+                import litellm
+
+                tokenizer = lambda text: litellm.token_counter(model=model, text=text)
+            self._tokenizers[model] = tokenizer
+        return tokenizer
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chronicle-tokens")
+            return self._executor
+
+    def count_texts(self, texts: List[str], model: str) -> List[int]:
+        count = self._tokenizer(model)
+        if len(texts) < self.parallel_threshold or self.max_workers <= 1:
+            return [count(text) for text in texts]
+
+        size = -(-len(texts) // self.max_workers)
+        chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+        counts: List[int] = []
+        for chunk_counts in self._pool().map(lambda chunk: [count(text) for text in chunk], chunks):
+            counts.extend(chunk_counts)
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+class MessageTokenCounter:
+    """
+    Memoizing token counter.
+
+    A list of messages costs `framing + sum(per-message tokens)` for chat
+    tokenizers, so each message is tokenized once and its count cached under
+    (model, role, content). Plain string content is used as the key directly,
+    since Python caches string hashes and lookups for messages the caller keeps
+    re-sending are O(1); richer messages are keyed by `message_digest`.
+    Only unseen messages hit the provider's tokenizer (or the `TokenCounter`,
+    which gets them in one batch); the framing overhead is measured once per
+    model. The cache is a bounded LRU, safe to share between threads (it is
+    locked only around lookups and stores, never while tokenizing);
+    `max_entries=0` disables caching.
+    """
+
+    def __init__(self, llm: Union[LLMProvider, TokenCounter], max_entries: int = 4096):
+        self.llm = llm
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, str, Any], int]" = OrderedDict()
+        self._framing: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def count(self, messages: Union[str, List[Dict[str, Any]]], model: str) -> int:
+        if isinstance(messages, str) or self.max_entries <= 0:
+            return self.llm.count_tokens(messages, model=model)
+
+        total = self._framing_tokens(model)
+        missing = []
+        for message in messages:
+            key = self._key(message, model)
+            cached = self._lookup(key)
+            if cached is None:
+                missing.append((key, message))
+                continue
+            total += cached
+
+        if missing:
+            counts = self._count_uncached([message for _, message in missing], model)
+            for (key, _), tokens in zip(missing, counts):
+                self._store(key, tokens)
+                total += tokens
+        return total
+
+    def count_message(self, message: Dict[str, Any], model: str) -> int:
+        """
+        Tokens contributed by a single message, excluding list framing.
+        """
+        key = self._key(message, model)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        tokens = self._count_uncached([message], model)[0]
+        self._store(key, tokens)
+        return tokens
+
+    @staticmethod
+    def _key(message: Dict[str, Any], model: str) -> Tuple[str, str, Any]:
+        content = message.get("content")
+        if isinstance(content, str) and len(message) - ("role" in message) == 1:
+            return (model, message.get("role", ""), content)
+        return (model, message.get("role", ""), message_digest(message))
+
+    def _lookup(self, key: Tuple[str, str, Any]) -> Optional[int]:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+    def _count_uncached(self, messages: List[Dict[str, Any]], model: str) -> List[int]:
+        with self._lock:
+            self.misses += len(messages)
+        if isinstance(self.llm, TokenCounter):
+            # One tokenizer batch for all cache misses
+            return self.llm.count_messages(messages, model)
+        framing = self._framing_tokens(model)
+        return [max(0, self.llm.count_tokens([message], model=model) - framing) for message in messages]
+
+    def _store(self, key: Tuple[str, str, Any], tokens: int) -> None:
+        if self.max_entries > 0:
+            with self._lock:
+                self._cache[key] = tokens
+                self._cache.move_to_end(key)
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+
+    def _framing_tokens(self, model: str) -> int:
+        framing = self._framing.get(model)
+        if framing is None:
+            framing = max(0, self.llm.count_tokens([], model=model))
+            self._framing[model] = framing
+        return framing
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._framing.clear()
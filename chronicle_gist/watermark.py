@@ -0,0 +1,60 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tokens import message_digest
+
+
+def history_hash(messages: List[Dict[str, Any]], seed: str = "") -> str:
+    """
+    Rolling hash over a message prefix. Each step folds the previous hash,
+    the role and the message content digest, so any edit, reorder or
+    truncation inside the prefix changes the result. Passing the hash of a
+    prefix as `seed` continues it over the following messages.
+    """
+    h = seed
+    for message in messages:
+        step = f"{h}|{message.get('role', '')}|{message_digest(message)}"
+        h = hashlib.blake2b(step.encode("utf-8"), digest_size=16).hexdigest()
+    return h
+
+
+def make_watermark(
+    compressed_history: List[Dict[str, Any]], base: Optional[Dict[str, Any]] = None, tokens: int = 0
+) -> Dict[str, Any]:
+    """
+    Watermark recording which prefix of the raw history is already folded
+    into the stored summary and fact ledger, and how many tokens it held.
+    When `compressed_history` is a delta after `base`, the watermark extends
+    `base` without rehashing the prefix; `tokens` counts only `compressed_history`.
+    """
+    if base:
+        return {
+            "count": base["count"] + len(compressed_history),
+            "hash": history_hash(compressed_history, seed=base["hash"]),
+            "tokens": base.get("tokens", 0) + tokens,
+        }
+    return {
+        "count": len(compressed_history),
+        "hash": history_hash(compressed_history),
+        "tokens": tokens,
+    }
+
+
+def split_at_watermark(
+    raw_history: List[Dict[str, Any]], watermark: Optional[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Return the messages that still need compressing and whether that is a
+    delta after the watermark (True) or the full history (False).
+    Falls back to the full history when there is no watermark or the caller's
+    history no longer starts with the compressed prefix (edited or truncated).
+    """
+    if not watermark:
+        return raw_history, False
+
+    count = watermark.get("count", 0)
+    if count <= 0 or count > len(raw_history):
+        return raw_history, False
+    if history_hash(raw_history[:count]) != watermark.get("hash"):
+        return raw_history, False
+    return raw_history[count:], True
@@ -66,6 +66,7 @@ async def test_mongo(api_key: str):
             [{"role": "assistant", "content": "Documents are flexible."}]
         )
         print(f"Mongo Result: {result['meta']['bloat_detected']}")
+        await storage.disconnect()
     except Exception as e:
         print(f"Skipping Mongo test: {e}")
 
@@ -0,0 +1,22 @@
+from chronicle_gist.llm.base import LLMProvider
+
+
+class WordCountProvider(LLMProvider):
+    """
+    One token per word; `count_calls` counts how often a prompt is tokenized.
+    Never asked to compress unless a subclass supplies the worker model.
+    """
+
+    count_calls = 0
+
+    def count_tokens(self, messages, model):
+        self.count_calls += 1
+        if isinstance(messages, str):
+            return len(messages.split())
+        return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+    def completion(self, messages, model, response_format=None):
+        raise AssertionError("no compression expected")
+
+    async def acompletion(self, messages, model, response_format=None):
+        raise AssertionError("no compression expected")
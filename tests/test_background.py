@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.background import CompressionQueue
+from helpers import WordCountProvider
+
+
+class SlowProvider(WordCountProvider):
+    """One token per word; the worker model takes `delay` seconds to answer."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return json.dumps({"summary": "compressed", "fact_ledger": {"calls": self.calls}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        await asyncio.sleep(self.delay)
+        return self.completion(messages, model, response_format)
+
+
+HISTORY = [
+    {"role": "user", "content": "I am planning a trip to Lisbon in May"},
+    {"role": "assistant", "content": "Great, what is your budget for the trip"},
+]
+
+
+class TestBackgroundCompression(unittest.TestCase):
+    def test_returns_before_worker_and_saves_later(self):
+        async def run():
+            provider = SlowProvider(delay=0.2)
+            chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=5, background_compression=True)
+            new_msg = {"role": "user", "content": "around 2000 euros"}
+
+            started = time.perf_counter()
+            result = await chronicle.process_async("s", new_msg, HISTORY)
+            self.assertLess(time.perf_counter() - started, 0.1)
+            meta = result["meta"]
+            self.assertEqual(meta["compression"], "pending")
+            self.assertTrue(meta["compression_pending"])
+            # Nothing stored yet, so the uncovered history is still in the prompt
+            self.assertEqual(result["hydrated_messages"][-3:], HISTORY + [new_msg])
+
+            self.assertTrue(await chronicle.drain(timeout=2))
+            self.assertEqual(chronicle.storage.get_session("s")["summary"], "compressed")
+
+            meta = (await chronicle.process_async("s", new_msg, HISTORY))["meta"]
+            self.assertEqual(meta["compression"], "up_to_date")
+            self.assertEqual(meta["background_applied"], 1)
+            self.assertTrue(await chronicle.aclose())
+
+        asyncio.run(run())
+
+
+class TestCompressionQueue(unittest.TestCase):
+    def test_coalesces_and_bounds_pending_jobs(self):
+        async def run():
+            queue = CompressionQueue(max_pending=2, workers=1)
+            ran = []
+
+            async def job(name):
+                ran.append(name)
+
+            self.assertEqual(queue.submit("a", lambda: job("a1")), "queued")
+            self.assertEqual(queue.submit("a", lambda: job("a2")), "coalesced")
+            self.assertEqual(queue.submit("b", lambda: job("b")), "queued")
+            self.assertEqual(queue.submit("c", lambda: job("c")), "full")
+
+            self.assertTrue(await queue.close(timeout=1))
+            self.assertEqual(ran, ["a2", "b"])
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
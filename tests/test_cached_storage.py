@@ -0,0 +1,95 @@
+import asyncio
+import time
+import unittest
+
+from chronicle_gist import CachedStorage, InMemoryStorage
+
+
+class CountingStorage(InMemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    def get_session(self, session_id):
+        self.reads += 1
+        return super().get_session(session_id)
+
+
+class TestCachedStorage(unittest.TestCase):
+    def test_reads_are_served_from_cache_after_write_through(self):
+        async def run():
+            inner = CountingStorage()
+            cache = CachedStorage(inner, max_entries=10, ttl=60)
+            await cache.asave_session("s", "summary", {"k": "v"})
+            for _ in range(3):
+                state = await cache.aget_session("s")
+            self.assertEqual(state["fact_ledger"], {"k": "v"})
+            self.assertEqual(inner.reads, 0)
+            self.assertEqual(cache.stats()["hits"], 3)
+
+        asyncio.run(run())
+
+    def test_lru_eviction_and_ttl_expiry(self):
+        inner = CountingStorage()
+        cache = CachedStorage(inner, max_entries=2, ttl=0.05)
+        for sid in ("a", "b", "c"):
+            cache.save_session(sid, sid, {})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        self.assertEqual(cache.get_session("a")["summary"], "a")
+        self.assertEqual(inner.reads, 1)
+
+        time.sleep(0.06)
+        cache.get_session("c")
+        stats = cache.stats()
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(inner.reads, 2)
+
+    def test_invalidation_hooks(self):
+        async def run():
+            inner = CountingStorage()
+            published = []
+
+            async def publish(session_id):
+                published.append(session_id)
+
+            cache = CachedStorage(inner, publish=publish)
+            await cache.asave_session("s", "v1", {})
+            self.assertEqual(published, ["s"])
+
+            # Another replica wrote directly to the backend and notified us
+            inner.save_session("s", "v2", {})
+            cache.invalidate("s")
+            self.assertEqual((await cache.aget_session("s"))["summary"], "v2")
+
+            async def version_of(session_id):
+                return inner._store[session_id]["updated_at"]
+
+            versioned = CachedStorage(inner, version_of=version_of)
+            await versioned.aget_session("s")
+            inner.save_session("s", "v3", {})
+            inner._store["s"]["updated_at"] += 1
+            self.assertEqual((await versioned.aget_session("s"))["summary"], "v3")
+
+        asyncio.run(run())
+
+    def test_sync_invalidation_hooks(self):
+        inner = CountingStorage()
+        published = []
+        cache = CachedStorage(
+            inner, publish_sync=published.append,
+            version_of_sync=lambda session_id: inner.get_session(session_id)["version"]
+        )
+        cache.save_session("s", "v1", {})
+        cache.save_session_patch("s", "v2", {"k": 1}, {"k": 1}, [])
+        self.assertEqual(published, ["s", "s"])
+        self.assertEqual(cache.get_session("s")["summary"], "v2")
+
+        # Another replica wrote directly to the backend
+        inner.save_session("s", "v3", {})
+        self.assertEqual(cache.get_session("s")["summary"], "v3")
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
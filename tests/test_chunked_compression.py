@@ -0,0 +1,119 @@
+import asyncio
+import json
+import re
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage, RecordingInstrumentation
+from chronicle_gist.chunking import split_by_tokens
+from helpers import WordCountProvider
+
+FACT = re.compile(r'(k\d+)(?:=|\\?": \\?")(v\d+)')
+
+
+class FoldingProvider(WordCountProvider):
+    """
+    One token per word. Folds every `kN=vN` fact in the prompt (raw or already
+    in a partial ledger) into the ledger; `fail_once` makes the first call whose
+    prompt contains it raise. Tracks calls and peak concurrency.
+    """
+
+    def __init__(self, summary_words=3, fail_once=None, delay=0.0):
+        self.summary_words = summary_words
+        self.fail_once = fail_once
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if self.fail_once and self.fail_once in prompt:
+            self.fail_once = None
+            raise ConnectionError("worker reset")
+        summary = " ".join(["gist"] * self.summary_words)
+        return json.dumps({"summary": summary, "fact_ledger": dict(FACT.findall(prompt))})
+
+    async def acompletion(self, messages, model, response_format=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return self.completion(messages, model, response_format)
+        finally:
+            self.in_flight -= 1
+
+
+def transcript(turns):
+    return [{"role": "user", "content": f"turn {i} filler words here k{i}=v{i} done"} for i in range(turns)]
+
+
+NEW_MESSAGE = {"role": "user", "content": "next"}
+
+
+class TestChunkedCompression(unittest.TestCase):
+    def test_split_by_tokens(self):
+        chunks = split_by_tokens(list("abcde"), [3, 3, 9, 1, 1], budget=6)
+        self.assertEqual(chunks, [["a", "b"], ["c"], ["d", "e"]])
+
+    def test_map_then_reduce(self):
+        provider = FoldingProvider()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=10, chunk_tokens=16)
+        chronicle.process("s", NEW_MESSAGE, transcript(8))
+
+        # 4 chunks of 2 messages, then one reduce into the stored state
+        self.assertEqual(provider.calls, 5)
+        ledger = chronicle.storage.get_session("s")["fact_ledger"]
+        self.assertEqual(ledger, {f"k{i}": f"v{i}" for i in range(8)})
+        self.assertEqual(chronicle.stats()["chunked_compressions"], 1)
+
+    def test_small_history_is_not_chunked(self):
+        provider = FoldingProvider()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=10, chunk_tokens=1000)
+        chronicle.process("s", NEW_MESSAGE, transcript(3))
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(chronicle.stats()["chunked_compressions"], 0)
+
+    def test_async_bounded_parallelism_and_chunk_retry(self):
+        async def run():
+            hook = RecordingInstrumentation()
+            provider = FoldingProvider(fail_once="k4=v4", delay=0.01)
+            chronicle = Chronicle(
+                storage=InMemoryStorage(), llm_provider=provider, token_threshold=10,
+                chunk_tokens=16, chunk_concurrency=2, instrumentation=hook,
+            )
+            with self.assertLogs("chronicle_gist", level="WARNING"):
+                await chronicle.process_async("s", NEW_MESSAGE, transcript(8))
+            session = await chronicle.storage.aget_session("s")
+            return provider, chronicle.stats(), hook.snapshot()["events"], session
+
+        provider, stats, events, session = asyncio.run(run())
+        self.assertEqual(provider.peak, 2)
+        self.assertEqual(provider.calls, 6)
+        self.assertEqual(stats["chunks_retried"], 1)
+        self.assertEqual(events["chunk_retry"], 1)
+        self.assertEqual(session["fact_ledger"], {f"k{i}": f"v{i}" for i in range(8)})
+        self.assertEqual(session["watermark"]["count"], 8)
+
+    def test_hierarchical_reduce(self):
+        provider = FoldingProvider()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=10, chunk_tokens=40)
+        chronicle.process("s", NEW_MESSAGE, transcript(24))
+
+        # 6 chunks of 4 messages, their partials reduced in 2 groups, then the final fold
+        self.assertEqual(provider.calls, 6 + 2 + 1)
+        ledger = chronicle.storage.get_session("s")["fact_ledger"]
+        self.assertEqual(ledger, {f"k{i}": f"v{i}" for i in range(24)})
+
+    def test_chunk_failing_every_retry_fails_compression(self):
+        provider = FoldingProvider()
+        provider.completion = lambda *args, **kwargs: "not json"
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=10, chunk_tokens=16, chunk_retries=1)
+        with self.assertLogs("chronicle_gist", level="WARNING"):
+            result = chronicle.process("s", NEW_MESSAGE, transcript(8))
+        self.assertIsNone(chronicle.storage.get_session("s"))
+        self.assertEqual(result["meta"]["compression"], "failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import unittest
+
+from chronicle_gist.storage.codec import Codec
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+STATE = {
+    "summary": "User is planning a trip to Lisbon in March. " * 40,
+    "updated_at": 1700000000.5,
+    "watermark": {"count": 12, "hash": "ab12", "tokens": 3400},
+    "fact_ledger": {"name": "Dana", "allergies": ["peanuts"], "city": "Lisbon", "note": "café"},
+}
+
+
+class TestCodec(unittest.TestCase):
+    def test_plain_json_is_untagged_and_legacy_json_reads(self):
+        codec = Codec()
+        encoded = codec.encode(STATE)
+        self.assertEqual(json.loads(encoded), STATE)
+        self.assertEqual(codec.decode(json.dumps(STATE).encode("utf-8")), STATE)
+        self.assertEqual(codec.decode(json.dumps(STATE)), STATE)
+
+    def test_zlib_above_threshold_only(self):
+        codec = Codec(compression="zlib", threshold=1024)
+        small = {"city": "Lisbon"}
+        self.assertEqual(codec.encode(small), Codec().encode(small))
+        encoded = codec.encode(STATE)
+        self.assertLess(len(encoded), len(Codec().encode(STATE)) // 3)
+        self.assertEqual(codec.decode(encoded), STATE)
+        # Any codec reads any payload, so settings can change on live data
+        self.assertEqual(Codec().decode(encoded), STATE)
+
+    @unittest.skipUnless(msgpack and zstandard, "msgpack or zstandard not installed")
+    def test_msgpack_and_zstd_round_trip(self):
+        for codec in (Codec("msgpack"), Codec("msgpack", "zstd"), Codec("json", "zstd", threshold=0)):
+            encoded = codec.encode(STATE)
+            self.assertEqual(codec.decode(encoded), STATE)
+            self.assertEqual(Codec().decode(encoded), STATE)
+        self.assertEqual(Codec("msgpack").decode(Codec("msgpack").encode("é")), "é")
+
+    def test_rejects_unknown_settings_and_tags(self):
+        with self.assertRaises(ValueError):
+            Codec(format="pickle")
+        with self.assertRaises(ValueError):
+            Codec(compression="lz4")
+        with self.assertRaises(ValueError):
+            Codec().decode(b"\xc1x-{}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import unittest
+from typing import Dict, Optional
+
+from chronicle_gist import Chronicle, CompressionCache, InMemoryStorage, RecordingInstrumentation
+from chronicle_gist.compression_cache import compression_key
+from helpers import WordCountProvider
+
+
+class CountingProvider(WordCountProvider):
+    """One token per word; always returns `response` and counts worker calls."""
+
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return self.response
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+class DictCacheStorage(InMemoryStorage):
+    """In-memory stand-in for a shared cache tier (Redis, Postgres, Mongo)."""
+
+    def __init__(self):
+        super().__init__()
+        self.cache: Dict[str, str] = {}
+
+    def get_cache_entry(self, key: str) -> Optional[str]:
+        return self.cache.get(key)
+
+    def set_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.cache[key] = value
+
+    async def aget_cache_entry(self, key: str) -> Optional[str]:
+        return self.get_cache_entry(key)
+
+    async def aset_cache_entry(self, key: str, value: str, ttl_seconds: int) -> None:
+        self.set_cache_entry(key, value, ttl_seconds)
+
+
+GOOD = json.dumps({"summary": "User wants a laptop.", "fact_ledger": {"budget": 2000}})
+HISTORY = [
+    {"role": "user", "content": "I need a laptop for video editing work"},
+    {"role": "assistant", "content": "What is your budget for it"},
+    {"role": "user", "content": "About two thousand dollars"},
+]
+NEW_MESSAGE = {"role": "user", "content": "Any suggestions"}
+
+
+class TestCompressionCache(unittest.TestCase):
+    def test_identical_compression_skips_worker(self):
+        provider = CountingProvider(GOOD)
+        hook = RecordingInstrumentation()
+        cache = CompressionCache()
+        chronicle = Chronicle(
+            storage=InMemoryStorage(), llm_provider=provider, token_threshold=8,
+            instrumentation=hook, compression_cache=cache,
+        )
+        first = chronicle.process("a", NEW_MESSAGE, HISTORY)
+        second = chronicle.process("b", NEW_MESSAGE, HISTORY)
+
+        self.assertEqual(provider.calls, 1)
+        self.assertEqual(first["hydrated_messages"], second["hydrated_messages"])
+        self.assertEqual(chronicle.storage.get_session("b")["fact_ledger"], {"budget": 2000})
+        stats = chronicle.stats()["compression_cache"]
+        self.assertEqual((stats["local_hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+        events = hook.snapshot()["events"]
+        self.assertEqual((events["compression_cache_hit"], events["compression_cache_miss"]), (1, 1))
+
+    def test_failed_compressions_are_not_cached(self):
+        provider = CountingProvider("not json")
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=8, compression_cache=CompressionCache())
+        with self.assertLogs("chronicle_gist", level="WARNING"):
+            chronicle.process("a", NEW_MESSAGE, HISTORY)
+            chronicle.process("b", NEW_MESSAGE, HISTORY)
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(chronicle.compression_cache.stats()["entries"], 0)
+
+    def test_shared_tier_across_instances(self):
+        async def run():
+            shared = DictCacheStorage()
+            first = CountingProvider(GOOD)
+            second = CountingProvider(GOOD)
+            for provider in (first, second):
+                chronicle = Chronicle(
+                    storage=InMemoryStorage(), llm_provider=provider, token_threshold=8,
+                    compression_cache=CompressionCache(shared=shared),
+                )
+                await chronicle.process_async("s", NEW_MESSAGE, HISTORY)
+            return first.calls, second.calls, chronicle.compression_cache.stats()
+
+        first_calls, second_calls, stats = asyncio.run(run())
+        self.assertEqual((first_calls, second_calls), (1, 0))
+        self.assertEqual(stats["shared_hits"], 1)
+
+    def test_lru_eviction_and_key_stability(self):
+        cache = CompressionCache(max_entries=2)
+        for i in range(3):
+            cache.put(str(i), {"summary": str(i)})
+        self.assertIsNone(cache.get("0"))
+        self.assertEqual(cache.get("2"), {"summary": "2"})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+        key = compression_key("m", "1:full", "s", {"a": 1, "b": 2}, HISTORY)
+        self.assertEqual(key, compression_key("m", "1:full", "s", {"b": 2, "a": 1}, HISTORY))
+        self.assertNotEqual(key, compression_key("m", "1:delta", "s", {"a": 1, "b": 2}, HISTORY))
+
+
+if __name__ == "__main__":
+    unittest.main()
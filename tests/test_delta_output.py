@@ -0,0 +1,95 @@
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.ledger import apply_delta
+from helpers import WordCountProvider
+
+
+class DeltaProvider(WordCountProvider):
+    """One token per word; the worker answers with a fixed response."""
+
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    def completion(self, messages, model, response_format=None):
+        self.prompts.append(messages[-1]["content"])
+        return json.dumps(self.response)
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+HISTORY = [
+    {"role": "user", "content": "Actually my budget is now three thousand dollars"},
+    {"role": "assistant", "content": "Noted, I will look for higher end models"},
+]
+NEW_MESSAGE = {"role": "user", "content": "Also add a mouse to my order"}
+
+
+class TestApplyDelta(unittest.TestCase):
+    def test_operations(self):
+        ledger = {"budget": 2000, "city": "Pune", "orders": ["laptop"]}
+        state = apply_delta("Wants a laptop.", ledger, {
+            "summary": {"op": "append", "text": "Raised the budget."},
+            "ledger_ops": [
+                {"op": "set", "key": "budget", "value": 3000},
+                {"op": "delete", "key": "city"},
+                {"op": "delete", "key": "never_stored"},
+                {"op": "append", "key": "orders", "value": "mouse"},
+                {"op": "append", "key": "wishlist", "value": "dock"},
+            ],
+        })
+        self.assertEqual(state["summary"], "Wants a laptop.\nRaised the budget.")
+        self.assertEqual(state["fact_ledger"], {"budget": 3000, "orders": ["laptop", "mouse"], "wishlist": ["dock"]})
+        # The stored ledger is left untouched
+        self.assertEqual(ledger, {"budget": 2000, "city": "Pune", "orders": ["laptop"]})
+
+    def test_summary_replace_and_missing_parts(self):
+        self.assertEqual(apply_delta("old", {"a": 1}, {"summary": {"op": "replace", "text": "new"}})["summary"], "new")
+        self.assertEqual(apply_delta("old", {"a": 1}, {}), {"summary": "old", "fact_ledger": {"a": 1}})
+
+    def test_invalid_operations_are_rejected(self):
+        for delta in (
+            {"ledger_ops": [{"op": "rename", "key": "a"}]},
+            {"ledger_ops": [{"op": "set", "value": 1}]},
+            {"ledger_ops": [{"op": "set", "key": "a"}]},
+            {"ledger_ops": [{"op": "append", "key": "a", "value": 2}]},
+            {"ledger_ops": {"op": "set", "key": "a", "value": 1}},
+            {"summary": {"op": "prepend", "text": "x"}},
+        ):
+            with self.assertRaises(ValueError):
+                apply_delta("", {"a": 1}, delta)
+
+
+class TestDeltaOutputMode(unittest.TestCase):
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        self.storage.save_session("s", "Wants a laptop.", {"budget": 2000, "brand": "Dell"})
+
+    def test_delta_response_is_applied_to_stored_state(self):
+        provider = DeltaProvider({
+            "summary": {"op": "append", "text": "Raised the budget and added a mouse."},
+            "ledger_ops": [{"op": "set", "key": "budget", "value": 3000}, {"op": "append", "key": "orders", "value": "mouse"}],
+        })
+        chronicle = Chronicle(storage=self.storage, llm_provider=provider, token_threshold=10, delta_output=True)
+        result = chronicle.process("s", NEW_MESSAGE, HISTORY)
+
+        self.assertEqual(result["meta"]["compression"], "applied")
+        self.assertIn("ledger_ops", provider.prompts[0])
+        state = self.storage.get_session("s")
+        self.assertEqual(state["summary"], "Wants a laptop.\nRaised the budget and added a mouse.")
+        self.assertEqual(state["fact_ledger"], {"budget": 3000, "brand": "Dell", "orders": ["mouse"]})
+
+    def test_invalid_delta_fails_compression_without_touching_state(self):
+        provider = DeltaProvider({"ledger_ops": [{"op": "append", "key": "budget", "value": 1}]})
+        chronicle = Chronicle(storage=self.storage, llm_provider=provider, token_threshold=10, delta_output=True)
+        result = chronicle.process("s", NEW_MESSAGE, HISTORY)
+
+        self.assertEqual(result["meta"]["compression"], "failed")
+        self.assertEqual(self.storage.get_session("s")["fact_ledger"], {"budget": 2000, "brand": "Dell"})
+
+
+if __name__ == "__main__":
+    unittest.main()
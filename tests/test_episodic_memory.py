@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from helpers import WordCountProvider
+
+try:
+    import numpy
+    from chronicle_gist import EpisodicMemory
+except ImportError:
+    numpy = None
+
+
+class SummaryProvider(WordCountProvider):
+    """One token per word; every compression returns the same short state."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return json.dumps({"summary": f"Part {self.calls}.", "fact_ledger": {}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+TOPICS = [
+    "my passport expires in march and I booked flights to lisbon",
+    "the kitchen sink leaks whenever the dishwasher drains water",
+    "our team standup moved to nine thirty on tuesdays",
+    "the dog needs his rabies vaccine before the kennel stay",
+]
+HISTORY = []
+for i, topic in enumerate(TOPICS):
+    HISTORY.append({"role": "user", "content": topic})
+    HISTORY.append({"role": "assistant", "content": f"Noted, item {i}."})
+
+
+@unittest.skipUnless(numpy, "numpy not installed")
+class TestEpisodicMemory(unittest.TestCase):
+    def test_archive_on_compression_then_recall(self):
+        storage = InMemoryStorage()
+        memory = EpisodicMemory(top_k=1, token_budget=100, episode_tokens=15)
+        chronicle = Chronicle(storage=storage, llm_provider=SummaryProvider(), token_threshold=20, episodic_memory=memory)
+        self.assertIs(memory.storage, storage)
+
+        chronicle.process("s", {"role": "user", "content": "hi"}, HISTORY)
+        self.assertEqual(len(storage.get_episodes("s")), 4)
+
+        result = chronicle.process("s", {"role": "user", "content": "when does my passport expire?"}, HISTORY)
+        memory_block, recall = result["hydrated_messages"][:2]
+        self.assertNotIn("[EPISODIC RECALL]", memory_block["content"])
+        self.assertEqual(recall["role"], "system")
+        self.assertTrue(recall["content"].startswith("[EPISODIC RECALL]"))
+        self.assertIn("lisbon", recall["content"])
+        self.assertNotIn("dishwasher", recall["content"])
+        self.assertEqual(result["meta"]["episodes"]["recalled"], 1)
+        self.assertEqual(result["meta"]["episodes"]["searched"], 4)
+
+    def test_chunked_compression_archives_mini_summaries(self):
+        async def run():
+            storage = InMemoryStorage()
+            chronicle = Chronicle(
+                storage=storage, llm_provider=SummaryProvider(), token_threshold=20, chunk_tokens=15,
+                episodic_memory=EpisodicMemory(),
+            )
+            await chronicle.process_async("s", {"role": "user", "content": "hi"}, HISTORY)
+            return await storage.aget_episodes("s")
+
+        episodes = asyncio.run(run())
+        self.assertEqual(len(episodes), 4)
+        self.assertTrue(all(episode["summary"].startswith("Part") for episode in episodes))
+        self.assertEqual([m["content"] for e in episodes for m in e["messages"]], [m["content"] for m in HISTORY])
+
+    def test_index_catches_up_with_other_instances(self):
+        storage = InMemoryStorage()
+        storage.save_session("s", "", {})
+        reader = EpisodicMemory(storage=storage, top_k=1, min_score=0.0)
+        writer = EpisodicMemory(storage=storage)
+        count = lambda text: len(text.split())
+
+        writer.archive("s", writer.make_episodes([([HISTORY[0]], "")]))
+        self.assertEqual(reader.recall("s", "passport", count)[1]["searched"], 1)
+        writer.archive("s", writer.make_episodes([([HISTORY[2]], ""), ([HISTORY[4]], "")]))
+        recalled, metrics = reader.recall("s", "standup on tuesdays", count)
+        self.assertEqual(metrics["searched"], 3)
+        self.assertIn("standup", recalled[0]["messages"][0]["content"])
+
+    def test_recall_scores_outside_the_lock(self):
+        memory = EpisodicMemory(storage=InMemoryStorage(), min_score=-1.0)
+        memory.archive("s", memory.make_episodes([([HISTORY[0]], "")]))
+
+        def count(text):
+            self.assertFalse(memory._lock.locked())
+            return 1
+
+        self.assertEqual(len(memory.recall("s", "passport", count)[0]), 1)
+        self.assertEqual(len(asyncio.run(memory.arecall("s", "passport", count))[0]), 1)
+
+    def test_token_budget_and_top_k(self):
+        storage = InMemoryStorage()
+        memory = EpisodicMemory(storage=storage, top_k=2, token_budget=12, min_score=0.0)
+        memory.archive("s", memory.make_episodes([([m], "") for m in HISTORY[::2]]))
+        recalled, metrics = memory.recall("s", "passport sink standup dog", lambda text: len(text.split()))
+        self.assertEqual(len(recalled), 1)
+        self.assertLessEqual(metrics["tokens"], 12)
+
+    def test_index_rebuilt_after_archive_expires(self):
+        storage = InMemoryStorage(ttl_seconds=0.05)
+        memory = EpisodicMemory(storage=storage, top_k=3, min_score=-1.0)
+        count = lambda text: len(text.split())
+        storage.save_session("s", "", {})
+        memory.archive("s", memory.make_episodes([([HISTORY[0]], ""), ([HISTORY[2]], "")]))
+        self.assertEqual(memory.recall("s", "passport", count)[1]["searched"], 2)
+
+        time.sleep(0.1)
+        storage.save_session("s", "", {})
+        memory.archive("s", memory.make_episodes([([HISTORY[4]], "")]))
+        recalled, metrics = memory.recall("s", "passport", count)
+        self.assertEqual(metrics["searched"], 1)
+        self.assertEqual([e["messages"][0]["content"] for e in recalled], [HISTORY[4]["content"]])
+
+        # Refilled past its old length, the archive is still recognized as new
+        memory.archive("s", memory.make_episodes([([HISTORY[6]], "")]))
+        time.sleep(0.1)
+        storage.save_session("s", "", {})
+        memory.archive("s", memory.make_episodes([([m], "") for m in HISTORY[::2]]))
+        recalled, metrics = asyncio.run(memory.arecall("s", "passport", count))
+        self.assertEqual(metrics["searched"], 4)
+
+    def test_expired_session_forgets_its_index(self):
+        memory = EpisodicMemory()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=SummaryProvider(), episodic_memory=memory)
+        memory._index("s")
+        self.assertEqual(chronicle._empty_state("s")["version"], 0)
+        self.assertNotIn("s", memory._indexes)
+
+    def test_episodes_expire_with_session(self):
+        storage = InMemoryStorage(max_entries=1)
+        storage.save_session("a", "", {})
+        storage.append_episodes("a", [{"summary": "", "messages": []}])
+        storage.save_session("a", "", {})
+        self.assertEqual(len(storage.get_episodes("a")), 1)
+        storage.save_session("b", "", {})
+        self.assertEqual(storage.get_episodes("a"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
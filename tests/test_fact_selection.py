@@ -0,0 +1,76 @@
+import unittest
+
+from chronicle_gist import Chronicle, FactSelector, InMemoryStorage
+from chronicle_gist.fact_index import FactIndex
+from helpers import WordCountProvider
+
+
+LEDGER = {
+    "name": "Dana",
+    "shipping_address": "12 Harbor Road, Portland",
+    "laptop_budget": 2000,
+    "preferred_brand": "Lenovo",
+    "shoe_size": 42,
+    "favorite_color": "green",
+    "allergies": ["peanuts"],
+}
+for i in range(100):
+    LEDGER[f"order_{i}"] = f"order number {i} delivered"
+HISTORY = [{"role": "user", "content": " ".join(["earlier chat"] * 20)} for _ in range(40)]
+
+
+class TestFactIndex(unittest.TestCase):
+    def test_search_and_incremental_update(self):
+        index = FactIndex()
+        index.update(LEDGER)
+        self.assertEqual(index.search("what is my shipping address")[0][0], "shipping_address")
+        self.assertEqual(index.search("which laptop brand"), index.search("brand laptop"))
+
+        ledger = dict(LEDGER, favorite_color="navy blue")
+        del ledger["shoe_size"]
+        index.update(ledger)
+        self.assertEqual(index.search("navy")[0][0], "favorite_color")
+        self.assertEqual(index.search("green"), [])
+        self.assertNotIn("shoe_size", dict(index.search("shoe size")))
+
+        ledger["allergies"].append("shellfish")
+        index.update(ledger)
+        self.assertEqual(index.search("shellfish")[0][0], "allergies")
+        LEDGER["allergies"].remove("shellfish")
+
+
+class TestFactSelection(unittest.TestCase):
+    def process(self, selector, content):
+        storage = InMemoryStorage()
+        storage.save_session("s", "User shops for a laptop.", LEDGER)
+        chronicle = Chronicle(storage=storage, llm_provider=WordCountProvider(), token_threshold=100000, fact_selector=selector)
+        return chronicle.process("s", {"role": "user", "content": content}, HISTORY)
+
+    def test_injects_relevant_and_pinned_facts(self):
+        result = self.process(FactSelector(top_k=2, pinned_keys=["name"]), "Ship the new laptop to my address please")
+        system = result["hydrated_messages"][0]["content"]
+        for key in ("name", "shipping_address", "laptop_budget"):
+            self.assertIn(key, system)
+        self.assertNotIn("order_7", system)
+
+        selection = result["meta"]["fact_selection"]
+        self.assertEqual((selection["facts_total"], selection["facts_selected"]), (len(LEDGER), 3))
+        self.assertGreater(selection["tokens_saved"], 0)
+        self.assertEqual(selection["full_ledger_tokens"] - selection["selected_tokens"], selection["tokens_saved"])
+        # The stored ledger is untouched
+        self.assertEqual(result["meta"]["fact_ledger"], LEDGER)
+
+    def test_token_budget(self):
+        result = self.process(FactSelector(top_k=50, token_budget=12), "order delivered")
+        selection = result["meta"]["fact_selection"]
+        self.assertGreater(selection["facts_selected"], 0)
+        self.assertLess(selection["facts_selected"], 50)
+
+    def test_without_selector_injects_everything(self):
+        result = self.process(None, "Ship the laptop")
+        self.assertIn("order_7", result["hydrated_messages"][0]["content"])
+        self.assertNotIn("fact_selection", result["meta"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.packing import OMITTED, TRUNCATED, last_user_turns_start, window_start
+from helpers import WordCountProvider
+
+
+def chat(turns, words=5):
+    history = []
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        history.append({"role": role, "content": " ".join([f"m{i}"] * words)})
+    return history
+
+
+NEW_MESSAGE = {"role": "user", "content": "next"}
+
+
+def chronicle(**kwargs):
+    return Chronicle(storage=InMemoryStorage(), llm_provider=WordCountProvider(), token_threshold=100000, **kwargs)
+
+
+class TestHydrationBudget(unittest.TestCase):
+    def test_window_start(self):
+        counts = [5, 5, 5, 5]
+        self.assertEqual(window_start(counts, 12), 2)
+        self.assertEqual(window_start(counts, 15), 1)
+        self.assertEqual(window_start(counts, 100), 0)
+        self.assertEqual(window_start(counts, -1), 4)
+        self.assertEqual(window_start(counts, 3, min_start=3), 3)
+        self.assertEqual(last_user_turns_start(chat(6), 2), 2)
+        self.assertIsNone(last_user_turns_start(chat(6), 0))
+
+    def test_packs_as_many_recent_messages_as_fit(self):
+        result = chronicle(target_budget=40).process("s", NEW_MESSAGE, chat(20))
+        budget = result["meta"]["budget"]
+
+        self.assertEqual(result["meta"]["strategy"], "smart")
+        available = 40 - budget["memory_and_new_message"]
+        self.assertEqual(budget["window_messages"], available // 5)
+        self.assertEqual(budget["dropped_messages"], 20 - available // 5)
+        self.assertEqual(budget["unused"], available % 5)
+        self.assertEqual(result["hydrated_messages"][-2]["content"], chat(20)[-1]["content"])
+
+    def test_short_messages_use_more_than_five(self):
+        result = chronicle(target_budget=30).process("s", NEW_MESSAGE, chat(40, words=1))
+        self.assertGreater(result["meta"]["budget"]["window_messages"], 5)
+
+    def test_without_budget_keeps_last_five(self):
+        result = chronicle().process("s", NEW_MESSAGE, chat(20))
+        self.assertEqual(len(result["hydrated_messages"]), 7)
+        self.assertNotIn("budget", result["meta"])
+
+    def test_keep_last_user_turns_over_budget(self):
+        result = chronicle(target_budget=12, keep_user_turns=2).process("s", NEW_MESSAGE, chat(20))
+        # The second-to-last user turn is message 16, so 4 messages are kept
+        self.assertEqual(result["meta"]["budget"]["window_messages"], 4)
+        self.assertLess(result["meta"]["budget"]["unused"], 0)
+
+    def test_oversized_tool_messages_are_trimmed_or_dropped(self):
+        history = chat(10) + [{"role": "tool", "tool_call_id": "t1", "content": " ".join(["row"] * 400)}]
+        result = chronicle(target_budget=60, max_tool_tokens=20).process("s", NEW_MESSAGE, history)
+        tool = result["hydrated_messages"][-2]
+        self.assertTrue(tool["content"].endswith(TRUNCATED))
+        self.assertEqual(tool["tool_call_id"], "t1")
+        self.assertLessEqual(len(tool["content"].split()), 21)
+        self.assertEqual(result["meta"]["budget"]["tool_messages_shrunk"], 1)
+        self.assertGreater(result["meta"]["budget"]["window_messages"], 1)
+
+        result = chronicle(target_budget=60, max_tool_tokens=20, tool_overflow="drop").process("s", NEW_MESSAGE, history)
+        self.assertEqual(result["hydrated_messages"][-2]["content"], OMITTED)
+
+        with self.assertRaises(ValueError):
+            chronicle(tool_overflow="truncate")
+
+
+if __name__ == "__main__":
+    unittest.main()
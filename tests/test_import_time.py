@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Cumulative `import chronicle_gist` time, in microseconds. Most of it is
+# asyncio; litellm alone used to cost several seconds.
+IMPORT_BUDGET_US = 250_000
+HEAVY_MODULES = ("litellm", "redis", "asyncpg", "psycopg", "pymongo", "motor")
+
+
+def run(code, *flags):
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_stays_within_budget(self):
+        run("import chronicle_gist")  # warm the bytecode cache
+        timings = []
+        for _ in range(3):
+            lines = run("import chronicle_gist", "-X", "importtime").stderr.splitlines()
+            top = [line for line in lines if line.rstrip().endswith("| chronicle_gist")]
+            timings.append(int(top[-1].split("|")[1]))
+        self.assertLess(min(timings), IMPORT_BUDGET_US)
+
+    def test_heavy_dependencies_load_on_first_use(self):
+        code = (
+            "import sys, chronicle_gist\n"
+            "import chronicle_gist.storage.redis_adapter, chronicle_gist.storage.postgres, chronicle_gist.storage.mongo\n"
+            "chronicle_gist.Chronicle(api_key='dummy')\n"
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+        )
+        self.assertEqual(run(code).stdout.strip(), "")
+
+    def test_storage_adapters_are_exported_lazily(self):
+        from chronicle_gist import storage
+
+        self.assertTrue(issubclass(storage.PostgresStorage, storage.base.Storage))
+        with self.assertRaises(AttributeError):
+            storage.SQLiteStorage
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage, RecordingInstrumentation
+from helpers import WordCountProvider
+
+try:
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    TracerProvider = None
+
+
+class WorkerProvider(WordCountProvider):
+    """One token per word; returns `responses` in turn (an Exception is raised)."""
+
+    def __init__(self, *responses, delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+
+    def completion(self, messages, model, response_format=None):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def acompletion(self, messages, model, response_format=None):
+        await asyncio.sleep(self.delay)
+        return self.completion(messages, model, response_format)
+
+
+GOOD = json.dumps({"summary": "User wants a laptop.", "fact_ledger": {"budget": 2000}})
+HISTORY = [
+    {"role": "user", "content": "I need a laptop for video editing work"},
+    {"role": "assistant", "content": "What is your budget for it"},
+    {"role": "user", "content": "About two thousand dollars"},
+]
+NEW_MESSAGE = {"role": "user", "content": "Any suggestions"}
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_sync_phases_and_events(self):
+        hook = RecordingInstrumentation()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=WorkerProvider(GOOD), token_threshold=8, instrumentation=hook)
+        chronicle.process("s", NEW_MESSAGE, HISTORY)
+
+        snapshot = hook.snapshot()
+        for phase in ("process", "storage.get", "tokens.count", "compression.llm", "storage.save", "hydration"):
+            self.assertIn(phase, snapshot["phases"])
+        self.assertEqual(snapshot["phases"]["process"]["count"], 1)
+        self.assertEqual(snapshot["events"], {"bloat_triggered": 1})
+
+    def test_failures_and_timeouts_are_counted_and_logged(self):
+        async def run():
+            hook = RecordingInstrumentation()
+            provider = WorkerProvider("not json", ConnectionError("reset"), GOOD)
+            chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=8, instrumentation=hook)
+            with self.assertLogs("chronicle_gist", level="WARNING") as logs:
+                await chronicle.process_async("s", NEW_MESSAGE, HISTORY)
+                await chronicle.process_async("s", NEW_MESSAGE, HISTORY)
+                provider.delay = 0.2
+                await chronicle.process_async("s", NEW_MESSAGE, HISTORY, timeout=20)
+                await chronicle.drain()
+            self.assertTrue(any("json_parse_failure" in line for line in logs.output))
+            return hook.snapshot()["events"]
+
+        events = asyncio.run(run())
+        self.assertEqual(events["json_parse_failure"], 1)
+        self.assertEqual(events["worker_error"], 1)
+        self.assertEqual(events["compression_timeout"], 1)
+        self.assertEqual(events["bloat_triggered"], 3)
+
+    def test_background_queue_wait_is_timed(self):
+        async def run():
+            hook = RecordingInstrumentation()
+            chronicle = Chronicle(
+                storage=InMemoryStorage(), llm_provider=WorkerProvider(GOOD), token_threshold=8,
+                background_compression=True, instrumentation=hook,
+            )
+            await chronicle.process_async("s", NEW_MESSAGE, HISTORY)
+            await chronicle.aclose()
+            return hook.snapshot()["phases"]
+
+        phases = asyncio.run(run())
+        self.assertEqual(phases["compression.queue_wait"]["count"], 1)
+        self.assertEqual(phases["compression.llm"]["count"], 1)
+
+    def test_naive_fallback(self):
+        hook = RecordingInstrumentation()
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=WorkerProvider(), instrumentation=hook)
+        chronicle.process("s", {"role": "user", "content": "hi"}, [])
+        self.assertEqual(hook.snapshot()["events"], {"naive_fallback": 1})
+
+    @unittest.skipUnless(TracerProvider, "opentelemetry-sdk not installed")
+    def test_opentelemetry_spans_and_metrics(self):
+        from chronicle_gist import OpenTelemetryInstrumentation
+
+        exporter = InMemorySpanExporter()
+        tracer_provider = TracerProvider()
+        tracer_provider.add_span_processor(SimpleSpanProcessor(exporter))
+        reader = InMemoryMetricReader()
+        hook = OpenTelemetryInstrumentation(
+            tracer=tracer_provider.get_tracer("test"), meter=MeterProvider(metric_readers=[reader]).get_meter("test")
+        )
+        chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=WorkerProvider(GOOD), token_threshold=8, instrumentation=hook)
+        chronicle.process("s", NEW_MESSAGE, HISTORY)
+
+        spans = {span.name: span for span in exporter.get_finished_spans()}
+        root = spans["chronicle.process"]
+        self.assertEqual(root.attributes["session_id"], "s")
+        self.assertEqual(spans["chronicle.compression.llm"].parent.span_id, root.context.span_id)
+        self.assertEqual([event.name for event in root.events], ["bloat_triggered"])
+        metrics = {m.name for rm in reader.get_metrics_data().resource_metrics for sm in rm.scope_metrics for m in sm.metrics}
+        self.assertEqual(metrics, {"chronicle.phase.duration", "chronicle.events"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.ledger import diff_ledgers
+from helpers import WordCountProvider
+
+
+class UpdatingProvider(WordCountProvider):
+    """One token per word; the worker changes one fact of a large ledger."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def completion(self, messages, model, response_format=None):
+        ledger = dict(self.ledger, budget=3000)
+        del ledger["fact_001"]
+        return json.dumps({"summary": "updated", "fact_ledger": ledger})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+class PatchRecordingStorage(InMemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.patches = []
+
+    def save_session_patch(self, session_id, summary, fact_ledger, changed, removed, watermark=None, expected_version=None):
+        self.patches.append((changed, removed))
+        return super().save_session_patch(session_id, summary, fact_ledger, changed, removed, watermark, expected_version)
+
+
+class TestLedgerPatch(unittest.TestCase):
+    def test_diff_ledgers(self):
+        changed, removed = diff_ledgers({"a": 1, "b": [1], "c": 3}, {"a": 1, "b": [1, 2], "d": 4})
+        self.assertEqual(changed, {"b": [1, 2], "d": 4})
+        self.assertEqual(removed, ["c"])
+
+    def test_chronicle_sends_only_changed_facts(self):
+        ledger = {f"fact_{i:03d}": f"value {i}" for i in range(200)}
+        storage = PatchRecordingStorage()
+        storage.save_session("s", "old", ledger)
+        chronicle = Chronicle(storage=storage, llm_provider=UpdatingProvider(ledger), token_threshold=5)
+
+        history = [{"role": "user", "content": "My budget went up to three thousand dollars"}]
+        chronicle.process("s", {"role": "user", "content": "Thanks"}, history)
+
+        self.assertEqual(storage.patches, [({"budget": 3000}, ["fact_001"])])
+        stored = storage.get_session("s")["fact_ledger"]
+        self.assertEqual(len(stored), 200)
+        self.assertEqual(stored["budget"], 3000)
+
+
+if __name__ == "__main__":
+    unittest.main()
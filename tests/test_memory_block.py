@@ -0,0 +1,71 @@
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.memory_block import MemoryBlockCache, render_memory_block
+from helpers import WordCountProvider
+
+
+HISTORY = [{"role": "user", "content": " ".join(["earlier chat"] * 20)} for _ in range(10)]
+
+
+class TestRenderMemoryBlock(unittest.TestCase):
+    def test_deterministic_and_prefix_stable(self):
+        a = render_memory_block("User plans a trip.", {"b": 2, "a": {"y": 1, "x": "é"}}, "Be brief.")
+        b = render_memory_block("User plans a trip.", {"a": {"x": "é", "y": 1}, "b": 2}, "Be brief.")
+        self.assertEqual(a, b)
+        self.assertTrue(a.startswith("Be brief.\n\n[MEMORY RECALL]\nSummary: User plans a trip."))
+        self.assertNotIn("\n ", a)
+        self.assertIn("é", a)
+
+        changed = render_memory_block("User plans a trip.", {"b": 3}, "Be brief.")
+        prefix = a[:a.index("[FACT LEDGER]")]
+        self.assertTrue(changed.startswith(prefix))
+
+
+class TestMemoryBlockCache(unittest.TestCase):
+    def test_hit_until_state_changes(self):
+        cache = MemoryBlockCache(max_entries=1)
+        facts = {"city": "Lisbon"}
+        cache.put("s", "summary", facts, "text", 5)
+        facts["city"] = "Porto"
+        self.assertIsNone(cache.get("s", "summary", facts))
+        self.assertEqual(cache.get("s", "summary", {"city": "Lisbon"}), ("text", 5))
+        self.assertIsNone(cache.get("s", "new summary", {"city": "Lisbon"}))
+
+        cache.put("t", "summary", {}, "other", 1)
+        self.assertIsNone(cache.get("s", "summary", {"city": "Lisbon"}))
+        self.assertEqual(cache.stats(), {"entries": 1, "hits": 1, "misses": 3})
+
+    def test_version_decides_when_given(self):
+        cache = MemoryBlockCache()
+        cache.put("s", "summary", {"city": "Lisbon"}, "text", 5, version=(3, 100.0))
+        # The stored state's version identifies its contents; they are not compared
+        self.assertEqual(cache.get("s", "other", {}, (3, 100.0)), ("text", 5))
+        self.assertIsNone(cache.get("s", "summary", {"city": "Lisbon"}, (4, 101.0)))
+        self.assertEqual(cache.get("s", "summary", {"city": "Lisbon"}), ("text", 5))
+
+    def test_chronicle_reuses_rendered_block(self):
+        storage = InMemoryStorage()
+        storage.save_session("s", "User plans a trip.", {"city": "Lisbon", "nights": 3})
+        provider = WordCountProvider()
+        chronicle = Chronicle(storage=storage, llm_provider=provider, token_threshold=100000, custom_instructions="Be brief.")
+
+        first = chronicle.process("s", {"role": "user", "content": "hello"}, HISTORY)
+        calls = provider.count_calls
+        second = chronicle.process("s", {"role": "user", "content": "again"}, HISTORY)
+        self.assertIs(first["hydrated_messages"][0]["content"], second["hydrated_messages"][0]["content"])
+        self.assertEqual(first["meta"]["memory_block"], {"tokens": second["meta"]["memory_block"]["tokens"], "cached": False})
+        self.assertTrue(second["meta"]["memory_block"]["cached"])
+        # Only the new message needed counting the second time
+        self.assertEqual(provider.count_calls - calls, 1)
+        self.assertEqual(chronicle.stats()["memory_block_cache"]["hits"], 1)
+
+        # A new version re-renders, even with the same contents
+        storage.save_session("s", "User plans a trip.", {"city": "Lisbon", "nights": 3})
+        third = chronicle.process("s", {"role": "user", "content": "more"}, HISTORY)
+        self.assertFalse(third["meta"]["memory_block"]["cached"])
+        self.assertEqual(third["hydrated_messages"][0]["content"], first["hydrated_messages"][0]["content"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import threading
+import time
+import unittest
+
+from chronicle_gist import InMemoryStorage
+
+
+class TestInMemoryStorage(unittest.TestCase):
+    def test_max_entries_evicts_least_recently_used(self):
+        storage = InMemoryStorage(max_entries=2)
+        storage.save_session("a", "a", {})
+        storage.save_session("b", "b", {})
+        storage.get_session("a")
+        storage.save_session("c", "c", {})
+
+        self.assertIsNone(storage.get_session("b"))
+        self.assertIsNotNone(storage.get_session("a"))
+        self.assertEqual(storage.stats()["evictions"], 1)
+
+    def test_max_bytes_cap(self):
+        storage = InMemoryStorage(max_bytes=400)
+        for i in range(10):
+            storage.save_session(f"s{i}", "x" * 50, {"i": i})
+        stats = storage.stats()
+        self.assertLessEqual(stats["bytes"], 400)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIsNotNone(storage.get_session("s9"))
+
+    def test_episodes_count_toward_max_bytes(self):
+        storage = InMemoryStorage(max_bytes=900)
+        storage.save_session("a", "a", {})
+        storage.save_session("b", "b", {})
+        before = storage.stats()["bytes"]
+        episode = {"summary": "", "messages": [{"role": "user", "content": "x" * 200}]}
+        storage.append_episodes("a", [episode])
+        self.assertGreater(storage.stats()["bytes"], before + 200)
+
+        # Growing a's archive evicts b, the least recently used session
+        storage.append_episodes("a", [episode, episode])
+        self.assertIsNone(storage.get_session("b"))
+        self.assertEqual(len(storage.get_episodes("a")), 3)
+        self.assertLessEqual(storage.stats()["bytes"], 900)
+
+        storage.save_session("c", "c" * 200, {})
+        self.assertIsNone(storage.get_session("a"))
+        self.assertEqual(storage.get_episodes("a"), [])
+        self.assertLess(storage.stats()["bytes"], 400)
+
+    def test_sweep_removes_sessions_that_are_never_read(self):
+        storage = InMemoryStorage(ttl_seconds=0.05)
+        for i in range(5):
+            storage.save_session(f"s{i}", "", {})
+        time.sleep(0.06)
+        storage.save_session("fresh", "", {})
+
+        stats = storage.stats()
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["expirations"], 5)
+
+    def test_background_sweeper(self):
+        storage = InMemoryStorage(ttl_seconds=0.02, sweep_interval=0.01)
+        try:
+            storage.save_session("s", "", {})
+            time.sleep(0.1)
+            self.assertEqual(storage.stats()["entries"], 0)
+        finally:
+            storage.close()
+
+    def test_concurrent_threads(self):
+        storage = InMemoryStorage(max_entries=50)
+
+        def worker(n):
+            for i in range(200):
+                storage.save_session(f"{n}-{i % 60}", "summary", {"i": i})
+                storage.get_session(f"{n}-{(i * 7) % 60}")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = storage.stats()
+        self.assertEqual(stats["entries"], 50)
+        self.assertEqual(stats["bytes"], sum(storage._sizes.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import inspect
+import unittest
+from types import SimpleNamespace
+
+from chronicle_gist import storage
+
+try:
+    import pymongo
+    from chronicle_gist.storage.mongo import MongoStorage
+except ImportError:
+    pymongo = None
+
+
+class FakeCollection:
+    """Sessions in a dict; `before_write` runs just before a bulk write lands."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.before_write = None
+
+    @staticmethod
+    def _matches(doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict) and "$in" in value:
+                if doc.get(key) not in value["$in"]:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    @staticmethod
+    def _apply(doc, update):
+        doc.update(update.get("$set", {}))
+        for key, step in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + step
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.before_write:
+            self.before_write()
+        matched = upserted = 0
+        for op in operations:
+            doc = self.docs.get(op._filter["_id"])
+            if doc is not None and self._matches(doc, op._filter):
+                self._apply(doc, op._doc)
+                matched += 1
+            elif doc is None and op._upsert:
+                doc = self.docs[op._filter["_id"]] = {"_id": op._filter["_id"]}
+                self._apply(doc, op._doc)
+                upserted += 1
+        return SimpleNamespace(matched_count=matched, upserted_count=upserted)
+
+    async def find(self, query, projection=None):
+        for doc in list(self.docs.values()):
+            if self._matches(doc, query):
+                yield doc
+
+
+@unittest.skipUnless(pymongo, "pymongo not installed")
+class TestMongoStorage(unittest.TestCase):
+    def test_bulk_save_conflicts_when_another_writer_bumps_the_version(self):
+        collection = FakeCollection({
+            "a": {"_id": "a", "summary": "old", "version": 5},
+            "b": {"_id": "b", "summary": "old", "version": 2},
+        })
+        storage = MongoStorage("mongodb://unused")
+        storage.client, storage.collection = object(), collection
+
+        def other_writer():
+            # Exactly one version ahead: the same version our update would have produced
+            collection.docs["a"].update(summary="theirs", version=6, write_token=None)
+
+        collection.before_write = other_writer
+        conflicts = asyncio.run(storage.asave_sessions({
+            "a": {"summary": "ours", "fact_ledger": {}, "expected_version": 5},
+            "b": {"summary": "ours", "fact_ledger": {}, "expected_version": 2},
+            "c": {"summary": "ours", "fact_ledger": {}},
+        }))
+        self.assertEqual(conflicts, ["a"])
+        self.assertEqual(collection.docs["a"]["summary"], "theirs")
+        self.assertEqual((collection.docs["b"]["summary"], collection.docs["b"]["version"]), ("ours", 3))
+        self.assertEqual(collection.docs["c"]["version"], 1)
+
+
+class TestAdapterInterface(unittest.TestCase):
+    def test_disconnect_matches_the_other_adapters(self):
+        for name in ("RedisStorage", "PostgresStorage", "MongoStorage"):
+            adapter = getattr(storage, name)
+            self.assertTrue(inspect.iscoroutinefunction(adapter.disconnect), name)
+            self.assertFalse(inspect.iscoroutinefunction(adapter.disconnect_sync), name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+from chronicle_gist.policy import HysteresisPolicy, ThresholdPolicy
+
+
+class TestCompressionPolicy(unittest.TestCase):
+    def test_threshold_policy_compresses_every_turn_over_threshold(self):
+        policy = ThresholdPolicy(100)
+        self.assertEqual(tuple(policy.decide(90, 90, {})), (False, False))
+        self.assertEqual(tuple(policy.decide(150, 10, {"watermark": {"count": 4}})), (True, True))
+
+    def test_hysteresis_waits_for_new_tokens_after_first_compression(self):
+        policy = HysteresisPolicy(high_watermark=1000, low_watermark=400)
+        compressed = {"watermark": {"count": 10, "tokens": 1200}}
+
+        self.assertEqual(tuple(policy.decide(1100, 1100, {})), (True, True))
+        self.assertEqual(tuple(policy.decide(1300, 100, compressed)), (True, False))
+        self.assertEqual(tuple(policy.decide(1900, 700, compressed)), (True, True))
+        self.assertEqual(tuple(policy.decide(300, 300, compressed)), (False, False))
+
+    def test_hysteresis_rejects_inverted_watermarks(self):
+        with self.assertRaises(ValueError):
+            HysteresisPolicy(high_watermark=400, low_watermark=1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
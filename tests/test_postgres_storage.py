@@ -0,0 +1,165 @@
+import asyncio
+import contextlib
+import unittest
+from unittest import mock
+
+from chronicle_gist import SessionConflictError
+
+try:
+    import asyncpg
+    from chronicle_gist.storage.postgres import PostgresStorage, _import_rows, _run
+except ImportError:
+    asyncpg = None
+
+
+class FakeConnection:
+    """Records statements instead of talking to a server."""
+
+    def __init__(self, statements=None):
+        if statements is not None:
+            self.statements = statements
+        self.queries = []
+
+    async def execute(self, sql, *args):
+        self.queries.append(sql)
+        return "OK"
+
+    async def fetchval(self, sql, *args):
+        self.queries.append(sql)
+        return 7
+
+    async def close(self):
+        pass
+
+
+class FakeLeaseConnection(FakeConnection):
+    """Grants every advisory lock; the server side is not modeled."""
+
+    async def fetchval(self, sql, *args):
+        self.queries.append(sql)
+        await asyncio.sleep(0)
+        return True
+
+    def is_closed(self):
+        return False
+
+
+class ExhaustedPool:
+    async def acquire(self):
+        raise AssertionError("leases must not take pool connections")
+
+
+class MissingRowConnection(FakeConnection):
+    """A session that was deleted: conditional updates match no row."""
+
+    async def fetchval(self, sql, *args):
+        self.queries.append(sql)
+        return None if sql.split()[0] == "UPDATE" else 1
+
+    def execute(self, sql, params, prepare=None):
+        self.queries.append(sql)
+        return mock.Mock(fetchone=lambda: None if sql.split()[0] == "UPDATE" else {"version": 1})
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self.conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        yield self.conn
+
+
+class FakeStatement:
+    async def fetchval(self, *args):
+        return 8
+
+
+@unittest.skipUnless(asyncpg, "asyncpg not installed")
+class TestPostgresStorage(unittest.TestCase):
+    def test_concurrent_first_calls_share_one_pool(self):
+        pools, schema = [], FakeConnection()
+
+        async def create_pool(dsn, **options):
+            await asyncio.sleep(0.01)
+            pools.append(options)
+            return object()
+
+        async def connect(dsn):
+            await asyncio.sleep(0.01)
+            return schema
+
+        storage = PostgresStorage("postgresql://unused", min_size=2, max_size=20, max_idle=30, statement_timeout=1.5)
+
+        async def run():
+            await asyncio.gather(*[storage.connect() for _ in range(10)])
+
+        with mock.patch("asyncpg.create_pool", create_pool), mock.patch("asyncpg.connect", connect):
+            asyncio.run(run())
+        self.assertEqual(len(pools), 1)
+        self.assertEqual(len(schema.queries), 2)
+        options = pools[0]
+        self.assertEqual((options["min_size"], options["max_size"], options["max_inactive_connection_lifetime"]), (2, 20, 30))
+        self.assertEqual(options["server_settings"], {"statement_timeout": "1500"})
+        self.assertTrue(issubclass(options["connection_class"], asyncpg.Connection))
+
+    def test_leases_share_one_dedicated_connection(self):
+        connections = []
+
+        async def connect(dsn, **options):
+            connections.append(FakeLeaseConnection())
+            return connections[-1]
+
+        storage = PostgresStorage("postgresql://unused", max_size=1)
+        storage.pool = ExhaustedPool()
+
+        async def run():
+            tokens = await asyncio.gather(*[storage.aacquire_lease(f"s{i}", 1000) for i in range(20)])
+            again = await storage.aacquire_lease("s0", 1000)
+            await storage.arelease_lease("s0", tokens[0])
+            return tokens, again, await storage.aacquire_lease("s0", 1000)
+
+        with mock.patch("asyncpg.connect", connect):
+            tokens, again, reacquired = asyncio.run(run())
+        self.assertEqual(len(connections), 1)
+        self.assertTrue(all(tokens))
+        self.assertIsNone(again)
+        self.assertIsNotNone(reacquired)
+        self.assertIn("pg_advisory_unlock", connections[0].queries[-2])
+
+    def test_conditional_save_of_missing_session_conflicts(self):
+        conn = MissingRowConnection()
+        storage = PostgresStorage("postgresql://unused")
+        storage.pool = storage.sync_pool = FakePool(conn)
+        with self.assertRaises(SessionConflictError):
+            asyncio.run(storage.asave_session("s", "summary", {}, expected_version=3))
+        with self.assertRaises(SessionConflictError):
+            storage.save_session("s", "summary", {}, expected_version=3)
+        self.assertTrue(all("INSERT" not in sql for sql in conn.queries))
+        # Version 0 means "not created yet", so it still inserts
+        self.assertEqual(asyncio.run(storage.asave_session("s", "summary", {}, expected_version=0)), 1)
+        self.assertEqual(storage.save_session("s", "summary", {}, expected_version=0), 1)
+        self.assertIn("INSERT", conn.queries[-1])
+
+    def test_prepared_statements_with_plain_fallback(self):
+        prepared = FakeConnection({"save": FakeStatement()})
+        plain = FakeConnection()
+        self.assertEqual(asyncio.run(_run(prepared, "save", "fetchval", "s")), 8)
+        self.assertEqual(asyncio.run(_run(plain, "save", "fetchval", "s")), 7)
+        self.assertIn("INSERT INTO chronicle_sessions", plain.queries[0])
+
+    def test_import_rows_keep_timestamps(self):
+        rows = _import_rows({
+            "a": {"summary": "x", "fact_ledger": {"k": 1}, "updated_at": 5.0},
+            "b": {"summary": "y", "fact_ledger": {}, "watermark": {"count": 2}},
+        }, now=9.0)
+        self.assertEqual(rows[0], ("a", "x", '{"k":1}', 5.0, None))
+        self.assertEqual(rows[1], ("b", "y", "{}", 9.0, '{"count":2}'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from helpers import WordCountProvider
+
+
+class WordProvider(WordCountProvider):
+    """One token per word; the worker echoes how many times it was called."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return json.dumps({"summary": "compressed", "fact_ledger": {"calls": self.calls}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+class BulkCountingStorage(InMemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.bulk_reads = 0
+        self.bulk_writes = 0
+        self.single_calls = 0
+
+    async def aget_sessions(self, session_ids):
+        self.bulk_reads += 1
+        return {sid: self.get_session(sid) for sid in session_ids}
+
+    async def asave_sessions(self, sessions):
+        self.bulk_writes += 1
+        for sid, state in sessions.items():
+            self.save_session(sid, state["summary"], state["fact_ledger"], state.get("watermark"), state.get("expected_version"))
+        return []
+
+    async def aget_session(self, session_id):
+        self.single_calls += 1
+        return await super().aget_session(session_id)
+
+    async def asave_session(self, session_id, summary, fact_ledger, watermark=None, expected_version=None):
+        self.single_calls += 1
+        return await super().asave_session(session_id, summary, fact_ledger, watermark, expected_version)
+
+
+class TestProcessMany(unittest.TestCase):
+    def test_one_bulk_read_and_write(self):
+        async def run():
+            storage = BulkCountingStorage()
+            chronicle = Chronicle(storage=storage, llm_provider=WordProvider(), token_threshold=8)
+            long_history = [
+                {"role": "user", "content": "I need a laptop for video editing"},
+                {"role": "assistant", "content": "What is your budget"},
+            ]
+            requests = [
+                {"session_id": "a", "new_message": {"role": "user", "content": "about 1500"}, "raw_history": long_history},
+                {"session_id": "b", "new_message": {"role": "user", "content": "hi"}, "raw_history": []},
+                {"session_id": "c", "new_message": {"role": "user", "content": "about 900"}, "raw_history": long_history},
+            ]
+            results = await chronicle.process_many_async(requests, concurrency=2)
+
+            self.assertEqual([r["meta"]["compression"] for r in results], ["applied", "none", "applied"])
+            self.assertEqual((storage.bulk_reads, storage.bulk_writes, storage.single_calls), (1, 1, 0))
+            self.assertEqual(storage.get_session("a")["summary"], "compressed")
+            self.assertIsNone(storage.get_session("b"))
+
+        asyncio.run(run())
+
+    def test_default_bulk_methods_fall_back_to_single_calls(self):
+        async def run():
+            storage = InMemoryStorage()
+            await storage.asave_sessions({"x": {"summary": "s", "fact_ledger": {"k": 1}}})
+            states = await storage.aget_sessions(["x", "missing"])
+            self.assertEqual(states["x"]["fact_ledger"], {"k": 1})
+            self.assertIsNone(states["missing"])
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
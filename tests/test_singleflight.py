@@ -0,0 +1,98 @@
+import asyncio
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from helpers import WordCountProvider
+
+
+class SlowProvider(WordCountProvider):
+    """One token per word; the worker model takes `delay` seconds to answer."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    def completion(self, messages, model, response_format=None):
+        self.calls += 1
+        return json.dumps({"summary": "compressed", "fact_ledger": {"calls": self.calls}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        await asyncio.sleep(self.delay)
+        return self.completion(messages, model, response_format)
+
+
+class LeaseHeldElsewhere(InMemoryStorage):
+    async def aacquire_lease(self, name, ttl_ms):
+        return None
+
+
+HISTORY = [
+    {"role": "user", "content": "I am planning a trip to Lisbon in May"},
+    {"role": "assistant", "content": "Great, what is your budget for the trip"},
+]
+NEW_MSG = {"role": "user", "content": "around 2000 euros"}
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_compression(self):
+        async def run():
+            provider = SlowProvider()
+            chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=5)
+            results = await asyncio.gather(*[
+                chronicle.process_async("s", NEW_MSG, HISTORY) for _ in range(3)
+            ])
+
+            self.assertEqual(provider.calls, 1)
+            statuses = sorted(r["meta"]["compression"] for r in results)
+            self.assertEqual(statuses, ["applied", "shared", "shared"])
+            stats = chronicle.stats()
+            self.assertEqual(stats["compressions_started"], 1)
+            self.assertEqual(stats["compressions_deduplicated"], 2)
+
+        asyncio.run(run())
+
+    def test_timed_out_flight_still_saves(self):
+        async def run():
+            provider = SlowProvider(delay=0.1)
+            chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=5)
+            meta = (await chronicle.process_async("s", NEW_MSG, HISTORY, timeout=10))["meta"]
+            self.assertTrue(meta["timed_out"])
+
+            self.assertTrue(await chronicle.drain(timeout=2))
+            self.assertEqual(chronicle.storage.get_session("s")["summary"], "compressed")
+
+        asyncio.run(run())
+
+    def test_timed_out_flight_in_batch_still_saves(self):
+        async def run():
+            provider = SlowProvider(delay=0.2)
+            chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=provider, token_threshold=5)
+            results = await chronicle.process_many_async(
+                [{"session_id": "s", "new_message": NEW_MSG, "raw_history": HISTORY}], timeout=50
+            )
+            self.assertTrue(results[0]["meta"]["timed_out"])
+
+            self.assertTrue(await chronicle.drain(timeout=2))
+            state = chronicle.storage.get_session("s")
+            self.assertEqual(state["summary"], "compressed")
+            self.assertEqual(state["version"], 1)
+
+        asyncio.run(run())
+
+    def test_contended_lease_skips_worker(self):
+        async def run():
+            provider = SlowProvider()
+            chronicle = Chronicle(storage=LeaseHeldElsewhere(), llm_provider=provider, token_threshold=5, distributed_lease=True)
+            result = await chronicle.process_async("s", NEW_MSG, HISTORY)
+
+            self.assertEqual(provider.calls, 0)
+            self.assertEqual(result["meta"]["compression"], "contended")
+            self.assertEqual(chronicle.stats()["lease_contended"], 1)
+            self.assertEqual(result["hydrated_messages"][-3:], HISTORY + [NEW_MSG])
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
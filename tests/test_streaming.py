@@ -0,0 +1,117 @@
+import asyncio
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.streaming import IncrementalJSONParser, salvage_state
+from helpers import WordCountProvider
+
+RESPONSE = json.dumps({
+    "summary": "User wants a laptop {for \"video\" editing}.",
+    "fact_ledger": {"budget": 2000, "brands": ["Dell", "Apple"], "notes": {"os": "any, really"}},
+})
+
+
+class StreamingProvider(WordCountProvider):
+    """One token per word; streams RESPONSE in small chunks, then stalls or breaks."""
+
+    def __init__(self, stop_after=None, stall=0.0, fail=False):
+        self.stop_after = stop_after
+        self.stall = stall
+        self.fail = fail
+
+    def completion(self, messages, model, response_format=None):
+        return RESPONSE
+
+    async def acompletion(self, messages, model, response_format=None):
+        return RESPONSE
+
+    async def astream_completion(self, messages, model, response_format=None):
+        cut = RESPONSE.index(self.stop_after) + len(self.stop_after) if self.stop_after else len(RESPONSE)
+        for i in range(0, cut, 7):
+            yield RESPONSE[i:min(i + 7, cut)]
+        if self.fail:
+            raise ConnectionError("stream reset")
+        await asyncio.sleep(self.stall)
+        yield RESPONSE[cut:]
+
+
+HISTORY = [
+    {"role": "user", "content": "I need a laptop for video editing"},
+    {"role": "assistant", "content": "What is your budget"},
+    {"role": "user", "content": "About two thousand dollars"},
+]
+NEW_MESSAGE = {"role": "user", "content": "Any suggestions"}
+
+
+class TestIncrementalJSONParser(unittest.TestCase):
+    def test_members_complete_one_by_one(self):
+        parser = IncrementalJSONParser()
+        seen = []
+        for c in "```json\n" + RESPONSE + "\n```":
+            parser.feed(c)
+            seen.append(len(parser.members.get("fact_ledger", [])))
+
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.values, json.loads(RESPONSE))
+        self.assertEqual(parser.members["fact_ledger"], list(json.loads(RESPONSE)["fact_ledger"].items()))
+        # Facts showed up one at a time, before the object was closed
+        self.assertEqual(sorted(set(seen)), [0, 1, 2, 3])
+        self.assertIsNotNone(parser.time_to_first_member_ms())
+
+    def test_salvage_partial_ledger(self):
+        parser = IncrementalJSONParser()
+        parser.feed(RESPONSE[:RESPONSE.index('"notes"')])
+        state, facts, summary_received = salvage_state(parser, "old", {"budget": 1000, "city": "Pune"})
+        self.assertEqual(facts, 2)
+        self.assertTrue(summary_received)
+        self.assertEqual(state["fact_ledger"], {"budget": 2000, "brands": ["Dell", "Apple"], "city": "Pune"})
+
+    def test_salvage_delta_ops(self):
+        parser = IncrementalJSONParser()
+        response = json.dumps({"ledger_ops": [{"op": "set", "key": "a", "value": 1}, {"op": "delete", "key": "b"}], "summary": {"op": "append", "text": "x"}})
+        parser.feed(response[:response.index('{"op": "delete"')])
+        state, ops, summary_received = salvage_state(parser, "old", {"b": 2}, delta=True)
+        self.assertEqual((state["fact_ledger"], ops, summary_received), ({"a": 1, "b": 2}, 1, False))
+
+
+class TestStreamingCompression(unittest.TestCase):
+    def test_timeout_uses_facts_received_so_far(self):
+        async def run():
+            storage = InMemoryStorage()
+            provider = StreamingProvider(stop_after='"Apple"]', stall=0.3)
+            chronicle = Chronicle(storage=storage, llm_provider=provider, token_threshold=8, stream_compression=True)
+            result = await chronicle.process_async("s", NEW_MESSAGE, HISTORY, timeout=100)
+
+            meta = result["meta"]
+            self.assertEqual(meta["compression"], "timed_out")
+            self.assertEqual(meta["salvaged_facts"], 2)
+            self.assertTrue(meta["salvaged_summary"])
+            self.assertIsNotNone(meta["time_to_first_fact_ms"])
+            self.assertEqual(meta["fact_ledger"], {"budget": 2000, "brands": ["Dell", "Apple"]})
+            self.assertEqual(chronicle.stats()["salvaged_on_timeout"], 1)
+
+            # The flight kept streaming and saved the complete result
+            await chronicle.drain(timeout=2)
+            self.assertEqual(storage.get_session("s")["fact_ledger"], json.loads(RESPONSE)["fact_ledger"])
+
+        asyncio.run(run())
+
+    def test_broken_stream_saves_partial_without_advancing_watermark(self):
+        async def run():
+            storage = InMemoryStorage()
+            provider = StreamingProvider(stop_after='"budget": 2000,', fail=True)
+            chronicle = Chronicle(storage=storage, llm_provider=provider, token_threshold=8, stream_compression=True)
+            result = await chronicle.process_async("s", NEW_MESSAGE, HISTORY)
+
+            self.assertEqual(result["meta"]["compression"], "salvaged")
+            self.assertEqual(result["meta"]["salvaged_facts"], 1)
+            state = storage.get_session("s")
+            self.assertEqual(state["fact_ledger"], {"budget": 2000})
+            self.assertIsNone(state["watermark"])
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import unittest
+from unittest import mock
+
+import litellm
+
+from chronicle_gist import ApproximateTokenCounter, Chronicle, ExactTokenCounter, InMemoryStorage, TokenCounter
+from chronicle_gist.llm.base import LLMProvider
+from chronicle_gist.tokens import MessageTokenCounter
+
+SAMPLES = [
+    "Hi there! I've recently decided to get back into shape after a long hiatus.",
+    "As for my budget, things are a bit tight right now. I really cannot go over $150.",
+    json.dumps({"budget": 150, "brand": "Nike", "shoe_size": "10.5 Wide", "city": "Springfield, IL"}),
+    "def count(self, messages, model):\n    return sum(len(m['content'].split()) for m in messages)",
+]
+
+
+class WordCounter(TokenCounter):
+    """Exactly 2 tokens per word, in batches it records."""
+
+    def __init__(self):
+        self.batches = []
+
+    def count_texts(self, texts, model):
+        self.batches.append(len(texts))
+        return [2 * len(t.split()) for t in texts]
+
+
+class EchoProvider(LLMProvider):
+    def count_tokens(self, messages, model):
+        raise AssertionError("Chronicle should use the configured counters")
+
+    def completion(self, messages, model, response_format=None):
+        return json.dumps({"summary": "s", "fact_ledger": {}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+class TestTokenCounters(unittest.TestCase):
+    def test_exact_counter_matches_litellm(self):
+        messages = [
+            {"role": "system", "content": SAMPLES[0]},
+            {"role": "user", "content": SAMPLES[2], "name": "shopper"},
+        ]
+        for model in ("gpt-3.5-turbo", "gpt-4o"):
+            self.assertEqual(
+                ExactTokenCounter().count_tokens(messages, model),
+                litellm.token_counter(model=model, messages=messages),
+            )
+
+    def test_falls_back_to_public_token_counter(self):
+        # What a litellm release that renames or reshapes its tokenizer helpers looks like
+        broken = [
+            {"side_effect": AttributeError("_select_tokenizer")},
+            {"side_effect": KeyError("type")},
+            {"return_value": lambda text: text.encode_ordinary()},
+        ]
+        for patch in broken:
+            counter = ExactTokenCounter()
+            with mock.patch.object(ExactTokenCounter, "_litellm_tokenizer", **patch), \
+                    self.assertLogs("chronicle_gist.tokens", "WARNING"):
+                counts = counter.count_texts(SAMPLES, "gpt-4o")
+            self.assertEqual(counts, [litellm.token_counter(model="gpt-4o", text=text) for text in SAMPLES])
+
+    def test_parallel_batches_match_serial(self):
+        texts = SAMPLES * 50
+        serial = ExactTokenCounter(max_workers=1).count_texts(texts, "gpt-3.5-turbo")
+        threaded = ExactTokenCounter(max_workers=3, parallel_threshold=1)
+        self.assertEqual(threaded.count_texts(texts, "gpt-3.5-turbo"), serial)
+        threaded.close()
+
+    def test_approximate_counter_is_close(self):
+        exact = ExactTokenCounter().count_texts(SAMPLES, "gpt-3.5-turbo")
+        approximate = ApproximateTokenCounter().count_texts(SAMPLES, "gpt-3.5-turbo")
+        self.assertLess(abs(sum(approximate) - sum(exact)) / sum(exact), 0.2)
+        self.assertEqual(ApproximateTokenCounter().count_texts([""], "gpt-4o"), [0])
+
+    def test_calibration_fits_the_reference_counter(self):
+        counter = ApproximateTokenCounter()
+        counter.calibrate(SAMPLES * 3 + ["a b c", "x, y. z"], WordCounter(), "my-model", key="my-model")
+        self.assertEqual(counter.count_texts(["one two three four"], "my-model"), [8])
+
+    def test_cache_misses_are_counted_in_one_batch(self):
+        backend = WordCounter()
+        counter = MessageTokenCounter(backend)
+        history = [{"role": "user", "content": s} for s in SAMPLES]
+        first = counter.count(history, "m")
+        self.assertEqual(counter.count(history, "m"), first)
+        self.assertEqual(backend.batches, [2 * len(SAMPLES)])
+
+    def test_bloat_check_and_metrics_use_separate_counters(self):
+        bloat, metrics = WordCounter(), ApproximateTokenCounter()
+        chronicle = Chronicle(
+            storage=InMemoryStorage(), llm_provider=EchoProvider(), token_threshold=10 ** 6,
+            bloat_token_counter=bloat, metrics_token_counter=metrics,
+        )
+        history = [{"role": "user", "content": SAMPLES[0]}]
+        result = chronicle.process("s", {"role": "user", "content": SAMPLES[1]}, history)
+        self.assertTrue(bloat.batches)
+        expected = metrics.count_tokens(history + [{"role": "user", "content": SAMPLES[1]}], chronicle.model_name)
+        self.assertEqual(result["meta"]["original_tokens"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
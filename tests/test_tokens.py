@@ -0,0 +1,96 @@
+import sys
+import threading
+import unittest
+
+from chronicle_gist.llm.base import LLMProvider
+from chronicle_gist.tokens import MessageTokenCounter
+
+
+class WordProvider(LLMProvider):
+    """Chat-style counter: 3 tokens of framing, 3 per message plus one per word."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def count_tokens(self, messages, model):
+        self.calls += 1
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        return 3 + sum(3 + len(str(m.get("content", "")).split()) for m in messages)
+
+    def completion(self, messages, model, response_format=None):
+        return "{}"
+
+    async def acompletion(self, messages, model, response_format=None):
+        return "{}"
+
+
+class TestMessageTokenCounter(unittest.TestCase):
+    def test_matches_uncached_count(self):
+        provider = WordProvider()
+        counter = MessageTokenCounter(provider)
+        messages = [
+            {"role": "user", "content": "hello there"},
+            {"role": "assistant", "content": "hi, how can I help?"},
+            {"role": "tool", "content": [{"type": "text", "text": "x"}], "tool_call_id": "1"},
+        ]
+        self.assertEqual(counter.count(messages, "m"), provider.count_tokens(messages, "m"))
+        self.assertEqual(counter.count([], "m"), 3)
+
+    def test_only_new_messages_are_tokenized(self):
+        provider = WordProvider()
+        counter = MessageTokenCounter(provider)
+        history = [{"role": "user", "content": f"message {i}"} for i in range(50)]
+        counter.count(history, "m")
+
+        provider.calls = 0
+        history.append({"role": "assistant", "content": "a new reply"})
+        counter.count(history, "m")
+        self.assertEqual(provider.calls, 1)
+
+    def test_cache_is_keyed_by_model_and_role(self):
+        counter = MessageTokenCounter(WordProvider())
+        counter.count([{"role": "user", "content": "same"}], "a")
+        counter.count([{"role": "assistant", "content": "same"}], "a")
+        counter.count([{"role": "user", "content": "same"}], "b")
+        self.assertEqual(counter.stats()["misses"], 3)
+
+    def test_lru_eviction_is_bounded(self):
+        counter = MessageTokenCounter(WordProvider(), max_entries=2)
+        counter.count([{"role": "user", "content": str(i)} for i in range(5)], "m")
+        stats = counter.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 3)
+
+    def test_shared_between_threads(self):
+        provider = WordProvider()
+        counter = MessageTokenCounter(provider, max_entries=8)
+        messages = [{"role": "user", "content": f"message number {i}"} for i in range(32)]
+        expected = provider.count_tokens(messages, "m")
+        errors, results = [], []
+
+        def work():
+            try:
+                for _ in range(1000):
+                    results.append(counter.count(messages, "m"))
+            except Exception as e:
+                errors.append(e)
+
+        # Switch threads often so unguarded LRU updates would interleave
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        self.assertEqual(set(results), {expected})
+        self.assertEqual(counter.stats()["entries"], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
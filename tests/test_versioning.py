@@ -0,0 +1,126 @@
+import asyncio
+import json
+import unittest
+import warnings
+
+from chronicle_gist import Chronicle, InMemoryStorage, SessionConflictError, Storage
+from chronicle_gist.ledger import merge_ledgers
+from chronicle_gist.watermark import make_watermark
+from helpers import WordCountProvider
+
+
+class RacingProvider(WordCountProvider):
+    """One token per word; runs `during_call` while the worker is "thinking"."""
+
+    def __init__(self, during_call=None):
+        self.during_call = during_call
+
+    def completion(self, messages, model, response_format=None):
+        if self.during_call:
+            self.during_call()
+        return json.dumps({"summary": "ours", "fact_ledger": {"budget": 2000}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+HISTORY = [
+    {"role": "user", "content": "I need a laptop for video editing"},
+    {"role": "assistant", "content": "What is your budget"},
+    {"role": "user", "content": "About two thousand dollars"},
+]
+NEW_MESSAGE = {"role": "user", "content": "Any suggestions"}
+
+
+class TestVersionedSaves(unittest.TestCase):
+    def test_memory_storage_compare_and_set(self):
+        storage = InMemoryStorage()
+        self.assertEqual(storage.save_session("s", "a", {}, expected_version=0), 1)
+        with self.assertRaises(SessionConflictError):
+            storage.save_session("s", "b", {}, expected_version=0)
+        self.assertEqual(storage.get_session("s")["summary"], "a")
+        # Unconditional saves still work and bump the version
+        self.assertEqual(storage.save_session("s", "c", {}), 2)
+
+    def test_merge_ledgers(self):
+        base = {"name": "Ann", "plan": "free", "tmp": 1}
+        ours = {"name": "Ann", "plan": "free", "budget": 2000}
+        theirs = {"name": "Ann B.", "plan": "pro", "tmp": 1}
+        self.assertEqual(merge_ledgers(base, ours, theirs), {"name": "Ann B.", "plan": "pro", "budget": 2000})
+
+    def test_concurrent_ledger_write_is_merged_not_clobbered(self):
+        storage = InMemoryStorage()
+        storage.save_session("s", "", {})
+
+        def concurrent_write():
+            state = storage.get_session("s")
+            storage.save_session("s", state["summary"], {"plan": "pro"}, watermark=state["watermark"])
+
+        provider = RacingProvider(during_call=concurrent_write)
+        chronicle = Chronicle(storage=storage, llm_provider=provider, token_threshold=8)
+        result = chronicle.process("s", NEW_MESSAGE, HISTORY)
+
+        self.assertEqual(result["meta"]["compression"], "applied")
+        self.assertEqual(storage.get_session("s")["fact_ledger"], {"plan": "pro", "budget": 2000})
+        self.assertEqual(chronicle.stats()["save_conflicts"], 1)
+
+    def test_concurrent_compression_of_same_history_is_adopted(self):
+        storage = InMemoryStorage()
+
+        def concurrent_compression():
+            storage.save_session("s", "theirs", {"budget": 1999}, watermark=make_watermark(HISTORY, tokens=13))
+
+        chronicle = Chronicle(storage=storage, llm_provider=RacingProvider(concurrent_compression), token_threshold=8)
+        result = asyncio.run(chronicle.process_async("s", NEW_MESSAGE, HISTORY))
+
+        self.assertEqual(result["meta"]["compression"], "superseded")
+        self.assertEqual(result["meta"]["fact_ledger"], {"budget": 1999})
+        self.assertEqual(storage.get_session("s")["summary"], "theirs")
+
+    def test_bulk_save_conflict_is_resolved(self):
+        storage = InMemoryStorage()
+        storage.save_session("s", "", {})
+        provider = RacingProvider(during_call=lambda: storage.save_session("s", "", {"plan": "pro"}))
+        chronicle = Chronicle(storage=storage, llm_provider=provider, token_threshold=8)
+
+        asyncio.run(chronicle.process_many_async([
+            {"session_id": "s", "new_message": NEW_MESSAGE, "raw_history": HISTORY}
+        ]))
+
+        state = storage.get_session("s")
+        self.assertEqual(state["fact_ledger"], {"plan": "pro", "budget": 2000})
+        self.assertEqual(state["summary"], "ours")
+        self.assertEqual(state["version"], 3)
+
+    def test_legacy_three_argument_storage(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+
+            class LegacyStorage(Storage):
+                def __init__(self):
+                    self.sessions = {}
+
+                def get_session(self, session_id):
+                    return self.sessions.get(session_id)
+
+                def save_session(self, session_id, summary, fact_ledger):
+                    self.sessions[session_id] = {"summary": summary, "fact_ledger": fact_ledger}
+
+                async def aget_session(self, session_id):
+                    return self.get_session(session_id)
+
+                async def asave_session(self, session_id, summary, fact_ledger):
+                    self.save_session(session_id, summary, fact_ledger)
+
+        self.assertEqual(len([w for w in caught if issubclass(w.category, DeprecationWarning)]), 2)
+        storage = LegacyStorage()
+        chronicle = Chronicle(storage=storage, llm_provider=RacingProvider(), token_threshold=8)
+        chronicle.process("a", NEW_MESSAGE, HISTORY)
+        asyncio.run(chronicle.process_async("b", NEW_MESSAGE, HISTORY))
+        asyncio.run(chronicle.process_many_async([{"session_id": "c", "new_message": NEW_MESSAGE, "raw_history": HISTORY}]))
+        for sid in "abc":
+            self.assertEqual(storage.sessions[sid]["fact_ledger"], {"budget": 2000})
+
+
+if __name__ == "__main__":
+    unittest.main()
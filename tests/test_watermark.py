@@ -0,0 +1,74 @@
+import json
+import unittest
+
+from chronicle_gist import Chronicle, InMemoryStorage
+from chronicle_gist.watermark import make_watermark, split_at_watermark
+from helpers import WordCountProvider
+
+
+class RecordingProvider(WordCountProvider):
+    """Counts one token per word and records the history sent to the worker."""
+
+    def __init__(self):
+        self.compressed = []
+
+    def completion(self, messages, model, response_format=None):
+        prompt = messages[-1]["content"]
+        history = prompt.split("New Chat History to Process:", 1)[1].split("Output a valid JSON", 1)[0]
+        self.compressed.append(json.loads(history.strip()))
+        return json.dumps({"summary": f"summary {len(self.compressed)}", "fact_ledger": {"n": len(self.compressed)}})
+
+    async def acompletion(self, messages, model, response_format=None):
+        return self.completion(messages, model, response_format)
+
+
+def turn(i):
+    return [
+        {"role": "user", "content": f"user message {i}"},
+        {"role": "assistant", "content": f"assistant reply {i}"},
+    ]
+
+
+class TestWatermark(unittest.TestCase):
+    def setUp(self):
+        self.provider = RecordingProvider()
+        self.chronicle = Chronicle(storage=InMemoryStorage(), llm_provider=self.provider, token_threshold=5)
+
+    def test_only_delta_is_sent_after_first_compression(self):
+        history = turn(1) + turn(2)
+        meta = self.chronicle.process("s", {"role": "user", "content": "q"}, history)["meta"]
+        self.assertEqual(meta["compression_scope"], "full")
+        self.assertEqual(len(self.provider.compressed[-1]), 4)
+
+        history += turn(3)
+        meta = self.chronicle.process("s", {"role": "user", "content": "q"}, history)["meta"]
+        self.assertEqual(meta["compression_scope"], "delta")
+        self.assertEqual(self.provider.compressed[-1], turn(3))
+
+        watermark = self.chronicle.storage.get_session("s")["watermark"]
+        expected = make_watermark(history)
+        self.assertEqual((watermark["count"], watermark["hash"]), (expected["count"], expected["hash"]))
+        self.assertEqual(watermark["tokens"], 18)
+
+    def test_unchanged_history_skips_worker(self):
+        history = turn(1) + turn(2)
+        self.chronicle.process("s", {"role": "user", "content": "q"}, history)
+        meta = self.chronicle.process("s", {"role": "user", "content": "q"}, history)["meta"]
+        self.assertEqual(meta["compression"], "up_to_date")
+        self.assertEqual(len(self.provider.compressed), 1)
+
+    def test_diverged_history_falls_back_to_full(self):
+        history = turn(1) + turn(2)
+        watermark = make_watermark(history)
+
+        edited = [dict(history[0], content="edited")] + history[1:] + turn(3)
+        pending, is_delta = split_at_watermark(edited, watermark)
+        self.assertFalse(is_delta)
+        self.assertEqual(pending, edited)
+
+        pending, is_delta = split_at_watermark(history[:2], watermark)
+        self.assertFalse(is_delta)
+
+
+if __name__ == '__main__':
+    unittest.main()